@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Runtime configuration of the HeatSeeker bot.
+
+Rank tiers, queue settings, the placement rule and the rating model are read
+from hsm_config.json. Top-level keys missing from the file keep their
+defaults; a key that is present replaces the default value whole. The file
+is validated and compiled into an immutable BotConfig, so the bot can swap a
+reloaded config in with one assignment and every match keeps the snapshot it
+started with.
+
+    python bot_config.py                   # validate hsm_config.json
+    python bot_config.py --write-defaults  # write the built-in defaults
+"""
+
+import argparse
+import copy
+import hashlib
+import inspect
+import json
+import os
+import sys
+from dataclasses import dataclass
+
+from rating import RATING_MODELS, RatingModel, get_rating_model
+from ranks import RANK_SYSTEM, RankTable
+
+CONFIG_FILE = "hsm_config.json"
+
+DEFAULT_CONFIG = {
+    "queue_limit": 4,
+    "queue_timeout": 300,  # Seconds of inactivity before a player leaves the queue
+    "placement_matches": 5,
+    "rating": {
+        "model": "flat",
+        "options": {"win": 25, "loss": 20, "placement_win": 10, "placement_loss": 5}
+    },
+    "ranks": RANK_SYSTEM
+}
+
+RANK_FIELDS = ("name", "role_name", "emoji", "color", "min_mmr", "max_mmr")
+
+
+class ConfigError(ValueError):
+    """Invalid configuration, with every problem found"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+@dataclass(frozen=True)
+class BotConfig:
+    """A validated and compiled configuration snapshot"""
+    digest: str  # Short hash of the effective settings
+    settings: dict
+    queue_limit: int
+    queue_timeout: int
+    placement_matches: int
+    rating_model: RatingModel
+    ranks: RankTable
+
+    def changed_sections(self, other):
+        """Top-level keys whose value differs from another config"""
+        return [key for key in self.settings if self.settings[key] != other.settings.get(key)]
+
+
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_color(value):
+    """Role color from an int or a '#RRGGBB' string"""
+    if is_int(value) and 0 <= value <= 0xFFFFFF:
+        return value
+    if isinstance(value, str) and value.startswith("#") and len(value) == 7:
+        try:
+            return int(value[1:], 16)
+        except ValueError:
+            pass
+    raise ValueError(f"invalid color {value!r}, use an int or '#RRGGBB'")
+
+
+def validate_ranks(ranks, errors):
+    """Check the rank tiers and return them with parsed colors"""
+    if not isinstance(ranks, dict) or not ranks:
+        errors.append("ranks: expected a non-empty object of tiers")
+        return {}
+
+    parsed = {}
+    for rank_key, data in ranks.items():
+        if not isinstance(data, dict):
+            errors.append(f"ranks.{rank_key}: expected an object")
+            continue
+        missing = [name for name in RANK_FIELDS if name not in data]
+        unknown = [name for name in data if name not in RANK_FIELDS]
+        if missing or unknown:
+            errors.append(f"ranks.{rank_key}: missing {missing}, unknown {unknown}")
+            continue
+        if not (is_int(data["min_mmr"]) and is_int(data["max_mmr"]) and data["min_mmr"] <= data["max_mmr"]):
+            errors.append(f"ranks.{rank_key}: min_mmr and max_mmr must be ints with min_mmr <= max_mmr")
+            continue
+        if not all(isinstance(data[name], str) and data[name] for name in ("name", "role_name", "emoji")):
+            errors.append(f"ranks.{rank_key}: name, role_name and emoji must be non-empty strings")
+            continue
+        try:
+            parsed[rank_key] = dict(data, color=parse_color(data["color"]))
+        except ValueError as e:
+            errors.append(f"ranks.{rank_key}: {e}")
+
+    # Tiers must cover the MMR range without gaps or overlaps
+    tiers = sorted(parsed.items(), key=lambda item: item[1]["min_mmr"])
+    for (lower_key, lower), (upper_key, upper) in zip(tiers, tiers[1:]):
+        if upper["min_mmr"] != lower["max_mmr"] + 1:
+            errors.append(f"ranks: {upper_key} must start at {lower_key}.max_mmr + 1 ({lower['max_mmr'] + 1})")
+
+    role_names = [data["role_name"] for data in parsed.values()]
+    if len(set(role_names)) != len(role_names):
+        errors.append("ranks: role_name values must be unique")
+    return parsed
+
+
+def build_rating_model(rating, placement_matches, errors):
+    """Create the configured rating model, None if the section is invalid"""
+    if not isinstance(rating, dict) or rating.get("model") not in RATING_MODELS:
+        errors.append(f"rating.model: expected one of {', '.join(RATING_MODELS)}")
+        return None
+    options = rating.get("options", {})
+    if not isinstance(options, dict) or not all(isinstance(value, (int, float)) and not isinstance(value, bool)
+                                                for value in options.values()):
+        errors.append("rating.options: expected an object of numbers")
+        return None
+
+    # The placement rule is shared with the bot, models that use it get it from there
+    model_class = RATING_MODELS[rating["model"]]
+    if "placement_matches" in inspect.signature(model_class).parameters:
+        options = dict(options, placement_matches=placement_matches)
+    try:
+        model = get_rating_model(rating["model"], **options)
+    except TypeError as e:
+        errors.append(f"rating.options: {e}")
+        return None
+
+    # Wins must gain and losses must lose points at every MMR
+    for points in (0, 1000, 3000):
+        gain, loss = model.even_match_changes(points)
+        if gain <= 0 or loss <= 0:
+            errors.append(f"rating: an even match at {points} MMR gives {gain:+d}/{-loss:+d}, expected a gain and a loss")
+            return None
+    return model
+
+
+def compile_config(data, default_model="flat"):
+    """Validate raw settings and compile them into a BotConfig"""
+    if not isinstance(data, dict):
+        raise ConfigError(["expected a JSON object"])
+
+    defaults = copy.deepcopy(DEFAULT_CONFIG)
+    if default_model != defaults["rating"]["model"]:
+        defaults["rating"] = {"model": default_model, "options": {}}
+    errors = [f"{key}: unknown setting" for key in data if key not in defaults]
+    settings = dict(defaults, **{key: value for key, value in data.items() if key in defaults})
+
+    if settings["queue_limit"] != 4:
+        errors.append("queue_limit: matches are 2v2, the queue must hold exactly 4 players")
+    if not is_int(settings["queue_timeout"]) or settings["queue_timeout"] <= 0:
+        errors.append("queue_timeout: expected a positive number of seconds")
+    if not is_int(settings["placement_matches"]) or settings["placement_matches"] < 0:
+        errors.append("placement_matches: expected an int >= 0")
+        settings["placement_matches"] = DEFAULT_CONFIG["placement_matches"]
+
+    ranks = validate_ranks(settings["ranks"], errors)
+    model = build_rating_model(settings["rating"], settings["placement_matches"], errors)
+    if errors:
+        raise ConfigError(errors)
+
+    settings["ranks"] = ranks
+    canonical = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+    return BotConfig(
+        digest=hashlib.sha256(canonical.encode()).hexdigest()[:12],
+        settings=settings,
+        queue_limit=settings["queue_limit"],
+        queue_timeout=settings["queue_timeout"],
+        placement_matches=settings["placement_matches"],
+        rating_model=model,
+        ranks=RankTable(ranks)
+    )
+
+
+def load_config(path=CONFIG_FILE, default_model="flat"):
+    """Load and compile a config file, the defaults if it does not exist"""
+    if not os.path.exists(path):
+        return compile_config({}, default_model)
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ConfigError([f"{path}: {e}"])
+    return compile_config(data, default_model)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate the bot configuration")
+    parser.add_argument("path", nargs="?", default=CONFIG_FILE, help="Config file")
+    parser.add_argument("--write-defaults", action="store_true", help="Write the built-in defaults to the file")
+    args = parser.parse_args(argv)
+
+    if args.write_defaults:
+        if os.path.exists(args.path):
+            print(f"❌ {args.path} already exists")
+            return 1
+        with open(args.path, "w", encoding="utf-8") as f:
+            json.dump(DEFAULT_CONFIG, f, indent=4, ensure_ascii=False)
+        print(f"✅ Wrote {args.path}")
+        return 0
+
+    try:
+        config = load_config(args.path)
+    except ConfigError as e:
+        for error in e.errors:
+            print(f"❌ {error}")
+        return 1
+    print(f"✅ {args.path} is valid (config {config.digest})")
+    print(f"Rating model: {config.rating_model.name}, placement matches: {config.placement_matches}")
+    for rank in config.ranks.ranks:
+        print(f"  {rank.name:18} {rank.min_mmr:>5} - {rank.max_mmr}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
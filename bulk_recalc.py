@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Bulk match result recalculation for HeatSeeker admins.
+
+Changes the result of many completed matches at once and recomputes the
+affected player totals in a single transaction. Old results are reverted and
+new ones applied with the ranked deltas of the rating model. Used by the
+/admin_bulk_result command and runnable offline against the database:
+
+    python bulk_recalc.py 12=1 13=2 14=cancel
+    python bulk_recalc.py --dry-run --db hsm_players.db 12=2
+
+The rating model comes from the bot config unless --model is given.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+from bot_config import CONFIG_FILE, ConfigError, load_config
+from rating import FlatRating, RATING_MODELS, get_rating_model
+
+OUTCOME_ALIASES = {
+    "1": 1, "team1": 1, "blue": 1,
+    "2": 2, "team2": 2, "orange": 2,
+    "-1": -1, "cancel": -1, "cancelled": -1
+}
+
+SQLITE_CHUNK = 500  # Stay below SQLite's bound parameter limit
+
+
+def parse_outcome(text):
+    """Turn '1', 'team2', 'cancel'... into a winner value (1, 2 or -1)"""
+    outcome = OUTCOME_ALIASES.get(text.strip().lower())
+    if outcome is None:
+        raise ValueError(f"Unknown outcome '{text}' (use 1, 2 or cancel)")
+    return outcome
+
+
+def parse_match_changes(specs):
+    """Parse 'match_id=outcome' items into {match_id: new_winner}"""
+    changes = {}
+    for spec in specs:
+        for item in spec.replace(",", " ").split():
+            match_id, separator, outcome = item.partition("=")
+            if not separator:
+                raise ValueError(f"Expected match_id=outcome, got '{item}'")
+            match_id = int(match_id.strip().upper().removeprefix("HSM"))
+            changes[match_id] = parse_outcome(outcome)
+    return changes
+
+
+def chunks(values, size=SQLITE_CHUNK):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def rate_results(model, seats, winners, current_points):
+    """Ranked MMR deltas of each seat for the given winners, rated in one batch"""
+    points = np.array([[current_points.get(player_id, 0) for player_id in row] for row in seats],
+                      dtype=np.int64).reshape(-1, 4)
+    placement = np.full(points.shape, np.iinfo(np.int32).max, dtype=np.int64)  # Always ranked deltas
+    team1_won = np.array(winners) == 1
+    won = np.column_stack([team1_won, team1_won, ~team1_won, ~team1_won])
+    return model.rate(points, placement, won)
+
+
+def bulk_recalculate(conn, changes, dry_run=False, model=None):
+    """Apply new results to many matches with one aggregated update per player
+
+    Returns a report with the changed and skipped matches and the final
+    points of every affected player.
+    """
+    model = model or FlatRating()
+    cursor = conn.cursor()
+    report = {"matches": [], "skipped": [], "players": {}}
+
+    # Load all requested matches
+    matches = {}
+    for chunk in chunks(changes):
+        cursor.execute(f"""
+            SELECT match_id, team1_player1, team1_player2, team2_player1, team2_player2, winner
+            FROM matches
+            WHERE completed = 1 AND match_id IN ({','.join('?' * len(chunk))})
+        """, chunk)
+        for row in cursor.fetchall():
+            matches[row[0]] = row
+
+    match_updates = []
+    for match_id, new_winner in changes.items():
+        match = matches.get(match_id)
+        if not match:
+            report["skipped"].append((match_id, "not found or not completed"))
+            continue
+        old_winner = match[5]
+        if old_winner == new_winner:
+            report["skipped"].append((match_id, "result unchanged"))
+            continue
+        match_updates.append((new_winner, 1 if new_winner == -1 else 0, match_id))
+        report["matches"].append((match_id, old_winner, new_winner))
+
+    try:
+        # Current totals of all affected players
+        player_ids = {player_id for match_id, old, new in report["matches"] for player_id in matches[match_id][1:5]}
+        current = {}
+        for chunk in chunks(player_ids):
+            cursor.execute(f"SELECT user_id, points, wins, losses FROM players WHERE user_id IN ({','.join('?' * len(chunk))})",
+                           chunk)
+            for user_id, points, wins, losses in cursor.fetchall():
+                current[user_id] = (points, wins, losses)
+        current_points = {user_id: totals[0] for user_id, totals in current.items()}
+
+        # Aggregate the revert of the old result and the new result per player
+        deltas = {}  # {user_id: [points, wins, losses]}
+        for index, sign in ((1, -1), (2, 1)):  # Old winner reverted, new winner applied
+            # Cancelled matches carry no stats
+            rated = [change for change in report["matches"] if change[index] in (1, 2)]
+            if not rated:
+                continue
+            seats = [matches[change[0]][1:5] for change in rated]
+            winners = [change[index] for change in rated]
+            points_deltas = rate_results(model, seats, winners, current_points)
+            for row, winner, row_deltas in zip(seats, winners, points_deltas.tolist()):
+                for seat, (player_id, points_delta) in enumerate(zip(row, row_deltas)):
+                    won = (seat < 2) == (winner == 1)
+                    delta = deltas.setdefault(player_id, [0, 0, 0])
+                    delta[0] += sign * points_delta
+                    delta[1 if won else 2] += sign
+
+        player_updates = []
+        for user_id, (points_delta, wins_delta, losses_delta) in deltas.items():
+            if user_id not in current:
+                continue
+            points, wins, losses = current[user_id]
+            new_totals = (max(0, points + points_delta), max(0, wins + wins_delta), max(0, losses + losses_delta))
+            player_updates.append(new_totals + (user_id,))
+            report["players"][user_id] = {"old_points": points, "new_points": new_totals[0]}
+
+        cursor.executemany("UPDATE players SET points = ?, wins = ?, losses = ? WHERE user_id = ?", player_updates)
+        cursor.executemany("""
+            UPDATE matches
+            SET winner = ?, admin_modified = 1, cancelled = ?
+            WHERE match_id = ?
+        """, match_updates)
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return report
+
+
+def format_winner(winner):
+    return {1: "Team 1", 2: "Team 2", -1: "Cancelled"}.get(winner, str(winner))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Change the result of many matches at once")
+    parser.add_argument("changes", nargs="+", help="match_id=outcome items, outcome is 1, 2 or cancel")
+    parser.add_argument("--db", default="hsm_players.db", help="SQLite database file")
+    parser.add_argument("--dry-run", action="store_true", help="Show the changes without saving them")
+    parser.add_argument("--model", choices=list(RATING_MODELS), help="Rating model for the deltas (default: the config's)")
+    parser.add_argument("--config", default=os.getenv("HSM_CONFIG", CONFIG_FILE), help="Bot config file")
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_config(args.config)
+    except ConfigError as e:
+        for error in e.errors:
+            print(f"❌ {error}")
+        return 1
+
+    try:
+        changes = parse_match_changes(args.changes)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    conn = sqlite3.connect(args.db)
+    model = get_rating_model(args.model) if args.model else config.rating_model
+    report = bulk_recalculate(conn, changes, dry_run=args.dry_run, model=model)
+    conn.close()
+
+    for match_id, old_winner, new_winner in report["matches"]:
+        print(f"HSM{match_id}: {format_winner(old_winner)} → {format_winner(new_winner)}")
+    for match_id, reason in report["skipped"]:
+        print(f"HSM{match_id}: skipped ({reason})")
+    for user_id, player in report["players"].items():
+        print(f"{user_id}: {player['old_points']} → {player['new_points']}")
+
+    if args.dry_run:
+        print("🔍 Dry run - nothing was saved")
+    else:
+        print(f"✅ Updated {len(report['matches'])} matches and {len(report['players'])} players")
+        print("Rank roles will be corrected by the bot's next rank sync")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
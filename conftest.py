@@ -0,0 +1,41 @@
+"""Shared fixtures for the tests of main.py"""
+
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    """main imported once, with its database and config in a temporary directory"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("bot"))
+    try:
+        import main
+    finally:
+        os.chdir(cwd)
+    return main
+
+
+@pytest.fixture
+def bot(main_module):
+    """main with empty tables and in-memory state for one test"""
+    main = main_module
+    for table in ("players", "matches", "mmr_changes", "player_names", "leaderboard_boards", "season_standings"):
+        main.cursor.execute(f"DELETE FROM {table}")
+    main.conn.commit()
+    main.player_ranking.guilds.clear()
+    main.player_ranking.load(main.cursor)
+    main.weekly_gains.load(main.cursor)
+    for state in (main.player_names.names, main.player_names.pending, main.player_names.unsaved,
+                  main.active_matches, main.match_results, main.player_active_match, main.match_channel_index,
+                  main.rank_role_cache, main.retired_rank_roles):
+        state.clear()
+    main.profile_cache.profiles.clear()
+    main.profile_cache.versions.clear()
+    main.leaderboard_boards.clear()
+    main.leaderboard_page_cache.clear()
+    main.leaderboard_dirty_since = None
+    main.leaderboard_refresh_task = None
+    return main
+
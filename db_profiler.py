@@ -0,0 +1,244 @@
+"""
+SQLite statement profiler for HeatSeeker.
+
+ProfiledConnection is passed to sqlite3.connect(factory=...) and hands out
+ProfiledCursor objects. Every statement is reduced to a fingerprint, with
+literals and IN lists replaced by placeholders and whitespace collapsed.
+Count, total and max time and rows returned are aggregated per fingerprint.
+The time of each statement also goes to the running perf span. A statement
+that crosses the slow threshold is logged once with its EXPLAIN QUERY PLAN,
+so a new query that scans a whole table shows up on its first slow run.
+"""
+
+import re
+import sqlite3
+import time
+from collections import deque
+
+from perf import add_time, current_span
+
+WHITESPACE = re.compile(r"\s+")
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+FINGERPRINT_CACHE_SIZE = 5000
+
+
+def fingerprint(sql):
+    """Normalized form of a statement shared by all its parameter values"""
+    sql = WHITESPACE.sub(" ", sql).strip()
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql)
+    return PLACEHOLDER_LIST.sub("(?+)", sql)
+
+
+def is_full_scan(plan):
+    """Plan scans a table without an index - covering index scans are fine"""
+    return any(line.startswith("SCAN ") and "USING" not in line for line in plan)
+
+
+class StatementStats:
+    __slots__ = ("count", "total", "max", "rows", "slow")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.slow = 0
+
+
+class Statement:
+    """One execution of a statement, followed through its fetches"""
+
+    __slots__ = ("fingerprint", "sql", "parameters", "stats", "elapsed", "logged")
+
+    def __init__(self, fingerprint, sql, parameters, stats):
+        self.fingerprint = fingerprint
+        self.sql = sql
+        self.parameters = parameters
+        self.stats = stats
+        self.elapsed = 0.0
+        self.logged = False
+
+
+class StatementProfiler:
+    """Per-fingerprint statement stats and a log of slow statements"""
+
+    def __init__(self, slow_threshold=0.05, slow_log_size=50):
+        self.slow_threshold = slow_threshold  # Seconds
+        self.statements = {}  # {fingerprint: StatementStats}
+        self.fingerprints = {}  # {sql: fingerprint}
+        self.plans = {}  # {fingerprint: [plan lines]} - explained once per fingerprint
+        self.slow_log = deque(maxlen=slow_log_size)
+        self.slow_total = 0  # Slow statements ever logged, kept across resets
+        self.started_at = time.time()
+
+    def start(self, sql, parameters):
+        fp = self.fingerprints.get(sql)
+        if fp is None:
+            if len(self.fingerprints) >= FINGERPRINT_CACHE_SIZE:
+                self.fingerprints.clear()  # Statements built with f-strings could grow it forever
+            fp = self.fingerprints[sql] = fingerprint(sql)
+        stats = self.statements.get(fp)
+        if stats is None:
+            stats = self.statements[fp] = StatementStats()
+        stats.count += 1
+        return Statement(fp, sql, parameters, stats)
+
+    def record(self, statement, elapsed, rows, connection):
+        """Add execute or fetch time of a statement and log it once it turns slow"""
+        add_time("db", elapsed)
+        statement.elapsed += elapsed
+        stats = statement.stats
+        stats.total += elapsed
+        stats.rows += rows
+        if statement.elapsed > stats.max:
+            stats.max = statement.elapsed
+        if statement.elapsed >= self.slow_threshold and not statement.logged:
+            statement.logged = True
+            stats.slow += 1
+            self.slow_total += 1
+            self.log_slow(statement, connection)
+
+    def explain(self, statement, connection):
+        """EXPLAIN QUERY PLAN lines of a statement, cached per fingerprint"""
+        plan = self.plans.get(statement.fingerprint)
+        if plan is None:
+            if statement.parameters is None:
+                plan = ["(executemany - not explained)"]
+            else:
+                try:
+                    # A plain cursor, so the EXPLAIN itself is not profiled
+                    cursor = sqlite3.Cursor(connection)
+                    cursor.execute("EXPLAIN QUERY PLAN " + statement.sql, statement.parameters)
+                    plan = [row[-1] for row in cursor.fetchall()]
+                except sqlite3.Error as e:
+                    plan = [f"(no plan: {e})"]
+            self.plans[statement.fingerprint] = plan
+        return plan
+
+    def log_slow(self, statement, connection):
+        plan = self.explain(statement, connection)
+        running = current_span.get()
+        entry = {
+            "seq": self.slow_total,
+            "at": time.time(),
+            "fingerprint": statement.fingerprint,
+            "elapsed": statement.elapsed,
+            "handler": running.name if running else None,
+            "plan": plan,
+            "full_scan": is_full_scan(plan)
+        }
+        self.slow_log.append(entry)
+        print(f"🐢 Slow query {statement.elapsed * 1000:.0f}ms in {entry['handler'] or 'background'}: {statement.fingerprint}")
+        for line in plan:
+            print(f"   {line}")
+
+    def record_transaction(self, name, elapsed):
+        """Time of a COMMIT or ROLLBACK, kept as its own fingerprint"""
+        stats = self.statements.get(name)
+        if stats is None:
+            stats = self.statements[name] = StatementStats()
+        stats.count += 1
+        stats.total += elapsed
+        stats.max = max(stats.max, elapsed)
+        add_time("db", elapsed)
+
+    def top(self, count=10, key="total"):
+        """[(fingerprint, StatementStats)] with the highest total, count, max or rows"""
+        return sorted(self.statements.items(), key=lambda item: -getattr(item[1], key))[:count]
+
+    def reset(self):
+        self.statements.clear()
+        self.plans.clear()
+        self.slow_log.clear()
+        self.started_at = time.time()
+
+    def export(self):
+        return {
+            fp: {"count": stats.count, "total": stats.total, "max": stats.max, "rows": stats.rows, "slow": stats.slow,
+                 "plan": self.plans.get(fp)}
+            for fp, stats in self.statements.items()
+        }
+
+
+profiler = StatementProfiler()
+
+
+def format_statements(statements, width=70):
+    """Text table of [(fingerprint, StatementStats)] with times in milliseconds"""
+    lines = [f"{'count':>7} {'total':>9} {'avg':>7} {'max':>7} {'rows':>8}  statement"]
+    for fp, stats in statements:
+        average = stats.total / stats.count if stats.count else 0.0
+        text = fp if len(fp) <= width else fp[:width - 1] + "…"
+        lines.append(f"{stats.count:>7} {stats.total * 1000:>9.1f} {average * 1000:>7.2f} {stats.max * 1000:>7.1f} "
+                     f"{stats.rows:>8}  {text}")
+    return "\n".join(lines)
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that records every statement and fetch in the profiler"""
+
+    statement = None
+
+    def execute(self, sql, parameters=()):
+        self.statement = profiler.start(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            profiler.record(self.statement, time.perf_counter() - started, 0, self.connection)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.statement = profiler.start(sql, None)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            profiler.record(self.statement, time.perf_counter() - started, 0, self.connection)
+
+    def fetch(self, method, *args):
+        started = time.perf_counter()
+        rows = method(*args)
+        if self.statement:
+            count = len(rows) if isinstance(rows, list) else rows is not None
+            profiler.record(self.statement, time.perf_counter() - started, count, self.connection)
+        return rows
+
+    def fetchone(self):
+        return self.fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self.fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self.fetch(super().fetchall)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose cursors and commits are profiled - pass as sqlite3.connect(factory=...)"""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            profiler.record_transaction("COMMIT", time.perf_counter() - started)
+
+    def rollback(self):
+        started = time.perf_counter()
+        try:
+            return super().rollback()
+        finally:
+            profiler.record_transaction("ROLLBACK", time.perf_counter() - started)
@@ -3,10 +3,30 @@ from discord.ext import commands, tasks
 from discord import app_commands
 import os
 from dotenv import load_dotenv
-from collections import deque
+from collections import deque, OrderedDict
 import asyncio
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import sqlite3
+import time
+import re
+import functools
+import heapq
+import itertools
+import hashlib
+import io
+import json
+import math
+from dataclasses import dataclass, field
+from sortedcontainers import SortedList
+
+import numpy as np
+from bulk_recalc import bulk_recalculate, chunks, parse_match_changes
+from bot_config import BotConfig, ConfigError, load_config
+from db_profiler import ProfiledConnection, format_statements, profiler as statement_profiler
+from perf import LatencyHistogram, format_report, instrument as perf_instrument, registry as perf_registry, span as perf_span, timed, track_ack
+from metrics import MetricsRegistry
+from flask import Flask, Response, jsonify
+from rank_stats import distribution_stats, format_tiers, parse_thresholds
 
 # تحميل المتغيرات
 load_dotenv()
@@ -20,29 +40,298 @@ intents.message_content = True
 intents.members = True
 
 # إنشاء البوت
-bot = commands.Bot(command_prefix="!", intents=intents)
+# 429s with a longer wait raise RateLimited instead of sleeping inside discord.py, so the
+# REST scheduler sees them and blocks the route for every queued call (30s is the minimum)
+bot = commands.Bot(command_prefix="!", intents=intents,
+                   max_ratelimit_timeout=float(os.getenv("MAX_RATELIMIT_TIMEOUT", 30)))
 
 @bot.event
 async def on_ready():
     print(f"✅ Logged in as {bot.user}")
 
+# Outbound REST priority classes - lower value is served first
+PRIORITY_PROVISION = 0  # Match channel creation and match start notifications
+PRIORITY_SETTLEMENT = 1  # Result DMs, role updates, results channel, match cleanup
+PRIORITY_QUEUE_DISPLAY = 2  # Queue embed edits
+PRIORITY_COSMETIC = 3  # Leaderboard, rank role sync, orphan channel sweeps
+PRIORITY_NAMES = {
+    PRIORITY_PROVISION: "provision",
+    PRIORITY_SETTLEMENT: "settlement",
+    PRIORITY_QUEUE_DISPLAY: "queue_display",
+    PRIORITY_COSMETIC: "cosmetic"
+}
+
+class RestScheduler:
+    """Central outbound Discord REST scheduler
+
+    Every route has its own priority queue served by `concurrency` workers,
+    optionally paced to `rate` calls per `per` seconds. All routes then share
+    a global call budget that is granted to the highest priority waiter first.
+    """
+    
+    def __init__(self, global_rate, routes, default_concurrency=4):
+        self.global_rate = global_rate  # Calls per second across all routes
+        self.routes = routes  # {route: (concurrency, rate, per)}
+        self.default_concurrency = default_concurrency
+        self.route_queues = {}
+        self.route_workers = {}
+        self.route_calls = {}  # {route: deque of recent call times}
+        self.blocked_until = {}  # {route: monotonic time} - shared rate limit view, None is global
+        self.tokens = float(global_rate)
+        self.last_refill = time.monotonic()
+        self.grant_waiters = []  # heap of (priority, seq, future)
+        self.grant_task = None
+        self.sequence = itertools.count()
+        self.stats = {
+            name: {'queued': 0, 'completed': 0, 'failed': 0, 'rate_limited': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+    
+    def route_config(self, route):
+        return self.routes.get(route, (self.default_concurrency, None, None))
+    
+    def submit(self, priority, route, factory):
+        """Queue a coroutine factory and return a future with its result"""
+        queue = self.route_queues.get(route)
+        if queue is None:
+            queue = self.route_queues[route] = asyncio.PriorityQueue()
+            self.route_workers[route] = []
+        
+        workers = self.route_workers[route]
+        workers[:] = [worker for worker in workers if not worker.done()]
+        while len(workers) < self.route_config(route)[0]:
+            workers.append(asyncio.create_task(self.run_route(route)))
+        
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((priority, next(self.sequence), time.monotonic(), factory, future))
+        self.stats[PRIORITY_NAMES[priority]]['queued'] += 1
+        return future
+    
+    async def run_route(self, route):
+        queue = self.route_queues[route]
+        concurrency, rate, per = self.route_config(route)
+        while True:
+            priority, sequence, enqueued_at, factory, future = await queue.get()
+            stats = self.stats[PRIORITY_NAMES[priority]]
+            try:
+                if rate:
+                    await self.pace(route, rate, per)
+                await self.wait_unblocked(route)
+                await self.acquire(priority)
+                
+                wait = time.monotonic() - enqueued_at
+                stats['wait_total'] += wait
+                stats['wait_max'] = max(stats['wait_max'], wait)
+                
+                try:
+                    result = await factory()
+                except discord.RateLimited as e:
+                    # Bucket exhausted - block the route for everyone, then retry once
+                    stats['rate_limited'] += 1
+                    self.blocked_until[route] = time.monotonic() + e.retry_after
+                    await self.wait_unblocked(route)
+                    result = await factory()
+                stats['completed'] += 1
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                stats['failed'] += 1
+                if isinstance(e, discord.HTTPException) and e.status == 429:
+                    stats['rate_limited'] += 1
+                    self.blocked_until[None] = time.monotonic() + 1.0
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                stats['queued'] -= 1
+                queue.task_done()
+    
+    async def pace(self, route, rate, per):
+        """Wait for a free slot in the route's rate window"""
+        calls = self.route_calls.setdefault(route, deque())
+        while True:
+            now = time.monotonic()
+            while calls and calls[0] <= now - per:
+                calls.popleft()
+            if len(calls) < rate:
+                calls.append(now)
+                return
+            await asyncio.sleep(calls[0] + per - now)
+    
+    async def wait_unblocked(self, route):
+        """Wait until neither the route nor the global bucket is rate limited"""
+        while True:
+            wait = max(self.blocked_until.get(route, 0), self.blocked_until.get(None, 0)) - time.monotonic()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+    
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.global_rate, self.tokens + (now - self.last_refill) * self.global_rate)
+        self.last_refill = now
+    
+    async def acquire(self, priority):
+        """Take one call from the global budget, higher priorities first"""
+        self.refill()
+        if self.tokens >= 1 and not self.grant_waiters:
+            self.tokens -= 1
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.grant_waiters, (priority, next(self.sequence), future))
+        if self.grant_task is None or self.grant_task.done():
+            self.grant_task = asyncio.create_task(self.grant_loop())
+        await future
+    
+    async def grant_loop(self):
+        while self.grant_waiters:
+            self.refill()
+            while self.grant_waiters and self.tokens >= 1:
+                priority, sequence, future = heapq.heappop(self.grant_waiters)
+                if not future.done():
+                    self.tokens -= 1
+                    future.set_result(None)
+            if self.grant_waiters:
+                await asyncio.sleep(1 / self.global_rate)
+
+# Outbound REST routes: (concurrency, paced calls, per seconds)
+REST_ROUTES = {
+    'channel_create': (2, None, None),
+    'channel_delete': (1, 5, 5.0),  # Guild channel deletes share a small rate bucket
+    'role_create': (1, None, None),
+    'member_edit': (2, 5, 5.0),
+    'dm': (4, None, None),
+    'message_send': (4, None, None),
+    'message_edit': (2, None, None),
+    'message_delete': (1, 5, 5.0),
+    'user_fetch': (1, 5, 5.0)  # Names of players that left every guild
+}
+rest_scheduler = RestScheduler(global_rate=40, routes=REST_ROUTES)
+
+async def rest(priority, route, func, *args, **kwargs):
+    """Run a Discord REST call through the outbound scheduler"""
+    with timed('rest'):  # Queue wait included - it is part of what the handler waits for
+        return await rest_scheduler.submit(priority, route, functools.partial(func, *args, **kwargs))
+
+class TimedInteractionResponse(discord.InteractionResponse):
+    """Interaction response that times its calls and records the first one as the handler's ack
+
+    Interaction responses bypass the scheduler, so they are timed here.
+    """
+    
+    __slots__ = ()
+    
+    send_message = track_ack(discord.InteractionResponse.send_message)
+    defer = track_ack(discord.InteractionResponse.defer)
+    edit_message = track_ack(discord.InteractionResponse.edit_message)
+    send_modal = track_ack(discord.InteractionResponse.send_modal)
+
+def use_timed_response(interaction):
+    """Give an interaction a TimedInteractionResponse unless its response is already in use"""
+    try:
+        interaction._cs_response  # Cached on first access of interaction.response
+    except AttributeError:
+        interaction._cs_response = TimedInteractionResponse(interaction)
+
+def instrument(name=None):
+    """perf.instrument for handlers - their interaction also records the ack"""
+    def decorator(func):
+        instrumented = perf_instrument(name or func.__qualname__)(func)
+        
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            interaction = next((arg for arg in (*args, *kwargs.values()) if isinstance(arg, discord.Interaction)), None)
+            if interaction:
+                use_timed_response(interaction)
+            return await instrumented(*args, **kwargs)
+        return wrapper
+    return decorator
+
 # Queue storage
 user_queue = deque()
-queue_limit = 4
-queue_timeout = 300
 user_last_activity = {}
 queue_message = None
 queue_channel = None
 queue_channel_id = None
+queue_embed_edits = 0  # Queue embed edits and resends submitted to the REST scheduler
 active_matches = {}
 match_results = {}
+player_active_match = {}  # {user_id: match_name} - O(1) lookup/release of player match locks
+match_channel_index = {}  # {text_channel_id: match_name} - used to track match activity
+
+# Abandoned match reaper settings (seconds, overridable from the environment)
+report_lease_timeout = int(os.getenv("REPORT_LEASE_TIMEOUT", 90))  # How long a /report menu holds the match
+match_warn_after = int(os.getenv("MATCH_WARN_AFTER", 3600))  # Inactivity before warning the match channel
+match_max_age = int(os.getenv("MATCH_MAX_AGE", 7200))  # Age before an unreported match is auto-cancelled
+
+# Orphan channel sweeper
+channel_sweep_interval = int(os.getenv("CHANNEL_SWEEP_MINUTES", 30))
+last_channel_sweep = None  # Report of the last orphan channel sweep
+
+# Season soft reset - points move this far back toward the target when a season ends
+season_reset_target = int(os.getenv("SEASON_RESET_TARGET", 1000))
+season_reset_factor = float(os.getenv("SEASON_RESET_FACTOR", 0.5))  # 0 = everyone back to the target, 1 = no reset
+
+# Rank role sync - reconciles every member's rank role with the database
+rank_role_sync_interval = int(os.getenv("RANK_SYNC_MINUTES", 10))
+rank_sync_lock = asyncio.Lock()
+last_rank_sync = None  # Report of the last rank role sync
+
+# Leaderboard refresh - settlements that change the visible top schedule a debounced edit
+LEADERBOARD_SIZE = 10
+leaderboard_debounce = float(os.getenv("LEADERBOARD_DEBOUNCE_SECONDS", 15))
+leaderboard_fallback_interval = int(os.getenv("LEADERBOARD_FALLBACK_MINUTES", 30))  # Catches counter-only changes
+leaderboard_refresh_task = None  # Pending debounced refresh
+leaderboard_dirty_since = None  # When the first unrendered change happened, None while the boards are current
+leaderboard_boards = {}  # {(scope, channel_id): {'message', 'hash', 'cutoff'}} - loaded from the table on ready
+leaderboard_edit_times = deque()  # Edit times of the last hour
+leaderboard_page_cache = {}  # {page: rendered entries} - dropped when a position on the page changes
+rank_stats_cache = None  # (sorted MMR array, stats) of ranked players - dropped on every ranking update
+leaderboard_stats = {
+    'triggers': 0,  # Changes to the visible top
+    'ignored': 0,  # Updates that left the visible top untouched
+    'debounced': 0,  # Triggers merged into an already pending refresh
+    'edits': 0,
+    'skipped_unchanged': 0,  # Refreshes whose rendered content matched the last edit
+    'lag_count': 0,
+    'lag_total': 0.0,  # Seconds from first change to edit
+    'lag_max': 0.0,
+    'page_hits': 0,
+    'page_misses': 0
+}
+
+# Statement profiler - slow statements are logged with their query plan
+statement_profiler.slow_threshold = float(os.getenv("SLOW_QUERY_MS", 50)) / 1000
+db_report_interval = int(os.getenv("DB_REPORT_MINUTES", 60))
+last_db_report_slow = 0  # statement_profiler.slow_total at the previous report
+
+# Settlement pipeline - side effects of a reported match run on background workers
+settlement_queue = asyncio.Queue()
+settlement_worker_count = 2
+settlement_workers = []
+settlement_max_retries = 3
+settlement_retry_delay = 1.0  # Seconds, doubled on every retry
+settlement_stats = {
+    'enqueued': 0,
+    'completed': 0,
+    'pending': 0,
+    'retries': 0,
+    'failed_stages': 0,
+    'stages': {}  # {stage: {'count', 'total', 'max'}} in seconds
+}
+MATCH_TEXT_CHANNEL_PATTERN = re.compile(r"^📱-hsm(\d+)$")
+MATCH_VOICE_CHANNEL_NAMES = ("🔵 Team 1 Voice", "🟠 Team 2 Voice")
 
 
 # Player MMR system
 player_points = {}  # Dictionary to store player MMR {user_id: mmr}
 player_placement_matches = {}  # Dictionary to track placement matches {user_id: count}
-leaderboard_channel_id = None  # Channel for auto-updating leaderboard
-leaderboard_message = None  # Store leaderboard message
+
+# Rank tiers, queue settings, placement rule and rating model - swapped whole by /reload_config
+config_path = os.getenv("HSM_CONFIG", "hsm_config.json")
+default_rating_model = os.getenv("RATING_MODEL", "flat")  # Used when the config file has no rating section
+config = load_config(config_path, default_rating_model)
+print(f"Loaded config {config.digest} ({config.rating_model.name} rating)")
 results_channel_id = 1395514923785916499  # Channel for match results notifications
 matches_category_id = 1396633160267071548  # Category for creating match channels
 match_counter = 1  # Counter for sequential match names (HSM1, HSM2, HSM3...)
@@ -51,7 +340,7 @@ match_counter = 1  # Counter for sequential match names (HSM1, HSM2, HSM3...)
 bot_status_mode = "available"  # available, maintenance, offline
 
 # Database setup
-conn = sqlite3.connect('hsm_players.db')
+conn = sqlite3.connect('hsm_players.db', factory=ProfiledConnection)
 cursor = conn.cursor()
 
 # Create players table with placement matches
@@ -80,8 +369,498 @@ cursor.execute('''
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
 ''')
+
+# Last known display name of every player, kept current from member events
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS player_names (
+        user_id INTEGER PRIMARY KEY,
+        display_name TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+''')
+
+# Seasons - the soft reset applied when a season ends is stored so the history can be replayed
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS seasons (
+        season_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ended_at TIMESTAMP,
+        reset_target INTEGER,
+        reset_factor REAL
+    )
+''')
+
+# Final standings of ended seasons, clustered by (season_id, position) for page reads
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS season_standings (
+        season_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        points INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        losses INTEGER NOT NULL,
+        PRIMARY KEY (season_id, position)
+    ) WITHOUT ROWID
+''')
+cursor.execute("INSERT INTO seasons (name) SELECT 'Season 1' WHERE NOT EXISTS (SELECT 1 FROM seasons WHERE ended_at IS NULL)")
+
+# MMR change of every player per match or admin edit, for time windowed leaderboards
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS mmr_changes (
+        change_id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        match_id INTEGER,
+        delta INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+''')
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_mmr_changes_created_at ON mmr_changes (created_at)")
+
+# Auto-updating leaderboard messages, one per scope and channel
+cursor.execute('''
+    CREATE TABLE IF NOT EXISTS leaderboard_boards (
+        scope TEXT NOT NULL,
+        channel_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        PRIMARY KEY (scope, channel_id)
+    )
+''')
+# The 2v2 scope showed the global ranking again (every match is 2v2) - its boards become global boards
+cursor.execute("UPDATE OR IGNORE leaderboard_boards SET scope = 'global' WHERE scope = '2v2'")
+cursor.execute("DELETE FROM leaderboard_boards WHERE scope = '2v2'")
 conn.commit()
 
+class RankedSubset:
+    """Ranked players of a subset of the ranking (a server, the current season), in ranking order"""
+    
+    def __init__(self, members=()):
+        self.members = set(members)
+        self.ranked = SortedList()  # (-points, user_id) of ranked members
+
+class PlayerRanking:
+    """In-memory ordered ranking of the players table
+
+    Ranked players are kept in a sorted list keyed by (-points, user_id), so
+    the top of the leaderboard is the start of the list and every update is
+    O(log n). Must be told about every change to points or placement matches.
+    Subsets for the season and server leaderboards are updated with it.
+    """
+    
+    def __init__(self, placement_required=5):
+        self.placement_required = placement_required
+        self.players = {}  # {user_id: (points, placement_matches)}
+        self.ranked = SortedList()  # (-points, user_id) of ranked players
+        self.placement_count = 0  # Players with 1-4 placement matches
+        self.season = RankedSubset()  # Players with a match this season
+        self.guilds = {}  # {guild_id: RankedSubset} of guild members, built when a server board first needs it
+    
+    def load(self, cursor):
+        """Rebuild from the players table in one pass"""
+        cursor.execute("SELECT user_id, points, placement_matches, wins + losses FROM players")
+        rows = cursor.fetchall()
+        self.players = {user_id: (points, placement) for user_id, points, placement, games in rows}
+        self.ranked = SortedList((-points, user_id) for user_id, (points, placement) in self.players.items()
+                                 if placement >= self.placement_required)
+        self.placement_count = sum(1 for points, placement in self.players.values()
+                                   if 0 < placement < self.placement_required)
+        self.season = RankedSubset(user_id for user_id, points, placement, games in rows if games)  # Reset with each season
+        for subset in (self.season, *self.guilds.values()):
+            self.rebuild(subset)
+    
+    def key(self, user_id):
+        """Sort key of a ranked player, None if not ranked"""
+        player = self.players.get(user_id)
+        if not player or player[1] < self.placement_required:
+            return None
+        return (-player[0], user_id)
+    
+    def rebuild(self, subset):
+        subset.ranked = SortedList(key for key in map(self.key, subset.members & self.players.keys()) if key)
+    
+    def add_member(self, subset, user_id):
+        if user_id in subset.members:
+            return
+        subset.members.add(user_id)
+        key = self.key(user_id)
+        if key:
+            subset.ranked.add(key)
+    
+    def remove_member(self, subset, user_id):
+        if user_id not in subset.members:
+            return
+        subset.members.discard(user_id)
+        key = self.key(user_id)
+        if key:
+            subset.ranked.discard(key)
+    
+    def guild_subset(self, guild):
+        """Ranked members of a server, from one pass over its members the first time"""
+        subset = self.guilds.get(guild.id)
+        if subset is None:
+            subset = self.guilds[guild.id] = RankedSubset(member.id for member in guild.members)
+            self.rebuild(subset)
+        return subset
+    
+    def in_placement(self, placement):
+        return 0 < placement < self.placement_required
+    
+    def update(self, user_id, points, placement=None):
+        """Record a player's new points and optionally placement matches
+
+        Returns the (first, last) 0-based positions whose entry changed, or
+        None when the ranked list is untouched.
+        """
+        old = self.players.get(user_id)
+        old_position = None
+        if old:
+            old_points, old_placement = old
+            if old_placement >= self.placement_required:
+                old_position = self.ranked.index((-old_points, user_id))
+                del self.ranked[old_position]
+            self.placement_count -= self.in_placement(old_placement)
+        else:
+            old_placement = 0
+        
+        placement = old_placement if placement is None else placement
+        self.players[user_id] = (points, placement)
+        new_position = None
+        if placement >= self.placement_required:
+            new_position = self.ranked.bisect_left((-points, user_id))
+            self.ranked.add((-points, user_id))
+        self.placement_count += self.in_placement(placement)
+        
+        old_key = (-old[0], user_id) if old and old_placement >= self.placement_required else None
+        new_key = (-points, user_id) if new_position is not None else None
+        for subset in (self.season, *self.guilds.values()):
+            if user_id in subset.members:
+                if old_key:
+                    subset.ranked.remove(old_key)
+                if new_key:
+                    subset.ranked.add(new_key)
+        
+        # Entering or leaving the ranked list shifts every position after it
+        if old_position is None and new_position is None:
+            return None
+        if old_position is None:
+            return new_position, len(self.ranked) - 1
+        if new_position is None:
+            return old_position, len(self.ranked)
+        return min(old_position, new_position), max(old_position, new_position)
+    
+    def position(self, user_id):
+        """1-based leaderboard position of a ranked player, None if not ranked"""
+        player = self.players.get(user_id)
+        if not player or player[1] < self.placement_required:
+            return None
+        return self.ranked.index((-player[0], user_id)) + 1
+    
+    def percentile(self, position):
+        """Share of ranked players below a position, in percent"""
+        if not self.ranked:
+            return 0.0
+        return (len(self.ranked) - position) / len(self.ranked) * 100
+    
+    def top(self, count, offset=0):
+        """[(user_id, points)] of ranked players from position offset + 1"""
+        return [(user_id, -negative_points) for negative_points, user_id in self.ranked[offset:offset + count]]
+    
+    @property
+    def total_count(self):
+        return len(self.players)
+    
+    @property
+    def ranked_count(self):
+        return len(self.ranked)
+
+player_ranking = PlayerRanking(config.placement_matches)
+player_ranking.load(cursor)
+
+class WeeklyGains:
+    """MMR gained per player over a rolling window, fed by the same updates as the ranking"""
+    
+    def __init__(self, window=7 * 24 * 3600):
+        self.window = window
+        self.changes = deque()  # (timestamp, user_id, delta), oldest first
+        self.totals = {}  # {user_id: MMR gained inside the window}
+    
+    def load(self, cursor):
+        """Read the changes inside the window with one indexed query"""
+        cursor.execute("""
+            SELECT CAST(strftime('%s', created_at) AS INTEGER), user_id, delta
+            FROM mmr_changes
+            WHERE created_at >= datetime('now', ?)
+            ORDER BY change_id
+        """, (f"-{self.window} seconds",))
+        self.changes.clear()
+        self.totals.clear()
+        for timestamp, user_id, delta in cursor.fetchall():
+            self.add(timestamp, user_id, delta)
+    
+    def add(self, timestamp, user_id, delta):
+        self.changes.append((timestamp, user_id, delta))
+        self.totals[user_id] = self.totals.get(user_id, 0) + delta
+    
+    def record(self, changes):
+        """Add [(user_id, delta)] that happened now"""
+        now = time.time()
+        for user_id, delta in changes:
+            self.add(now, user_id, delta)
+    
+    def prune(self):
+        cutoff = time.time() - self.window
+        while self.changes and self.changes[0][0] < cutoff:
+            timestamp, user_id, delta = self.changes.popleft()
+            self.totals[user_id] -= delta
+            if not self.totals[user_id]:
+                del self.totals[user_id]
+    
+    def top(self, count):
+        """[(user_id, gain)] of the biggest positive gains"""
+        self.prune()
+        best = heapq.nlargest(count, ((gain, -user_id) for user_id, gain in self.totals.items() if gain > 0))
+        return [(-negative_user_id, gain) for gain, negative_user_id in best]
+
+weekly_gains = WeeklyGains()
+weekly_gains.load(cursor)
+
+def record_mmr_changes(changes, match_id=None):
+    """Store [(user_id, delta)] for the weekly leaderboard - the caller commits"""
+    changes = [(user_id, delta) for user_id, delta in changes if delta]
+    cursor.executemany("INSERT INTO mmr_changes (user_id, match_id, delta) VALUES (?, ?, ?)",
+                       [(user_id, match_id, delta) for user_id, delta in changes])
+    weekly_gains.record(changes)
+
+class PlayerNameCache:
+    """Display names of players in an LRU in front of the player_names table
+
+    Lookups only read memory. Ids that are not known are collected in
+    `pending` and resolved later in batches by fetch(), which also writes
+    the names found in the client cache during lookups.
+    """
+    
+    def __init__(self, conn, capacity=50000):
+        self.conn = conn
+        self.capacity = capacity
+        self.names = OrderedDict()  # {user_id: display_name}, least recently used first
+        self.pending = set()
+        self.unsaved = {}  # {user_id: display_name} found in the client cache, not yet in the table
+        self.not_found = set()  # Deleted accounts - never fetched again
+        self.stats = {'hits': 0, 'client_hits': 0, 'misses': 0, 'fetched': 0, 'writes': 0}
+    
+    def load(self):
+        """Fill the LRU with the most recently updated names"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT user_id, display_name FROM player_names ORDER BY updated_at DESC LIMIT ?", (self.capacity,))
+        for user_id, display_name in reversed(cursor.fetchall()):
+            self.names[user_id] = display_name
+    
+    def put(self, user_id, display_name):
+        self.names[user_id] = display_name
+        self.names.move_to_end(user_id)
+        while len(self.names) > self.capacity:
+            self.names.popitem(last=False)
+    
+    def remember(self, users):
+        """Store the display names of members or users, writing only the changed ones"""
+        changed = [(user.id, user.display_name) for user in users if self.names.get(user.id) != user.display_name]
+        for user_id, display_name in changed:
+            self.put(user_id, display_name)
+            self.pending.discard(user_id)
+            self.unsaved.pop(user_id, None)
+        self.write(changed)
+    
+    def write(self, changed):
+        """Upsert [(user_id, display_name)] in one transaction"""
+        if not changed:
+            return
+        self.conn.executemany("""
+            INSERT INTO player_names (user_id, display_name, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(user_id) DO UPDATE SET display_name = excluded.display_name, updated_at = excluded.updated_at
+        """, changed)
+        self.conn.commit()
+        self.stats['writes'] += len(changed)
+    
+    def lookup(self, user_ids):
+        """{user_id: display_name or None} from memory only"""
+        names = {}
+        for user_id in user_ids:
+            name = self.names.get(user_id)
+            if name is not None:
+                self.names.move_to_end(user_id)
+                self.stats['hits'] += 1
+            else:
+                user = bot.get_user(user_id)
+                if user:
+                    self.stats['client_hits'] += 1
+                    name = user.display_name
+                    self.put(user_id, name)
+                    self.unsaved[user_id] = name
+                else:
+                    self.stats['misses'] += 1
+                    if user_id not in self.not_found:
+                        self.pending.add(user_id)
+            names[user_id] = name
+        return names
+    
+    async def fetch(self):
+        """Resolve pending ids from the table, then the guilds, then the API. Returns the resolved ids"""
+        unsaved, self.unsaved = self.unsaved, {}
+        self.write(list(unsaved.items()))
+        
+        user_ids = list(self.pending)
+        self.pending.clear()
+        
+        # Names evicted from the LRU are still in the table
+        cursor = self.conn.cursor()
+        for chunk in chunks(user_ids):
+            cursor.execute(f"SELECT user_id, display_name FROM player_names WHERE user_id IN ({','.join('?' * len(chunk))})", chunk)
+            for user_id, display_name in cursor.fetchall():
+                self.put(user_id, display_name)
+        
+        missing = [user_id for user_id in user_ids if user_id not in self.names]
+        for guild in bot.guilds:
+            for chunk in chunks(missing, 100):  # Gateway limit per member request
+                try:
+                    self.remember(await guild.query_members(user_ids=chunk, limit=len(chunk)))
+                except Exception as e:
+                    print(f"Failed to query members in {guild.name}: {e}")
+            missing = [user_id for user_id in missing if user_id not in self.names]
+        
+        # Players that left every guild
+        for user_id in missing:
+            try:
+                self.remember([await rest(PRIORITY_COSMETIC, 'user_fetch', bot.fetch_user, user_id)])
+            except discord.NotFound:
+                self.not_found.add(user_id)
+        
+        resolved = [user_id for user_id in user_ids if user_id in self.names]
+        self.stats['fetched'] += len(resolved)
+        return resolved
+    
+    @property
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['client_hits'] + self.stats['misses']
+        return (self.stats['hits'] + self.stats['client_hits']) / lookups * 100 if lookups else 0.0
+
+player_names = PlayerNameCache(conn)
+player_names.load()
+player_names_fetch_task = None
+
+def resolve_player_names(user_ids, fallback=lambda user_id: f"<@{user_id}>"):
+    """{user_id: display name} for every id - unknown players get the fallback until fetched"""
+    global player_names_fetch_task
+    names = player_names.lookup(user_ids)
+    if (player_names.pending or player_names.unsaved) and (player_names_fetch_task is None or player_names_fetch_task.done()):
+        player_names_fetch_task = asyncio.create_task(fetch_missing_player_names())
+    return {user_id: name if name is not None else fallback(user_id) for user_id, name in names.items()}
+
+async def fetch_missing_player_names():
+    """Fetch pending names and re-render the leaderboard pages showing them"""
+    try:
+        resolved = await player_names.fetch()
+    except Exception as e:
+        print(f"Failed to fetch player names: {e}")
+        return
+    
+    for user_id in resolved:
+        position = player_ranking.position(user_id)
+        if position:
+            invalidate_leaderboard_pages(position - 1, position - 1)
+    if resolved and leaderboard_boards:
+        schedule_leaderboard_refresh()
+
+class PlayerProfileCache:
+    """Rendered /rank profiles in an LRU, each valid while its player's version is unchanged
+
+    Every change to a player's points or placement bumps their version, so a
+    stale profile is never served. Leaderboard position is not part of the
+    cached profile - it moves with other players' matches and is read from
+    the ranking when the profile is shown.
+    """
+    
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.profiles = OrderedDict()  # {user_id: (version, config digest, profile)}, least recently used first
+        self.versions = {}  # {user_id: version}
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+    
+    def version(self, user_id):
+        return self.versions.get(user_id, 0)
+    
+    def invalidate(self, user_id):
+        self.versions[user_id] = self.version(user_id) + 1
+        if self.profiles.pop(user_id, None) is not None:
+            self.stats['invalidations'] += 1
+    
+    def clear(self):
+        """Drop every profile, for changes that touch all players"""
+        self.stats['invalidations'] += len(self.profiles)
+        self.profiles.clear()
+    
+    def get(self, user_id):
+        entry = self.profiles.get(user_id)
+        if entry and entry[0] == self.version(user_id) and entry[1] == config.digest:
+            self.profiles.move_to_end(user_id)
+            self.stats['hits'] += 1
+            return entry[2]
+        self.stats['misses'] += 1
+        return None
+    
+    def put(self, user_id, version, profile):
+        """Store a profile rendered at a version, unless the player changed since"""
+        if version != self.version(user_id):
+            return
+        self.profiles[user_id] = (version, config.digest, profile)
+        self.profiles.move_to_end(user_id)
+        while len(self.profiles) > self.capacity:
+            self.profiles.popitem(last=False)
+            self.stats['evictions'] += 1
+    
+    @property
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups * 100 if lookups else 0.0
+
+profile_cache = PlayerProfileCache(int(os.getenv("PROFILE_CACHE_SIZE", 10000)))
+
+def apply_ranking_updates(updates, gained=False):
+    """Apply [(user_id, points, placement or None)] to the ranking and refresh the boards whose top changed
+
+    A placement value means the player just played a match. gained tells
+    that MMR changes were recorded for the weekly leaderboard.
+    """
+    global rank_stats_cache
+    rank_stats_cache = None
+    first_changed = None
+    for user_id, points, placement in updates:
+        if placement is not None:
+            player_ranking.add_member(player_ranking.season, user_id)
+        profile_cache.invalidate(user_id)
+        changed = player_ranking.update(user_id, points, placement)
+        if changed:
+            invalidate_leaderboard_pages(*changed)
+            first_changed = changed[0] if first_changed is None else min(first_changed, changed[0])
+    
+    # One settlement event refreshes every scope it touches
+    if any(LEADERBOARD_SCOPES[scope].affected(board, first_changed, gained)
+           for (scope, channel_id), board in leaderboard_boards.items()):
+        schedule_leaderboard_refresh()
+    else:
+        leaderboard_stats['ignored'] += 1
+
+def record_admin_changes(report):
+    """Feed the players changed by an admin result edit to the ranking and the weekly gains"""
+    record_mmr_changes([(user_id, player['new_points'] - player['old_points']) for user_id, player in report['players'].items()])
+    conn.commit()
+    apply_ranking_updates([(user_id, player['new_points'], None) for user_id, player in report['players'].items()],
+                          gained=bool(report['players']))
+
+def invalidate_leaderboard_pages(first, last):
+    """Drop cached leaderboard pages holding positions first..last"""
+    for page in range(first // LEADERBOARD_SIZE, last // LEADERBOARD_SIZE + 1):
+        leaderboard_page_cache.pop(page, None)
+
 def get_player_points(user_id):
     """Get player MMR from database"""
     cursor.execute("SELECT points FROM players WHERE user_id = ?", (user_id,))
@@ -92,13 +871,9 @@ def get_player_points(user_id):
         # New player starts with 1000 points and 0 placement matches
         cursor.execute("INSERT INTO players (user_id, points, wins, losses, placement_matches) VALUES (?, 1000, 0, 0, 0)", (user_id,))
         conn.commit()
+        player_ranking.update(user_id, 1000, 0)
         return 1000
 
-def update_player_points(user_id, points):
-    """Update player MMR in database"""
-    cursor.execute("UPDATE players SET points = ? WHERE user_id = ?", (points, user_id))
-    conn.commit()
-
 def get_player_placement_matches(user_id):
     """Get player's placement matches count"""
     cursor.execute("SELECT placement_matches FROM players WHERE user_id = ?", (user_id,))
@@ -109,26 +884,27 @@ def get_player_placement_matches(user_id):
         # New player starts with 0 placement matches
         cursor.execute("INSERT INTO players (user_id, points, wins, losses, placement_matches) VALUES (?, 1000, 0, 0, 0)", (user_id,))
         conn.commit()
+        player_ranking.update(user_id, 1000, 0)
         return 0
 
-def increment_placement_matches(user_id):
-    """Increment player's placement matches count"""
-    cursor.execute("UPDATE players SET placement_matches = placement_matches + 1 WHERE user_id = ?", (user_id,))
-    conn.commit()
-
-def is_player_ranked(user_id):
-    """Check if player has completed placement matches"""
-    return get_player_placement_matches(user_id) >= 5
+# Rank role ids per guild {guild_id: {rank_key: role_id}} - filled at startup by provision_rank_roles
+rank_role_cache = {}
+retired_rank_roles = {}  # {guild_id: {role_id}} - roles of tiers replaced by a config reload, removed by the next sync
+rank_role_locks = {}  # {guild_id: asyncio.Lock} - one provisioning run per guild at a time
 
-async def get_or_create_rank_role(guild, rank_name, rank_color):
+async def get_or_create_rank_role(guild, rank_name, rank_color, roles_by_name=None):
     """Get or create a rank role"""
     # Look for existing role
-    role = discord.utils.get(guild.roles, name=rank_name)
+    if roles_by_name is not None:
+        role = roles_by_name.get(rank_name)
+    else:
+        role = discord.utils.get(guild.roles, name=rank_name)
     
     if not role:
         try:
             # Create new role if it doesn't exist
-            role = await guild.create_role(
+            role = await rest(
+                PRIORITY_PROVISION, 'role_create', guild.create_role,
                 name=rank_name,
                 color=discord.Color(rank_color),
                 reason="Auto-created rank role"
@@ -143,120 +919,161 @@ async def get_or_create_rank_role(guild, rank_name, rank_color):
     
     return role
 
-async def update_player_rank_role(member, new_mmr):
+def index_rank_roles(guild):
+    """Map rank keys to the guild's existing rank roles in one pass over guild.roles"""
+    roles_by_name = {}
+    for role in guild.roles:
+        roles_by_name.setdefault(role.name, role)
+    
+    cache = {}
+    for rank in config.ranks.ranks:
+        role = roles_by_name.get(rank.role_name)
+        if role:
+            cache[rank.key] = role.id
+    return cache, roles_by_name
+
+async def provision_rank_roles(guild):
+    """Resolve or create every rank role of a guild and cache their ids"""
+    lock = rank_role_locks.setdefault(guild.id, asyncio.Lock())
+    async with lock:
+        cache, roles_by_name = index_rank_roles(guild)
+        for rank in config.ranks.ranks:
+            if rank.key not in cache:
+                role = await get_or_create_rank_role(guild, rank.role_name, rank.color, roles_by_name)
+                if role:
+                    cache[rank.key] = role.id
+        rank_role_cache[guild.id] = cache
+
+def refresh_rank_role_cache(guild):
+    """Re-read the cached rank role ids of a guild without creating roles"""
+    rank_role_cache[guild.id], _ = index_rank_roles(guild)
+
+def get_rank_role_changes(member, rank_role_ids, new_role):
+    """Rank roles to add and remove so `new_role` is the member's only one, or None if already correct"""
+    to_remove = [role for role in member.roles if role.id in rank_role_ids and role != new_role]
+    to_add = [new_role] if new_role and new_role not in member.roles else []
+    if not to_add and not to_remove:
+        return None
+    return to_add, to_remove
+
+async def remove_rank_roles(member, rank_role_ids, new_role, reason):
+    """Take every rank role but `new_role` off a member"""
+    stale = [role for role in member.roles if role.id in rank_role_ids and role != new_role]
+    if stale:
+        await member.remove_roles(*stale, reason=reason)
+    return bool(stale)
+
+async def add_rank_role(member, new_role, reason):
+    if new_role is None or new_role in member.roles:
+        return False
+    await member.add_roles(new_role, reason=reason)
+    return True
+
+async def apply_rank_role(member, rank_role_ids, new_role, priority, reason):
+    """Swap a member's rank role with one paced member_edit call per REST request
+
+    Both calls diff against the member's roles when they run and only touch
+    rank roles, so roles given by moderators or other bots while the calls
+    were queued are left alone.
+    """
+    removed, added = await asyncio.gather(
+        rest(priority, 'member_edit', remove_rank_roles, member, rank_role_ids, new_role, reason),
+        rest(priority, 'member_edit', add_rank_role, member, new_role, reason)
+    )
+    return removed or added
+
+async def sync_guild_rank_roles(guild):
+    """Bring every member's rank role in line with the players table"""
+    started = time.perf_counter()
+    report = {'guild': guild.name, 'scanned': 0, 'changes': 0, 'failed': 0, 'duration': 0.0}
+    
+    if guild.id not in rank_role_cache:
+        await provision_rank_roles(guild)
+    guild_roles = rank_role_cache.get(guild.id, {})
+    rank_role_ids = set(guild_roles.values()) | retired_rank_roles.get(guild.id, set())
+    
+    # Role of each rank, resolved once for the whole run
+    ranks = config.ranks
+    rank_roles = [guild.get_role(guild_roles[rank.key]) if rank.key in guild_roles else None for rank in ranks.ranks]
+    
+    # All ranked players in a single query, ranked in one vectorized pass
+    cursor.execute("SELECT user_id, points FROM players WHERE placement_matches >= ?", (config.placement_matches,))
+    ranked_rows = cursor.fetchall()
+    ranked_indices = ranks.rank_indices(np.array([points for user_id, points in ranked_rows], dtype=np.int64))
+    member_ranks = dict(zip((user_id for user_id, points in ranked_rows), ranked_indices.tolist()))
+    
+    futures = []
+    for member in guild.members:
+        report['scanned'] += 1
+        if report['scanned'] % 1000 == 0:
+            await asyncio.sleep(0)  # Let the event loop breathe on large guilds
+        if member.bot:
+            continue
+        
+        index = member_ranks.get(member.id)
+        new_role = rank_roles[index] if index is not None else None
+        
+        # The queued call diffs again against the roles the member has by then
+        if get_rank_role_changes(member, rank_role_ids, new_role) is not None:
+            futures.append(apply_rank_role(member, rank_role_ids, new_role, PRIORITY_COSMETIC, "Rank sync"))
+    
+    # Only the differences hit the API, through the paced queue
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            report['failed'] += 1
+        elif result:
+            report['changes'] += 1
+    if not report['failed']:
+        retired_rank_roles.pop(guild.id, None)
+    
+    report['duration'] = time.perf_counter() - started
+    return report
+
+async def sync_all_rank_roles():
+    """Run the rank role sync for every guild"""
+    global last_rank_sync
+    async with rank_sync_lock:
+        reports = []
+        for guild in bot.guilds:
+            report = await sync_guild_rank_roles(guild)
+            print(f"AUTO RANK UPDATE: {report['guild']} - scanned {report['scanned']} members, "
+                  f"applied {report['changes']} changes ({report['failed']} failed) in {report['duration']:.2f}s")
+            reports.append(report)
+        last_rank_sync = reports
+        return reports
+
+async def update_player_rank_role(member, new_mmr, priority=PRIORITY_SETTLEMENT):
     """Update player's rank role based on their MMR"""
     if not member or not member.guild:
         return
     
     guild = member.guild
-    rank_name, rank_emoji = get_rank_from_mmr(new_mmr)
+    new_rank_key = config.ranks.get_rank(new_mmr).key
     
-    # Get rank data for color
-    rank_data = None
-    for rank_key, data in RANK_SYSTEM.items():
-        if data["name"] == rank_name:
-            rank_data = data
-            break
-    
-    if not rank_data:
+    guild_roles = rank_role_cache.get(guild.id)
+    if guild_roles is None:
+        # Roles are provisioned in the background, never in the middle of a settlement
+        print(f"Rank roles not provisioned yet for {guild.name}, skipping {member.display_name}")
+        asyncio.create_task(provision_rank_roles(guild))
         return
     
-    # Remove old rank roles
-    for rank_key, data in RANK_SYSTEM.items():
-        old_role = discord.utils.get(guild.roles, name=data["role_name"])
-        if old_role and old_role in member.roles:
-            try:
-                await member.remove_roles(old_role, reason="Rank update")
-            except:
-                pass
-    
-    # Add new rank role
-    new_role = await get_or_create_rank_role(guild, rank_data["role_name"], rank_data["color"])
-    if new_role:
-        try:
-            await member.add_roles(new_role, reason="Earned new rank")
-        except:
-            pass
-
-RANK_SYSTEM = {
-    "UNRANKED": {
-        "role_name": "UNRANKED",
-        "min_mmr": 700,
-        "max_mmr": 799,
-        "name": "UNRANKED",
-        "emoji": "<:0UNRANKED:1395077317407277216>",
-        "color": 0x4E4E4E
-    },
-    "SILVER": {
-        "role_name": "SILVER SEEKER",
-        "min_mmr": 800,
-        "max_mmr": 949,
-        "name": "SILVER SEEKER",
-        "emoji": "<:1SILVER:1395077319563149422>",
-        "color": 0xBDBDBD
-    },
-    "PLATINUM": {
-        "role_name": "PLATINUM SEEKER",
-        "min_mmr": 950,
-        "max_mmr": 1099,
-        "name": "PLATINUM SEEKER",
-        "emoji": "<:2PLATINUM:1395077322213822564>",
-        "color": 0x3DDBEE
-    },
-    "CRYSTAL": {
-        "role_name": "CRYSTAL SEEKER",
-        "min_mmr": 1100,
-        "max_mmr": 1249,
-        "name": "CRYSTAL SEEKER",
-        "emoji": "<:3CRYSTAL:1395077324382404719>",
-        "color": 0x9BC2F1
-    },
-    "ELITE": {
-        "role_name": "ELITE SEEKER",
-        "min_mmr": 1250,
-        "max_mmr": 1449,
-        "name": "ELITE SEEKER",
-        "emoji": "<:4ELITE:1395077326416642078>",
-        "color": 0x3BF695
-    },
-    "MASTER": {
-        "role_name": "MASTER SEEKER",
-        "min_mmr": 1450,
-        "max_mmr": 1699,
-        "name": "MASTER SEEKER",
-        "emoji": "<:5Mastermin:1395077330963267776>",
-        "color": 0xFF0000
-    },
-    "LEGENDARY": {
-        "role_name": "LEGENDARY SEEKER",
-        "min_mmr": 1700,
-        "max_mmr": 9999,
-        "name": "LEGENDARY SEEKER",
-        "emoji": "<:6LEGENDARYmin:1395077334003876012>",
-        "color": 0xF3C900
-    }
-}
-
-def get_rank_from_mmr(mmr):
-    """Get rank based on MMR using new rank system"""
-    for rank_key, rank_data in RANK_SYSTEM.items():
-        if rank_data["min_mmr"] <= mmr <= rank_data["max_mmr"]:
-            return rank_data["name"], rank_data["emoji"]
+    new_role_id = guild_roles.get(new_rank_key)
+    new_role = guild.get_role(new_role_id) if new_role_id else None
     
-    # Default to UNRANKED if below 700
-    if mmr < 700:
-        return RANK_SYSTEM["UNRANKED"]["name"], RANK_SYSTEM["UNRANKED"]["emoji"]
+    # Nothing to do if the member already has the right rank role
+    rank_role_ids = set(guild_roles.values()) | retired_rank_roles.get(guild.id, set())
+    if get_rank_role_changes(member, rank_role_ids, new_role) is None:
+        return
     
-    # Default to LEGENDARY if above 1700
-    return RANK_SYSTEM["LEGENDARY"]["name"], RANK_SYSTEM["LEGENDARY"]["emoji"]
+    try:
+        await apply_rank_role(member, rank_role_ids, new_role, priority, "Rank update")
+    except Exception as e:
+        print(f"Error updating rank role for {member.display_name}: {e}")
 
 def create_leaderboard_embed():
     """Create leaderboard embed - only shows ranked players"""
-    # Get all ranked players from database
-    cursor.execute("SELECT user_id, points FROM players WHERE placement_matches >= 5 ORDER BY points DESC LIMIT 10")
-    ranked_players = cursor.fetchall()
-    
-    if not ranked_players:
+    if not player_ranking.ranked_count:
         embed = discord.Embed(
             title="🏆 HeatSeeker Leaderboard",
             description="لا يوجد لاعبين مرتبين بعد!\nأكمل 5 مباريات تأهيلية لتظهر في اللوحة.",
@@ -275,51 +1092,223 @@ def create_leaderboard_embed():
         color=0xFFD700
     )
     
-    leaderboard_text = ""
-    for i, (user_id, mmr) in enumerate(ranked_players):
-        try:
-            user = bot.get_user(user_id)
-            if user:
-                rank_name, rank_emoji = get_rank_from_mmr(mmr)
-                position_emoji = ["🥇", "🥈", "🥉"][i] if i < 3 else f"**{i+1}.**"
-                leaderboard_text += f"{position_emoji} {rank_emoji} {user.display_name}\n`{mmr} MMR - {rank_name}`\n\n"
-        except:
-            continue
-    
-    if not leaderboard_text:
-        leaderboard_text = "لا يوجد لاعبين مرتبين"
-    
     embed.add_field(
         name="🏅 Top 10 Ranked Players",
-        value=leaderboard_text,
+        value=get_leaderboard_page(0),
         inline=False
     )
     
-    # Get total players and placement players count
-    cursor.execute("SELECT COUNT(*) FROM players")
-    total_players = cursor.fetchone()[0]
-    cursor.execute("SELECT COUNT(*) FROM players WHERE placement_matches >= 5")
-    ranked_count = cursor.fetchone()[0]
-    cursor.execute("SELECT COUNT(*) FROM players WHERE placement_matches < 5 AND placement_matches > 0")
-    placement_count = cursor.fetchone()[0]
-    
     embed.add_field(
         name="📊 إحصائيات النظام",
-        value=f"**لاعبين مرتبين:** {ranked_count}\n**في المباريات التأهيلية:** {placement_count}\n**إجمالي اللاعبين:** {total_players}",
+        value=f"**لاعبين مرتبين:** {player_ranking.ranked_count}\n**في المباريات التأهيلية:** {player_ranking.placement_count}\n**إجمالي اللاعبين:** {player_ranking.total_count}",
         inline=False
     )
     
-    embed.set_footer(text="يتم التحديث كل 10 دقائق • أخر تحديث")
+    embed.set_footer(text="يتم التحديث بعد كل نتيجة • أخر تحديث")
     embed.timestamp = datetime.now()
     
     return embed
 
+def leaderboard_page_count():
+    return max(1, -(-player_ranking.ranked_count // LEADERBOARD_SIZE))
+
+def get_leaderboard_page(page):
+    """Rendered entries of a leaderboard page, cached until a position on it changes"""
+    text = leaderboard_page_cache.get(page)
+    if text is not None:
+        leaderboard_stats['page_hits'] += 1
+        return text
+    leaderboard_stats['page_misses'] += 1
+    
+    first_position = page * LEADERBOARD_SIZE
+    entries = player_ranking.top(LEADERBOARD_SIZE, first_position)
+    text = render_leaderboard_entries(entries, lambda mmr: f"{mmr} MMR", first_position + 1) or "لا يوجد لاعبين مرتبين"
+    leaderboard_page_cache[page] = text
+    return text
+
+def create_leaderboard_page_embed(page):
+    """Embed of one leaderboard page"""
+    first_position = page * LEADERBOARD_SIZE + 1
+    embed = discord.Embed(
+        title="🏆 HeatSeeker Leaderboard",
+        description=f"المراكز {first_position} - {first_position + LEADERBOARD_SIZE - 1}",
+        color=0xFFD700
+    )
+    embed.add_field(name="🏅 Ranked Players", value=get_leaderboard_page(page), inline=False)
+    embed.set_footer(text=f"الصفحة {page + 1}/{leaderboard_page_count()} • {player_ranking.ranked_count} لاعب مرتب")
+    return embed
+
+def create_leaderboard_page_view(page):
+    """Navigation buttons for a leaderboard page - the target page lives in each custom_id"""
+    last_page = leaderboard_page_count() - 1
+    view = discord.ui.View(timeout=None)
+    view.add_item(LeaderboardPageButton('prev', max(0, page - 1), disabled=page <= 0))
+    view.add_item(LeaderboardJumpButton())
+    view.add_item(LeaderboardPageButton('next', min(last_page, page + 1), disabled=page >= last_page))
+    return view
+
+def render_leaderboard_entries(entries, value_text, first_position=1):
+    """Leaderboard rows for [(user_id, value)], with names resolved in one pass"""
+    names = resolve_player_names([user_id for user_id, value in entries])
+    ranks = config.ranks
+    indices = ranks.rank_indices(np.array([player_ranking.players.get(user_id, (0, 0))[0] for user_id, value in entries], dtype=np.int64))
+    text = ""
+    for position, (user_id, value), index in zip(itertools.count(first_position), entries, indices.tolist()):
+        rank_name, rank_emoji = ranks.ranks[index].name, ranks.ranks[index].emoji
+        position_emoji = ["🥇", "🥈", "🥉"][position - 1] if position <= 3 else f"**{position}.**"
+        text += f"{position_emoji} {rank_emoji} {names[user_id]}\n`{value_text(value)} - {rank_name}`\n\n"
+    return text
+
+class LeaderboardScope:
+    """A view over the shared player ranking, shown on its own boards
+
+    subset(guild) gives the RankedSubset of the scope, which the ranking
+    keeps in order on every update, or None for the whole ranking. Either
+    way the top is a slice, so no query or scan is needed.
+    """
+    
+    paginated = False
+    
+    def __init__(self, key, title, description, subset=None):
+        self.key = key
+        self.title = title
+        self.description = description
+        self.subset = subset
+    
+    def top(self, guild, count=LEADERBOARD_SIZE):
+        """([(user_id, points)], cutoff) - cutoff is the ranking position of the last entry shown"""
+        if self.subset is None:
+            entries = player_ranking.top(count)
+            return entries, len(entries) - 1 if len(entries) == count else float('inf')
+        
+        ranked = self.subset(guild).ranked
+        entries = [(user_id, -negative_points) for negative_points, user_id in ranked[:count]]
+        if len(entries) < count:
+            return entries, float('inf')  # Any ranked change can add an entry
+        return entries, player_ranking.ranked.index(ranked[count - 1])
+    
+    def affected(self, board, first_changed, gained):
+        """Whether a ranking change starting at position first_changed can change this board"""
+        return first_changed is not None and first_changed <= board['cutoff']
+    
+    def render(self, guild):
+        """(embed, view, cutoff) of a board"""
+        entries, cutoff = self.top(guild)
+        embed = discord.Embed(title=self.title, description=self.description, color=0xFFD700)
+        embed.add_field(
+            name=f"🏅 Top {LEADERBOARD_SIZE}",
+            value=render_leaderboard_entries(entries, lambda mmr: f"{mmr} MMR") or "لا يوجد لاعبين مرتبين",
+            inline=False
+        )
+        embed.set_footer(text="يتم التحديث بعد كل نتيجة • أخر تحديث")
+        embed.timestamp = datetime.now()
+        return embed, None, cutoff
+
+class GlobalLeaderboardScope(LeaderboardScope):
+    """The main leaderboard with counters and page navigation"""
+    
+    paginated = True
+    
+    def render(self, guild):
+        entries, cutoff = self.top(guild)
+        return create_leaderboard_embed(), create_leaderboard_page_view(0), cutoff
+
+class WeeklyGainsScope(LeaderboardScope):
+    """Players who gained the most MMR in the last 7 days"""
+    
+    def top(self, guild, count=LEADERBOARD_SIZE):
+        return weekly_gains.top(count), float('inf')
+    
+    def affected(self, board, first_changed, gained):
+        return gained
+    
+    def render(self, guild):
+        entries, cutoff = self.top(guild)
+        embed = discord.Embed(title=self.title, description=self.description, color=0x00FF00)
+        embed.add_field(
+            name=f"📈 Top {LEADERBOARD_SIZE}",
+            value=render_leaderboard_entries(entries, lambda gain: f"+{gain} MMR") or "لا يوجد تقدم هذا الأسبوع",
+            inline=False
+        )
+        embed.set_footer(text="آخر 7 أيام • أخر تحديث")
+        embed.timestamp = datetime.now()
+        return embed, None, cutoff
+
+LEADERBOARD_SCOPES = {
+    'global': GlobalLeaderboardScope('global', "🏆 HeatSeeker Leaderboard", "أفضل لاعبي HeatSeeker المرتبين حسب MMR"),
+    'guild': LeaderboardScope('guild', "🏠 Server Leaderboard", "أفضل لاعبي هذا السيرفر",
+                              lambda guild: player_ranking.guild_subset(guild) if guild else RankedSubset()),
+    'season': LeaderboardScope('season', "🗓️ Season Leaderboard", "أفضل لاعبي الموسم الحالي",
+                               lambda guild: player_ranking.season),
+    'weekly': WeeklyGainsScope('weekly', "🔥 Weekly Gainers", "أكثر اللاعبين تقدماً في MMR هذا الأسبوع")
+}
+
+async def show_leaderboard_page(interaction: discord.Interaction, page):
+    """Open a page privately from the public board, or move an already private board"""
+    page = max(0, min(page, leaderboard_page_count() - 1))
+    embed = create_leaderboard_page_embed(page)
+    view = create_leaderboard_page_view(page)
+    if interaction.message and interaction.message.flags.ephemeral:
+        await interaction.response.edit_message(embed=embed, view=view)
+    else:
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+
+class LeaderboardPageButton(discord.ui.DynamicItem[discord.ui.Button], template=r'leaderboard:(?P<direction>prev|next):(?P<page>\d+)'):
+    def __init__(self, direction, page, disabled=False):
+        super().__init__(discord.ui.Button(
+            label='السابق' if direction == 'prev' else 'التالي',
+            emoji='◀️' if direction == 'prev' else '▶️',
+            style=discord.ButtonStyle.secondary,
+            custom_id=f'leaderboard:{direction}:{page}',
+            disabled=disabled
+        ))
+        self.direction = direction
+        self.page = page
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['direction'], int(match['page']))
+    
+    @instrument()
+    async def callback(self, interaction: discord.Interaction):
+        await show_leaderboard_page(interaction, self.page)
+
+class LeaderboardJumpButton(discord.ui.DynamicItem[discord.ui.Button], template=r'leaderboard:jump'):
+    def __init__(self):
+        super().__init__(discord.ui.Button(
+            label='انتقال لصفحة',
+            emoji='🔢',
+            style=discord.ButtonStyle.primary,
+            custom_id='leaderboard:jump'
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls()
+    
+    @instrument()
+    async def callback(self, interaction: discord.Interaction):
+        await interaction.response.send_modal(LeaderboardJumpModal())
+
+class LeaderboardJumpModal(discord.ui.Modal, title='انتقال لصفحة'):
+    page = discord.ui.TextInput(label='رقم الصفحة', placeholder='1', max_length=7)
+    
+    @instrument()
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            page = int(self.page.value.strip()) - 1
+        except ValueError:
+            await interaction.response.send_message("❌ رقم الصفحة غير صحيح", ephemeral=True)
+            return
+        await show_leaderboard_page(interaction, page)
+
 # Button View Classes
 class QueueView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)  # Persistent view
     
     @discord.ui.button(label='Join Queue', style=discord.ButtonStyle.success, emoji='➕', custom_id='join_queue')
+    @instrument()
     async def join_queue(self, interaction: discord.Interaction, button: discord.ui.Button):
         user = interaction.user
         
@@ -334,14 +1323,14 @@ class QueueView(discord.ui.View):
             return
         
         # Check if user is in an active match
-        for match_name, match_info in active_matches.items():
-            if user in match_info['players']:
-                await interaction.response.send_message(f"❌ أنت حالياً في مباراة {match_name}! أنهِ المباراة أولاً.", ephemeral=True)
-                return
+        match_name = player_active_match.get(user.id)
+        if match_name:
+            await interaction.response.send_message(f"❌ أنت حالياً في مباراة {match_name}! أنهِ المباراة أولاً.", ephemeral=True)
+            return
         
         # Check queue limit
-        if len(user_queue) >= queue_limit:
-            await interaction.response.send_message(f"❌ الطابور مكتمل! الحد الأقصى {queue_limit} مستخدم.", ephemeral=True)
+        if len(user_queue) >= config.queue_limit:
+            await interaction.response.send_message(f"❌ الطابور مكتمل! الحد الأقصى {config.queue_limit} مستخدم.", ephemeral=True)
             return
         
         # Add user to queue
@@ -354,13 +1343,14 @@ class QueueView(discord.ui.View):
         await update_queue_embed()
         
         # Check if queue is full and create match
-        if len(user_queue) == queue_limit:
+        if len(user_queue) == config.queue_limit:
             await create_match(interaction.guild, list(user_queue))
             user_queue.clear()
             user_last_activity.clear()
             await update_queue_embed()  # Update again after clearing queue
     
     @discord.ui.button(label='Leave Queue', style=discord.ButtonStyle.danger, emoji='➖', custom_id='leave_queue')
+    @instrument()
     async def leave_queue(self, interaction: discord.Interaction, button: discord.ui.Button):
         user = interaction.user
         
@@ -376,6 +1366,7 @@ class QueueView(discord.ui.View):
         await update_queue_embed()
     
     @discord.ui.button(label='Queue Status', style=discord.ButtonStyle.primary, emoji='📋', custom_id='queue_status')
+    @instrument()
     async def queue_status(self, interaction: discord.Interaction, button: discord.ui.Button):
         if not user_queue:
             await interaction.response.send_message("📋 الطابور فارغ حالياً!", ephemeral=True)
@@ -390,6 +1381,7 @@ class QueueView(discord.ui.View):
             await interaction.response.send_message(f"📋 عدد المستخدمين في الطابور: {len(user_queue)}\nأنت لست في الطابور حالياً.", ephemeral=True)
     
     @discord.ui.button(label='Ping', style=discord.ButtonStyle.secondary, emoji='🔔', custom_id='ping')
+    @instrument()
     async def ping(self, interaction: discord.Interaction, button: discord.ui.Button):
         latency = round(bot.latency * 1000)
         await interaction.response.send_message(f"🏓 Pong! زمن الاستجابة: {latency}ms", ephemeral=True)
@@ -400,6 +1392,7 @@ class AdminView(discord.ui.View):
         super().__init__(timeout=None)
     
     @discord.ui.button(label='Next User', style=discord.ButtonStyle.success, emoji='⏭️', custom_id='next_user')
+    @instrument()
     async def next_user(self, interaction: discord.Interaction, button: discord.ui.Button):
         # Check permissions
         member = interaction.guild.get_member(interaction.user.id)
@@ -420,13 +1413,14 @@ class AdminView(discord.ui.View):
         # Try to DM the user
         try:
             guild_name = interaction.guild.name if interaction.guild else "السيرفر"
-            await next_user_obj.send(f"🎯 تم استدعاؤك من الطابور في {guild_name}!")
+            await rest(PRIORITY_QUEUE_DISPLAY, 'dm', next_user_obj.send, f"🎯 تم استدعاؤك من الطابور في {guild_name}!")
         except:
             pass
         
         await update_queue_embed(interaction.message)
     
     @discord.ui.button(label='Clear Queue', style=discord.ButtonStyle.danger, emoji='🗑️', custom_id='clear_queue')
+    @instrument()
     async def clear_queue(self, interaction: discord.Interaction, button: discord.ui.Button):
         # Check permissions
         member = interaction.guild.get_member(interaction.user.id)
@@ -451,6 +1445,7 @@ class BotStatusAdminView(discord.ui.View):
         super().__init__(timeout=300)
     
     @discord.ui.button(label='🟢 متاح', style=discord.ButtonStyle.success, emoji='🟢')
+    @instrument()
     async def set_available(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Set bot status to available - ADMIN ONLY"""
         # Check authorization first
@@ -473,7 +1468,7 @@ class BotStatusAdminView(discord.ui.View):
             name="⚡ الحالة الحالية",
             value=f"**🟢 متاح ويعمل**\n"
                   f"🏓 Ping: {round(bot.latency * 1000)}ms\n"
-                  f"🎮 الطابور: {len(user_queue)}/{queue_limit}",
+                  f"🎮 الطابور: {len(user_queue)}/{config.queue_limit}",
             inline=False
         )
         
@@ -482,6 +1477,7 @@ class BotStatusAdminView(discord.ui.View):
         print(f"🟢 ADMIN: {interaction.user.display_name} set bot status to AVAILABLE")
     
     @discord.ui.button(label='🟡 صيانة', style=discord.ButtonStyle.secondary, emoji='🟡')
+    @instrument()
     async def set_maintenance(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Set bot status to maintenance - ADMIN ONLY"""
         # Check authorization first
@@ -513,6 +1509,7 @@ class BotStatusAdminView(discord.ui.View):
         print(f"🟡 ADMIN: {interaction.user.display_name} set bot status to MAINTENANCE")
     
     @discord.ui.button(label='🔴 متوقف', style=discord.ButtonStyle.danger, emoji='🔴')
+    @instrument()
     async def set_offline(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Set bot status to offline - ADMIN ONLY"""
         # Check authorization first
@@ -546,6 +1543,7 @@ class BotStatusAdminView(discord.ui.View):
 # Bot status command - Public viewing, admin controls
 @bot.tree.command(name="status", description="عرض حالة البوت الحالية")
 @app_commands.describe()
+@instrument()
 async def bot_status(interaction: discord.Interaction):
     """Show bot status - everyone can view, only authorized admins can control"""
     
@@ -575,7 +1573,7 @@ async def bot_status(interaction: discord.Interaction):
         name="⚡ الحالة الحالية",
         value=f"**{status_text}**\n"
               f"🏓 Ping: {round(bot.latency * 1000)}ms\n"
-              f"🎮 الطابور: {len(user_queue)}/{queue_limit}",
+              f"🎮 الطابور: {len(user_queue)}/{config.queue_limit}",
         inline=False
     )
     
@@ -613,6 +1611,7 @@ class ResultSelect(discord.ui.Select):
         
         super().__init__(placeholder="اختر الفريق الفائز...", options=options, min_values=1, max_values=1)
     
+    @instrument()
     async def callback(self, interaction: discord.Interaction):
         winner = 1 if self.values[0] == "team1" else 2
         result_text = "Team 1 (Blue)" if winner == 1 else "Team 2 (Orange)"
@@ -621,16 +1620,22 @@ class ResultSelect(discord.ui.Select):
         await process_match_result(interaction, self.match_name, winner, result_text)
 
 class ResultMenuView(discord.ui.View):
-    def __init__(self, match_name: str):
+    def __init__(self, match_name: str, reporter):
         super().__init__(timeout=60)  # 1 minute timeout
         self.match_name = match_name
+        self.reporter = reporter
         self.add_item(ResultSelect(match_name))
+    
+    async def on_timeout(self):
+        # Menu expired without a selection - let another player report
+        release_report_lease(self.match_name, self.reporter)
 
 # Admin Result View Classes
 class AdminMatchSelect(discord.ui.Select):
     def __init__(self, options):
         super().__init__(placeholder="اختر المباراة لتعديل نتيجتها...", options=options, min_values=1, max_values=1)
     
+    @instrument()
     async def callback(self, interaction: discord.Interaction):
         match_id = int(self.values[0])
         
@@ -656,35 +1661,26 @@ class AdminMatchSelect(discord.ui.Select):
         )
         
         # Get player names for display
-        try:
-            p1 = bot.get_user(match_data[1])
-            p2 = bot.get_user(match_data[2])
-            p3 = bot.get_user(match_data[3])
-            p4 = bot.get_user(match_data[4])
-            
-            if p1 and p2 and p3 and p4:
-                current_winner = "Team 1" if match_data[5] == 1 else "Team 2" if match_data[5] == 2 else "ملغية"
-                
-                embed.add_field(
-                    name="🔵 Team 1 (Blue)",
-                    value=f"{p1.display_name}\n{p2.display_name}",
-                    inline=True
-                )
-                
-                embed.add_field(
-                    name="🟠 Team 2 (Orange)",
-                    value=f"{p3.display_name}\n{p4.display_name}",
-                    inline=True
-                )
-                
-                embed.add_field(
-                    name="📊 النتيجة الحالية",
-                    value=f"**الفائز الحالي:** {current_winner}",
-                    inline=False
-                )
-                
-        except:
-            pass
+        names = resolve_player_names(match_data[1:5])
+        current_winner = "Team 1" if match_data[5] == 1 else "Team 2" if match_data[5] == 2 else "ملغية"
+        
+        embed.add_field(
+            name="🔵 Team 1 (Blue)",
+            value=f"{names[match_data[1]]}\n{names[match_data[2]]}",
+            inline=True
+        )
+        
+        embed.add_field(
+            name="🟠 Team 2 (Orange)",
+            value=f"{names[match_data[3]]}\n{names[match_data[4]]}",
+            inline=True
+        )
+        
+        embed.add_field(
+            name="📊 النتيجة الحالية",
+            value=f"**الفائز الحالي:** {current_winner}",
+            inline=False
+        )
         
         embed.add_field(
             name="⚠️ تحذير",
@@ -701,14 +1697,17 @@ class AdminResultActionView(discord.ui.View):
         self.match_data = match_data
     
     @discord.ui.button(label='Team 1 يفوز', style=discord.ButtonStyle.primary, emoji='🔵')
+    @instrument()
     async def team1_wins(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.modify_result(interaction, 1, "Team 1 (Blue)")
     
     @discord.ui.button(label='Team 2 يفوز', style=discord.ButtonStyle.primary, emoji='🟠')
+    @instrument()
     async def team2_wins(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.modify_result(interaction, 2, "Team 2 (Orange)")
     
     @discord.ui.button(label='إلغاء المباراة', style=discord.ButtonStyle.danger, emoji='❌')
+    @instrument()
     async def cancel_match(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.modify_result(interaction, -1, "ملغية")
     
@@ -720,86 +1719,9 @@ class AdminResultActionView(discord.ui.View):
             await interaction.response.send_message(f"❌ النتيجة لم تتغير! الفائز الحالي هو {result_text}", ephemeral=True)
             return
         
-        # Get all players
-        team1_players = [self.match_data[1], self.match_data[2]]
-        team2_players = [self.match_data[3], self.match_data[4]]
-        all_players = team1_players + team2_players
-        
-        # Revert old result first
-        if old_winner != -1:  # If match wasn't cancelled
-            old_winners = team1_players if old_winner == 1 else team2_players
-            old_losers = team2_players if old_winner == 1 else team1_players
-            
-            for player_id in old_winners:
-                # Revert winner stats
-                cursor.execute("SELECT points, wins FROM players WHERE user_id = ?", (player_id,))
-                result = cursor.fetchone()
-                if result:
-                    old_points, wins = result
-                    new_points = max(0, old_points - 25)  # Remove win points
-                    new_wins = max(0, wins - 1)  # Remove win
-                    cursor.execute("UPDATE players SET points = ?, wins = ? WHERE user_id = ?", 
-                                 (new_points, new_wins, player_id))
-            
-            for player_id in old_losers:
-                # Revert loser stats
-                cursor.execute("SELECT points, losses FROM players WHERE user_id = ?", (player_id,))
-                result = cursor.fetchone()
-                if result:
-                    old_points, losses = result
-                    new_points = old_points + 20  # Add back lost points
-                    new_losses = max(0, losses - 1)  # Remove loss
-                    cursor.execute("UPDATE players SET points = ?, losses = ? WHERE user_id = ?", 
-                                 (new_points, new_losses, player_id))
-        
-        # Apply new result
-        if new_winner != -1:  # If match is not being cancelled
-            new_winners = team1_players if new_winner == 1 else team2_players
-            new_losers = team2_players if new_winner == 1 else team1_players
-            
-            for player_id in new_winners:
-                # Apply winner stats
-                cursor.execute("SELECT points, wins FROM players WHERE user_id = ?", (player_id,))
-                result = cursor.fetchone()
-                if result:
-                    old_points, wins = result
-                    new_points = old_points + 25  # Add win points
-                    new_wins = wins + 1  # Add win
-                    cursor.execute("UPDATE players SET points = ?, wins = ? WHERE user_id = ?", 
-                                 (new_points, new_wins, player_id))
-            
-            for player_id in new_losers:
-                # Apply loser stats
-                cursor.execute("SELECT points, losses FROM players WHERE user_id = ?", (player_id,))
-                result = cursor.fetchone()
-                if result:
-                    old_points, losses = result
-                    new_points = max(0, old_points - 20)  # Remove points
-                    new_losses = losses + 1  # Add loss
-                    cursor.execute("UPDATE players SET points = ?, losses = ? WHERE user_id = ?", 
-                                 (new_points, new_losses, player_id))
-        
-        # Update match in database
-        cursor.execute("""
-            UPDATE matches 
-            SET winner = ?, admin_modified = 1, cancelled = ?
-            WHERE match_id = ?
-        """, (new_winner, 1 if new_winner == -1 else 0, self.match_id))
-        
-        conn.commit()
-        
-        # Update player roles for all affected players
-        for player_id in all_players:
-            try:
-                guild = interaction.guild
-                if guild:
-                    member = guild.get_member(player_id)
-                    if member:
-                        points = get_player_points(player_id)
-                        await update_player_rank_role(member, points)
-            except Exception as e:
-                print(f"Error updating player role: {e}")
-                pass
+        # Revert the old result and apply the new one with the rating model
+        report = bulk_recalculate(conn, {self.match_id: new_winner}, model=config.rating_model)
+        record_admin_changes(report)
         
         # Create success embed
         embed = discord.Embed(
@@ -825,6 +1747,13 @@ class AdminResultActionView(discord.ui.View):
         
         await interaction.response.edit_message(embed=embed, view=None)
         
+        # Rank roles go through the paced member_edit route, on the settlement worker
+        role_updates = [(player_id, player['new_points']) for player_id, player in report['players'].items()]
+        if interaction.guild and role_updates:
+            enqueue_settlement(f"HSM{self.match_id}", [
+                ('roles', functools.partial(apply_rank_role_updates, interaction.guild, role_updates), 0)
+            ])
+        
         # Send admin modification notification to results channel
         try:
             results_channel = bot.get_channel(results_channel_id)
@@ -840,20 +1769,12 @@ class AdminResultActionView(discord.ui.View):
                 )
                 
                 # Show teams
-                try:
-                    p1 = bot.get_user(team1_players[0])
-                    p2 = bot.get_user(team1_players[1])
-                    p3 = bot.get_user(team2_players[0])
-                    p4 = bot.get_user(team2_players[1])
-                    
-                    if p1 and p2 and p3 and p4:
-                        team1_text = f"🔵 {p1.display_name}\n🔵 {p2.display_name}"
-                        team2_text = f"🟠 {p3.display_name}\n🟠 {p4.display_name}"
-                        
-                        admin_embed.add_field(name="Team 1 (Blue)", value=team1_text, inline=True)
-                        admin_embed.add_field(name="Team 2 (Orange)", value=team2_text, inline=True)
-                except:
-                    pass
+                names = resolve_player_names(team1_players + team2_players)
+                team1_text = f"🔵 {names[team1_players[0]]}\n🔵 {names[team1_players[1]]}"
+                team2_text = f"🟠 {names[team2_players[0]]}\n🟠 {names[team2_players[1]]}"
+                
+                admin_embed.add_field(name="Team 1 (Blue)", value=team1_text, inline=True)
+                admin_embed.add_field(name="Team 2 (Orange)", value=team2_text, inline=True)
                 
                 admin_embed.add_field(
                     name="⚠️ Admin Action",
@@ -864,7 +1785,7 @@ class AdminResultActionView(discord.ui.View):
                 admin_embed.set_footer(text=f"Match ID: {self.match_id} • Admin Modified")
                 admin_embed.timestamp = datetime.now()
                 
-                await results_channel.send(embed=admin_embed)
+                await rest(PRIORITY_SETTLEMENT, 'message_send', results_channel.send, embed=admin_embed)
             elif results_channel and isinstance(results_channel, discord.TextChannel) and new_winner == -1:  # Cancelled match
                 cancel_embed = discord.Embed(
                     title=f"❌ Match Cancelled: HSM{self.match_id}",
@@ -881,7 +1802,7 @@ class AdminResultActionView(discord.ui.View):
                 cancel_embed.set_footer(text=f"Match ID: {self.match_id} • Cancelled")
                 cancel_embed.timestamp = datetime.now()
                 
-                await results_channel.send(embed=cancel_embed)
+                await rest(PRIORITY_SETTLEMENT, 'message_send', results_channel.send, embed=cancel_embed)
                 
         except Exception as e:
             print(f"Error sending admin notification: {e}")
@@ -893,28 +1814,31 @@ class AdminResultView(discord.ui.View):
 
 async def update_queue_embed(interaction_message=None):
     """Update the queue embed with current information"""
-    global queue_message, queue_channel
+    global queue_message, queue_channel, queue_embed_edits
     embed = create_queue_embed()
     view = QueueView()
     
     try:
         if queue_message and queue_channel:
             # Always update the main queue message
-            await queue_message.edit(embed=embed, view=view)
+            queue_embed_edits += 1
+            await rest(PRIORITY_QUEUE_DISPLAY, 'message_edit', queue_message.edit, embed=embed, view=view)
         elif queue_channel and isinstance(queue_channel, discord.TextChannel):
             # If no queue message exists, find and update it
             async for message in queue_channel.history(limit=20):
                 if message.author == bot.user and message.embeds and len(message.embeds) > 0:
                     if hasattr(message.embeds[0], 'title') and message.embeds[0].title and "HeatSeeker Queue" in message.embeds[0].title:
                         queue_message = message
-                        await message.edit(embed=embed, view=view)
+                        queue_embed_edits += 1
+                        await rest(PRIORITY_QUEUE_DISPLAY, 'message_edit', message.edit, embed=embed, view=view)
                         break
     except Exception as e:
         print(f"Error updating queue embed: {e}")
         # Try to send a new message if editing fails
         if queue_channel and isinstance(queue_channel, discord.TextChannel):
             try:
-                queue_message = await queue_channel.send(embed=embed, view=view)
+                queue_embed_edits += 1
+                queue_message = await rest(PRIORITY_QUEUE_DISPLAY, 'message_send', queue_channel.send, embed=embed, view=view)
             except Exception as send_error:
                 print(f"Error sending queue message: {send_error}")
 
@@ -943,12 +1867,12 @@ def create_queue_embed():
             points = get_player_points(user.id)
             placement_matches = get_player_placement_matches(user.id)
             
-            if placement_matches < 5:
+            if placement_matches < config.placement_matches:
                 # Show placement matches progress
-                queue_text += f"**{i+1}.** 📋 {user.display_name} `(Placement {placement_matches}/5)`\n"
+                queue_text += f"**{i+1}.** 📋 {user.display_name} `(Placement {placement_matches}/{config.placement_matches})`\n"
             else:
                 # Show rank for completed players
-                rank_name, rank_emoji = get_rank_from_mmr(points)
+                rank_name, rank_emoji = config.ranks.get_rank_from_mmr(points)
                 queue_text += f"**{i+1}.** {rank_emoji} {user.display_name} `({points} mmr - {rank_name})`\n"
         
         embed.add_field(
@@ -978,9 +1902,11 @@ def create_queue_embed():
     
     return embed
 
+@instrument()
 async def create_match(guild, players):
     """Create match channels and organize teams"""
     global match_counter
+    match_config = config  # The match is settled with the config it started with
     
     # Create match name
     match_name = f"HSM{match_counter}"
@@ -994,7 +1920,8 @@ async def create_match(guild, players):
     category = bot.get_channel(matches_category_id)
     if not category:
         # Fallback: create category if not found
-        category = await guild.create_category(
+        category = await rest(
+            PRIORITY_PROVISION, 'channel_create', guild.create_category,
             name=f"🏆 Matches",
             overwrites={
                 guild.default_role: discord.PermissionOverwrite(read_messages=False, view_channel=False),
@@ -1018,7 +1945,8 @@ async def create_match(guild, players):
         )
     
     # Create text channel for match
-    text_channel = await guild.create_text_channel(
+    text_channel = await rest(
+        PRIORITY_PROVISION, 'channel_create', guild.create_text_channel,
         name=f"📱-{match_name.lower()}",
         category=category,
         overwrites=overwrites
@@ -1034,7 +1962,8 @@ async def create_match(guild, players):
             connect=True, speak=True, view_channel=True
         )
     
-    team1_voice = await guild.create_voice_channel(
+    team1_voice = await rest(
+        PRIORITY_PROVISION, 'channel_create', guild.create_voice_channel,
         name=f"🔵 Team 1 Voice",
         category=category,
         overwrites=team1_overwrites,
@@ -1051,7 +1980,8 @@ async def create_match(guild, players):
             connect=True, speak=True, view_channel=True
         )
     
-    team2_voice = await guild.create_voice_channel(
+    team2_voice = await rest(
+        PRIORITY_PROVISION, 'channel_create', guild.create_voice_channel,
         name=f"🟠 Team 2 Voice",
         category=category,
         overwrites=team2_overwrites,
@@ -1074,8 +2004,15 @@ async def create_match(guild, players):
         'team1_voice': team1_voice,
         'team2_voice': team2_voice,
         'category': category,
-        'match_id': match_counter-1
+        'match_id': match_counter-1,
+        'created_at': datetime.now(),
+        'last_activity': datetime.now(),
+        'warned': False,
+        'config': match_config
     }
+    for player in players:
+        player_active_match[player.id] = match_name
+    match_channel_index[text_channel.id] = match_name
     
     # Send match information
     embed = discord.Embed(
@@ -1094,7 +2031,7 @@ async def create_match(guild, players):
     team1_text = ""
     for player in team1:
         points = get_player_points(player.id)
-        rank_name, rank_emoji = get_rank_from_mmr(points)
+        rank_name, rank_emoji = match_config.ranks.get_rank_from_mmr(points)
         team1_text += f"🔵 {rank_emoji} {player.display_name} `({points} mmr - {rank_name})`\n"
     
     embed.add_field(
@@ -1107,7 +2044,7 @@ async def create_match(guild, players):
     team2_text = ""
     for player in team2:
         points = get_player_points(player.id)
-        rank_name, rank_emoji = get_rank_from_mmr(points)
+        rank_name, rank_emoji = match_config.ranks.get_rank_from_mmr(points)
         team2_text += f"🟠 {rank_emoji} {player.display_name} `({points} mmr - {rank_name})`\n"
     
     embed.add_field(
@@ -1124,40 +2061,312 @@ async def create_match(guild, players):
         inline=False
     )
     
-    await text_channel.send(embed=embed)
+    await rest(PRIORITY_PROVISION, 'message_send', text_channel.send, embed=embed)
     
     # Send notifications to players
     for player in players:
         try:
-            await player.send(f"🎮 تم إنشاء مباراة {match_name}! توجه إلى {text_channel.mention}")
+            await rest(PRIORITY_PROVISION, 'dm', player.send, f"🎮 تم إنشاء مباراة {match_name}! توجه إلى {text_channel.mention}")
         except:
             pass
 
 
+def release_match(match_name):
+    """Drop all in-memory state of a match and return its channels for deletion"""
+    match_info = active_matches.pop(match_name, None)
+    match_results.pop(match_name, None)
+    if not match_info:
+        return []
+    
+    for player in match_info['players']:
+        if player_active_match.get(player.id) == match_name:
+            del player_active_match[player.id]
+    
+    channels = [match_info.get('text_channel'), match_info.get('team1_voice'), match_info.get('team2_voice')]
+    channels = [channel for channel in channels if channel]
+    for channel in channels:
+        match_channel_index.pop(channel.id, None)
+    return channels
 
-@bot.event
-async def on_ready():
-    print(f'{bot.user} has connected to Discord!')
-    print(f'Bot is ready to manage queues!')
+def release_report_lease(match_name, reporter):
+    """Clear a pending /report marker so another player can report the match"""
+    result = match_results.get(match_name)
+    if result and result.get('processing') and result['reporter'] == reporter:
+        del match_results[match_name]
+
+async def delete_channels(channels, priority=PRIORITY_COSMETIC):
+    """Queue channels for paced deletion and return how many were removed"""
+    futures = [rest(priority, 'channel_delete', channel.delete) for channel in channels]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    
+    deleted = 0
+    for channel, result in zip(channels, results):
+        if not isinstance(result, Exception):
+            deleted += 1
+        elif not isinstance(result, discord.NotFound):
+            print(f"Error deleting channel {channel.name}: {result}")
+    return deleted
+
+def is_match_channel(channel):
+    """Check if a channel was created by create_match"""
+    if isinstance(channel, discord.TextChannel):
+        return MATCH_TEXT_CHANNEL_PATTERN.match(channel.name) is not None
+    if isinstance(channel, discord.VoiceChannel):
+        return channel.name in MATCH_VOICE_CHANNEL_NAMES
+    return False
+
+async def sweep_orphan_channels():
+    """Delete match channels under the matches category that belong to no live match"""
+    global last_channel_sweep
+    started = time.perf_counter()
+    report = {'checked': 0, 'removed': 0, 'stale_matches': 0, 'duration': 0.0}
     
-    # Add persistent views
-    bot.add_view(QueueView())
-    bot.add_view(AdminView())
+    category = bot.get_channel(matches_category_id)
+    if not isinstance(category, discord.CategoryChannel):
+        last_channel_sweep = report
+        return report
+    
+    # Channels of matches that are still being played
+    live_channel_ids = set()
+    live_match_ids = set()
+    for match_info in active_matches.values():
+        live_match_ids.add(match_info['match_id'])
+        for key in ('text_channel', 'team1_voice', 'team2_voice'):
+            if match_info.get(key):
+                live_channel_ids.add(match_info[key].id)
+    
+    # Unfinished matches in the database (lost from memory after a crash)
+    cursor.execute("SELECT match_id FROM matches WHERE completed = 0 AND cancelled = 0")
+    open_match_ids = {row[0] for row in cursor.fetchall()}
+    
+    # Skip channels a create_match call may still be setting up
+    grace_cutoff = datetime.now(timezone.utc) - timedelta(minutes=2)
+    
+    orphans = []
+    stale_match_ids = []
+    for channel in category.channels:
+        report['checked'] += 1
+        if channel.id in live_channel_ids or not is_match_channel(channel):
+            continue
+        if channel.created_at > grace_cutoff:
+            continue
+        orphans.append(channel)
+        
+        text_match = MATCH_TEXT_CHANNEL_PATTERN.match(channel.name)
+        if text_match:
+            match_id = int(text_match.group(1))
+            if match_id in open_match_ids and match_id not in live_match_ids:
+                stale_match_ids.append(match_id)
+    
+    # Matches whose channels are gone can never be reported
+    if stale_match_ids:
+        cursor.executemany("UPDATE matches SET winner = -1, cancelled = 1 WHERE match_id = ?",
+                           [(match_id,) for match_id in stale_match_ids])
+        conn.commit()
+    report['stale_matches'] = len(stale_match_ids)
     
-    # Sync slash commands
-    try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} slash commands")
-    except Exception as e:
-        print(f"Failed to sync commands: {e}")
+    report['removed'] = await delete_channels(orphans)
+    report['duration'] = time.perf_counter() - started
+    last_channel_sweep = report
     
-    # Start timeout checker and leaderboard updater
-    check_timeouts.start()
-    update_leaderboard.start()
+    print(f"Channel sweep: checked {report['checked']}, removed {report['removed']} orphan channels, "
+          f"closed {report['stale_matches']} stale matches in {report['duration']:.2f}s")
+    return report
 
-# Timeout checker task
-@tasks.loop(minutes=1)
-async def check_timeouts():
+async def apply_rank_role_updates(guild, role_updates, priority=PRIORITY_SETTLEMENT):
+    """Apply rank role changes for settled players"""
+    if not guild:
+        return
+    for player_id, new_points in role_updates:
+        member = guild.get_member(player_id)
+        if member:
+            await update_player_rank_role(member, new_points, priority)
+
+async def queue_match_cleanup(match_name, channels):
+    """Delete finished match channels through the paced delete queue"""
+    futures = [rest(PRIORITY_SETTLEMENT, 'channel_delete', channel.delete) for channel in channels]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    
+    # Channels already gone count as deleted, a retry of the stage only deletes what is left
+    failed = [(channel, result) for channel, result in zip(channels, results)
+              if isinstance(result, Exception) and not isinstance(result, discord.NotFound)]
+    channels[:] = [channel for channel, result in failed]
+    if failed:
+        raise failed[0][1]
+    print(f"تم حذف قنوات المباراة {match_name} تلقائياً")
+
+def enqueue_settlement(match_name, stages):
+    """Queue the side effects of a settled match
+
+    stages is an ordered list of (name, coroutine factory, delay seconds).
+    Stages of one match always run in order, one after the other.
+    """
+    ensure_settlement_workers()
+    now = time.monotonic()
+    job = {
+        'match_name': match_name,
+        'stages': deque((name, factory, now + delay) for name, factory, delay in stages)
+    }
+    settlement_stats['enqueued'] += 1
+    settlement_stats['pending'] += 1
+    settlement_queue.put_nowait(job)
+
+def ensure_settlement_workers():
+    """Start the settlement workers if they are not running"""
+    settlement_workers[:] = [worker for worker in settlement_workers if not worker.done()]
+    while len(settlement_workers) < settlement_worker_count:
+        settlement_workers.append(asyncio.create_task(settlement_worker()))
+
+async def settlement_worker():
+    """Run queued settlement stages"""
+    loop = asyncio.get_running_loop()
+    while True:
+        job = await settlement_queue.get()
+        try:
+            while job['stages']:
+                name, factory, not_before = job['stages'][0]
+                delay = not_before - time.monotonic()
+                if delay > 0:
+                    # Resume this match later without holding the worker
+                    loop.call_later(delay, settlement_queue.put_nowait, job)
+                    break
+                job['stages'].popleft()
+                await run_settlement_stage(job['match_name'], name, factory)
+            else:
+                settlement_stats['completed'] += 1
+                settlement_stats['pending'] -= 1
+        except Exception as e:
+            print(f"Settlement worker error for {job['match_name']}: {e}")
+        finally:
+            settlement_queue.task_done()
+
+async def run_settlement_stage(match_name, name, factory):
+    """Run one settlement stage with retries and record its latency"""
+    started = time.perf_counter()
+    with perf_span(f"settlement.{name}"):
+        for attempt in range(settlement_max_retries + 1):
+            try:
+                await factory()
+                break
+            except (discord.Forbidden, discord.NotFound) as e:
+                # Closed DMs or deleted channels won't succeed on retry
+                settlement_stats['failed_stages'] += 1
+                print(f"Settlement stage {name} for {match_name} skipped: {e}")
+                break
+            except Exception as e:
+                if attempt == settlement_max_retries:
+                    settlement_stats['failed_stages'] += 1
+                    print(f"Settlement stage {name} for {match_name} failed: {e}")
+                else:
+                    settlement_stats['retries'] += 1
+                    await asyncio.sleep(settlement_retry_delay * (2 ** attempt))
+    
+    elapsed = time.perf_counter() - started
+    stage_stats = settlement_stats['stages'].setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+    stage_stats['count'] += 1
+    stage_stats['total'] += elapsed
+    stage_stats['max'] = max(stage_stats['max'], elapsed)
+
+@bot.event
+async def on_guild_join(guild):
+    await provision_rank_roles(guild)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    """Keep cached rank role ids in sync with renamed roles"""
+    rank_role_names = {rank.role_name for rank in config.ranks.ranks}
+    guild_roles = rank_role_cache.get(after.guild.id, {})
+    if after.id in guild_roles.values() or after.name in rank_role_names:
+        refresh_rank_role_cache(after.guild)
+
+@bot.event
+async def on_guild_role_delete(role):
+    """Re-create a rank role that was deleted"""
+    guild_roles = rank_role_cache.get(role.guild.id, {})
+    if role.id in guild_roles.values():
+        print(f"Rank role {role.name} was deleted, provisioning again")
+        await provision_rank_roles(role.guild)
+
+@bot.event
+async def on_member_join(member):
+    subset = player_ranking.guilds.get(member.guild.id)
+    if subset:
+        player_ranking.add_member(subset, member.id)
+    if member.id in player_ranking.players:
+        player_names.remember([member])
+        schedule_guild_board_refresh(member)
+
+@bot.event
+async def on_member_remove(member):
+    subset = player_ranking.guilds.get(member.guild.id)
+    if subset:
+        player_ranking.remove_member(subset, member.id)
+    schedule_guild_board_refresh(member)
+
+def schedule_guild_board_refresh(member):
+    """Re-render the server boards when a ranked player joins or leaves"""
+    if player_ranking.position(member.id) and any(scope == 'guild' for scope, channel_id in leaderboard_boards):
+        schedule_leaderboard_refresh()
+
+@bot.event
+async def on_member_update(before, after):
+    """Keep stored player names current, on cached pages and posted boards too"""
+    if before.display_name != after.display_name and after.id in player_ranking.players:
+        player_names.remember([after])
+        position = player_ranking.position(after.id)
+        if position:
+            invalidate_leaderboard_pages(position - 1, position - 1)
+        if leaderboard_boards:
+            schedule_leaderboard_refresh()
+
+@bot.listen('on_message')
+async def track_match_activity(message):
+    """Keep track of the last message sent in each match channel"""
+    match_name = match_channel_index.get(message.channel.id)
+    if match_name and match_name in active_matches:
+        active_matches[match_name]['last_activity'] = datetime.now()
+        active_matches[match_name]['warned'] = False
+
+@bot.event
+async def on_ready():
+    print(f'{bot.user} has connected to Discord!')
+    print(f'Bot is ready to manage queues!')
+    
+    # Add persistent views
+    bot.add_view(QueueView())
+    bot.add_view(AdminView())
+    bot.add_dynamic_items(LeaderboardPageButton, LeaderboardJumpButton)
+    
+    # Resolve rank roles once per guild
+    for guild in bot.guilds:
+        await provision_rank_roles(guild)
+    
+    # Reattach the leaderboard boards
+    load_leaderboard_boards()
+    
+    # Store names of players that changed them while the bot was offline
+    player_names.remember([member for guild in bot.guilds for member in guild.members if member.id in player_ranking.players])
+    
+    # Sync slash commands
+    try:
+        synced = await bot.tree.sync()
+        print(f"Synced {len(synced)} slash commands")
+    except Exception as e:
+        print(f"Failed to sync commands: {e}")
+    
+    # Start timeout checker, match reaper and leaderboard updater
+    check_timeouts.start()
+    reap_matches.start()
+    sweep_channels_task.start()
+    sync_rank_roles_task.start()
+    update_leaderboard.start()
+    measure_loop_lag.start()
+    report_db_stats.start()
+
+# Timeout checker task
+@tasks.loop(minutes=1)
+@instrument()
+async def check_timeouts():
     """Check for inactive users and remove them from queue"""
     current_time = datetime.now()
     users_to_remove = []
@@ -1165,7 +2374,7 @@ async def check_timeouts():
     for user in list(user_queue):
         if user.id in user_last_activity:
             time_diff = (current_time - user_last_activity[user.id]).total_seconds()
-            if time_diff > queue_timeout:  # 5 minutes
+            if time_diff > config.queue_timeout:
                 users_to_remove.append(user)
     
     for user in users_to_remove:
@@ -1178,26 +2387,199 @@ async def check_timeouts():
 async def before_check_timeouts():
     await bot.wait_until_ready()
 
-# Leaderboard auto-update task
-@tasks.loop(minutes=10)
-async def update_leaderboard():
-    """Update leaderboard every 10 minutes"""
-    global leaderboard_message, leaderboard_channel_id
+# Abandoned match reaper task
+@tasks.loop(minutes=1)
+@instrument()
+async def reap_matches():
+    """Expire report leases, warn inactive matches and cancel abandoned ones"""
+    current_time = datetime.now()
+    
+    # Expired /report menus no longer block other players
+    for match_name, result in list(match_results.items()):
+        if result.get('processing') and result['lease_expires'] <= current_time:
+            del match_results[match_name]
+            print(f"Report lease expired for {match_name}")
+    
+    channels_to_delete = []
+    for match_name, match_info in list(active_matches.items()):
+        # Matches with a recorded result are being settled
+        if match_name in match_results and not match_results[match_name].get('processing'):
+            continue
+        
+        age = (current_time - match_info['created_at']).total_seconds()
+        inactive = (current_time - match_info['last_activity']).total_seconds()
+        
+        if age > match_max_age:
+            cursor.execute("""
+                UPDATE matches 
+                SET winner = -1, cancelled = 1
+                WHERE match_id = ?
+            """, (match_info['match_id'],))
+            conn.commit()
+            
+            channels_to_delete.extend(release_match(match_name))
+            print(f"Auto-cancelled abandoned match {match_name}")
+            
+            for player in match_info['players']:
+                try:
+                    await rest(PRIORITY_SETTLEMENT, 'dm', player.send, f"❌ تم إلغاء مباراة {match_name} تلقائياً لعدم تسجيل النتيجة.")
+                except:
+                    pass
+        elif inactive > match_warn_after and not match_info['warned']:
+            match_info['warned'] = True
+            minutes_left = max(1, int((match_max_age - age) // 60))
+            try:
+                await rest(
+                    PRIORITY_SETTLEMENT, 'message_send', match_info['text_channel'].send,
+                    f"⚠️ لم يتم تسجيل نتيجة {match_name} بعد!\n"
+                    f"استخدم `/report` لتسجيل النتيجة، وإلا سيتم إلغاء المباراة تلقائياً خلال {minutes_left} دقيقة."
+                )
+            except Exception as e:
+                print(f"Error warning inactive match {match_name}: {e}")
+    
+    # Delete all expired match channels in one batched pass
+    if channels_to_delete:
+        await delete_channels(channels_to_delete)
+
+@reap_matches.before_loop
+async def before_reap_matches():
+    await bot.wait_until_ready()
+
+# Orphan channel sweeper - first run happens right after startup
+@tasks.loop(minutes=channel_sweep_interval)
+@instrument()
+async def sweep_channels_task():
+    """Reconcile match channels with live match state"""
+    try:
+        await sweep_orphan_channels()
+    except Exception as e:
+        print(f"Channel sweep failed: {e}")
+
+@sweep_channels_task.before_loop
+async def before_sweep_channels_task():
+    await bot.wait_until_ready()
+
+# Rank role sync task
+@tasks.loop(minutes=rank_role_sync_interval)
+@instrument()
+async def sync_rank_roles_task():
+    """Reconcile rank roles of all members with the database"""
+    try:
+        await sync_all_rank_roles()
+    except Exception as e:
+        print(f"Rank role sync failed: {e}")
+
+@sync_rank_roles_task.before_loop
+async def before_sync_rank_roles_task():
+    await bot.wait_until_ready()
+
+def leaderboard_hash(embed):
+    """Hash of the rendered leaderboard without its timestamp"""
+    content = embed.to_dict()
+    content.pop('timestamp', None)
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+def schedule_leaderboard_refresh():
+    """Refresh the leaderboard once the debounce window after the first change has passed"""
+    global leaderboard_refresh_task, leaderboard_dirty_since
+    leaderboard_stats['triggers'] += 1
+    if leaderboard_dirty_since is None:
+        leaderboard_dirty_since = time.monotonic()
+    if leaderboard_refresh_task and not leaderboard_refresh_task.done():
+        leaderboard_stats['debounced'] += 1
+        return
     
-    if leaderboard_channel_id and leaderboard_message:
+    leaderboard_refresh_task = asyncio.create_task(debounced_leaderboard_refresh())
+
+async def debounced_leaderboard_refresh():
+    # A change that lands while the boards are read or their edits wait in the REST queue
+    # leaves them dirty again, and gets its own debounced refresh
+    while leaderboard_dirty_since is not None:
+        await asyncio.sleep(leaderboard_debounce)
         try:
-            embed = create_leaderboard_embed()
-            await leaderboard_message.edit(embed=embed)
-            print("Leaderboard updated automatically")
+            await refresh_leaderboard()
         except Exception as e:
-            print(f"Failed to update leaderboard: {e}")
-            # Try to send new message if edit fails
-            try:
-                channel = bot.get_channel(leaderboard_channel_id)
-                if channel:
-                    leaderboard_message = await channel.send(embed=embed)
-            except:
-                pass
+            print(f"Failed to refresh leaderboard: {e}")
+
+def load_leaderboard_boards():
+    """Attach to the board messages stored in the table"""
+    cursor.execute("SELECT scope, channel_id, message_id FROM leaderboard_boards")
+    for scope, channel_id, message_id in cursor.fetchall():
+        channel = bot.get_channel(channel_id)
+        if channel and scope in LEADERBOARD_SCOPES:
+            leaderboard_boards[(scope, channel_id)] = {
+                'message': channel.get_partial_message(message_id),
+                'hash': None,
+                'cutoff': float('inf')
+            }
+
+async def post_leaderboard_board(scope, channel):
+    """Send a new board message for a scope and store it"""
+    embed, view, cutoff = LEADERBOARD_SCOPES[scope].render(getattr(channel, 'guild', None))
+    message = await rest(PRIORITY_COSMETIC, 'message_send', channel.send, embed=embed, view=view)
+    leaderboard_boards[(scope, channel.id)] = {'message': message, 'hash': leaderboard_hash(embed), 'cutoff': cutoff}
+    cursor.execute("INSERT OR REPLACE INTO leaderboard_boards (scope, channel_id, message_id) VALUES (?, ?, ?)",
+                   (scope, channel.id, message.id))
+    conn.commit()
+
+async def refresh_board(scope, channel_id, board):
+    """Edit one board message unless its content is unchanged"""
+    channel = bot.get_channel(channel_id)
+    if not channel:
+        return False
+    
+    embed, view, board['cutoff'] = LEADERBOARD_SCOPES[scope].render(getattr(channel, 'guild', None))
+    content_hash = leaderboard_hash(embed)
+    if content_hash == board['hash']:
+        leaderboard_stats['skipped_unchanged'] += 1
+        return False
+    
+    try:
+        await rest(PRIORITY_COSMETIC, 'message_edit', board['message'].edit, embed=embed, view=view)
+        board['hash'] = content_hash
+    except discord.NotFound:
+        # Message was deleted - post the board again
+        await post_leaderboard_board(scope, channel)
+    
+    now = time.monotonic()
+    leaderboard_stats['edits'] += 1
+    leaderboard_edit_times.append(now)
+    while leaderboard_edit_times and now - leaderboard_edit_times[0] > 3600:
+        leaderboard_edit_times.popleft()
+    return True
+
+@instrument()
+async def refresh_leaderboard():
+    """Refresh every board from the shared ranking, returns the number of edited messages"""
+    global leaderboard_dirty_since
+    # Changes from here on are not guaranteed to be in this render
+    dirty_since = leaderboard_dirty_since
+    leaderboard_dirty_since = None
+    edited = 0
+    for (scope, channel_id), board in list(leaderboard_boards.items()):
+        try:
+            edited += await refresh_board(scope, channel_id, board)
+        except Exception as e:
+            print(f"Failed to update {scope} leaderboard in {channel_id}: {e}")
+    
+    if edited and dirty_since is not None:
+        lag = time.monotonic() - dirty_since
+        leaderboard_stats['lag_count'] += 1
+        leaderboard_stats['lag_total'] += lag
+        leaderboard_stats['lag_max'] = max(leaderboard_stats['lag_max'], lag)
+    return edited
+
+# Leaderboard fallback task - the content hash skips the edit when nothing changed
+@tasks.loop(minutes=leaderboard_fallback_interval)
+@instrument()
+async def update_leaderboard():
+    """Refresh the leaderboards for changes that did not trigger a refresh"""
+    try:
+        edited = await refresh_leaderboard()
+        if edited:
+            print(f"Leaderboard updated automatically ({edited} boards)")
+    except Exception as e:
+        print(f"Failed to update leaderboard: {e}")
 
 @update_leaderboard.before_loop
 async def before_update_leaderboard():
@@ -1207,39 +2589,40 @@ async def before_update_leaderboard():
 @bot.tree.command(name="setup", description="إعداد واجهة الطابور التفاعلية")
 @app_commands.describe()
 @app_commands.default_permissions(administrator=True)
+@instrument()
 async def setup_queue(interaction: discord.Interaction):
     """Setup the queue embed with buttons"""
     global queue_message, queue_channel, queue_channel_id
     
+    await interaction.response.send_message("✅ تم إعداد الطابور بنجاح!", ephemeral=True)
+    
     # Delete existing queue message if it exists in this channel
+    old_messages = []
     if queue_message and queue_channel_id == interaction.channel.id:
-        try:
-            await queue_message.delete()
-        except:
-            pass
+        old_messages.append(queue_message)
     
     # Clear any existing queue messages in this channel
     async for message in interaction.channel.history(limit=20):
         if (message.author == bot.user and 
             message.embeds and 
             len(message.embeds) > 0 and 
-            "HeatSeeker Queue" in str(message.embeds[0].title)):
-            try:
-                await message.delete()
-            except:
-                pass
+            "HeatSeeker Queue" in str(message.embeds[0].title) and
+            message not in old_messages):
+            old_messages.append(message)
+    await asyncio.gather(*(rest(PRIORITY_QUEUE_DISPLAY, 'message_delete', message.delete) for message in old_messages),
+                         return_exceptions=True)
     
     embed = create_queue_embed()
     view = QueueView()
     
-    await interaction.response.send_message("✅ تم إعداد الطابور بنجاح!", ephemeral=True)
-    queue_message = await interaction.followup.send(embed=embed, view=view, wait=True)
+    queue_message = await rest(PRIORITY_QUEUE_DISPLAY, 'message_send', interaction.followup.send, embed=embed, view=view, wait=True)
     queue_channel = interaction.channel
     queue_channel_id = interaction.channel.id
 
 @bot.tree.command(name="admin", description="لوحة تحكم إدارة الطابور")
 @app_commands.describe()
 @app_commands.default_permissions(manage_messages=True)
+@instrument()
 async def admin_panel(interaction: discord.Interaction):
     """Show admin panel for queue management"""
     embed = discord.Embed(
@@ -1250,7 +2633,7 @@ async def admin_panel(interaction: discord.Interaction):
     
     embed.add_field(
         name="📊 الإحصائيات الحالية",
-        value=f"عدد المستخدمين: {len(user_queue)}/{queue_limit}\nنشط منذ: {len(user_last_activity)} مستخدم",
+        value=f"عدد المستخدمين: {len(user_queue)}/{config.queue_limit}\nنشط منذ: {len(user_last_activity)} مستخدم",
         inline=False
     )
     
@@ -1260,139 +2643,623 @@ async def admin_panel(interaction: discord.Interaction):
 @bot.tree.command(name="cleanup", description="حذف رسائل الطابور المكررة")
 @app_commands.describe()
 @app_commands.default_permissions(administrator=True)
+@instrument()
 async def cleanup_duplicates(interaction: discord.Interaction):
     """Clean up duplicate queue messages"""
-    deleted_count = 0
+    await interaction.response.defer(ephemeral=True)
     
+    duplicates = []
     async for message in interaction.channel.history(limit=50):
         if (message.author == bot.user and 
             message.embeds and 
             len(message.embeds) > 0 and 
             "HeatSeeker Queue" in str(message.embeds[0].title)):
-            try:
-                await message.delete()
-                deleted_count += 1
-            except:
-                pass
+            duplicates.append(message)
+    results = await asyncio.gather(*(rest(PRIORITY_QUEUE_DISPLAY, 'message_delete', message.delete) for message in duplicates),
+                                   return_exceptions=True)
+    deleted_count = sum(1 for result in results if not isinstance(result, Exception))
     
-    await interaction.response.send_message(f"✅ تم حذف {deleted_count} رسائل طابور مكررة!", ephemeral=True)
+    await rest(PRIORITY_QUEUE_DISPLAY, 'message_send', interaction.followup.send,
+               f"✅ تم حذف {deleted_count} رسائل طابور مكررة!", ephemeral=True)
 
-@bot.tree.command(name="set_leaderboard", description="إنشاء لوحة المتصدرين مع التحديث التلقائي")
+@bot.tree.command(name="settlement_status", description="عرض حالة طابور معالجة نتائج المباريات")
 @app_commands.describe()
 @app_commands.default_permissions(administrator=True)
-async def set_leaderboard_channel(interaction: discord.Interaction):
-    """Create auto-updating leaderboard (Admin only)"""
-    global leaderboard_channel_id, leaderboard_message
+@instrument()
+async def settlement_status(interaction: discord.Interaction):
+    """Show settlement queue depth and stage latency"""
+    embed = discord.Embed(
+        title="⚙️ معالجة نتائج المباريات",
+        color=0x2F3136
+    )
+    embed.add_field(
+        name="📊 الطابور",
+        value=f"**مباريات قيد المعالجة:** {settlement_stats['pending']}\n"
+              f"**في الانتظار الآن:** {settlement_queue.qsize()}\n"
+              f"**مكتملة:** {settlement_stats['completed']}/{settlement_stats['enqueued']}\n"
+              f"**إعادة محاولات:** {settlement_stats['retries']}\n"
+              f"**مراحل فاشلة:** {settlement_stats['failed_stages']}",
+        inline=False
+    )
     
-    leaderboard_channel_id = interaction.channel.id
+    stage_text = ""
+    for name, stage_stats in settlement_stats['stages'].items():
+        average = stage_stats['total'] / stage_stats['count'] * 1000
+        stage_text += f"`{name}`: {stage_stats['count']} • avg {average:.0f}ms • max {stage_stats['max'] * 1000:.0f}ms\n"
+    embed.add_field(
+        name="⏱️ زمن المراحل",
+        value=stage_text or "لا توجد بيانات بعد",
+        inline=False
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="rest_status", description="عرض حالة طابور طلبات Discord الصادرة")
+@app_commands.describe()
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def rest_status(interaction: discord.Interaction):
+    """Show outbound REST queue depth and wait time per priority class"""
+    embed = discord.Embed(
+        title="📡 طلبات Discord الصادرة",
+        color=0x2F3136
+    )
+    for priority, name in PRIORITY_NAMES.items():
+        stats = rest_scheduler.stats[name]
+        started = stats['completed'] + stats['failed']
+        average_wait = stats['wait_total'] / started * 1000 if started else 0
+        embed.add_field(
+            name=f"{priority}. {name}",
+            value=f"**في الطابور:** {stats['queued']}\n"
+                  f"**مكتملة:** {stats['completed']} • **فشل:** {stats['failed']}\n"
+                  f"**Rate limited:** {stats['rate_limited']}\n"
+                  f"**الانتظار:** avg {average_wait:.0f}ms • max {stats['wait_max'] * 1000:.0f}ms",
+            inline=True
+        )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="leaderboard_status", description="عرض إحصائيات تحديث لوحة المتصدرين")
+@app_commands.describe()
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def leaderboard_status(interaction: discord.Interaction):
+    """Show leaderboard refresh triggers, skipped edits and freshness lag"""
+    now = time.monotonic()
+    edits_last_hour = sum(1 for edit_time in leaderboard_edit_times if now - edit_time <= 3600)
+    lag_count = leaderboard_stats['lag_count']
+    average_lag = leaderboard_stats['lag_total'] / lag_count if lag_count else 0
     
-    # Send initial leaderboard
-    embed = create_leaderboard_embed()
-    await interaction.response.send_message("✅ تم إنشاء لوحة المتصدرين مع التحديث التلقائي كل 10 دقائق!", ephemeral=True)
-    leaderboard_message = await interaction.followup.send(embed=embed, wait=True)
+    embed = discord.Embed(
+        title="🏆 تحديث لوحة المتصدرين",
+        color=0x2F3136
+    )
+    embed.add_field(
+        name="📊 التحديثات",
+        value=f"**تعديلات آخر ساعة:** {edits_last_hour}\n"
+              f"**إجمالي التعديلات:** {leaderboard_stats['edits']}\n"
+              f"**تم تخطيها (بدون تغيير):** {leaderboard_stats['skipped_unchanged']}",
+        inline=False
+    )
+    embed.add_field(
+        name="⚡ الأحداث",
+        value=f"**غيرت المراكز الظاهرة:** {leaderboard_stats['triggers']}\n"
+              f"**مدمجة في تحديث قائم:** {leaderboard_stats['debounced']}\n"
+              f"**لم تغير المراكز الظاهرة:** {leaderboard_stats['ignored']}",
+        inline=False
+    )
+    embed.add_field(
+        name="⏱️ التأخير",
+        value=f"avg {average_lag:.1f}s • max {leaderboard_stats['lag_max']:.1f}s • نافذة {leaderboard_debounce:.0f}s",
+        inline=False
+    )
+    page_requests = leaderboard_stats['page_hits'] + leaderboard_stats['page_misses']
+    hit_rate = leaderboard_stats['page_hits'] / page_requests * 100 if page_requests else 0
+    embed.add_field(
+        name="👤 أسماء اللاعبين",
+        value=f"**نسبة الإصابة:** {player_names.hit_rate:.0f}%\n"
+              f"**محفوظة بالذاكرة:** {len(player_names.names)} • **تم جلبها:** {player_names.stats['fetched']}",
+        inline=False
+    )
+    embed.add_field(
+        name="📄 ذاكرة الصفحات",
+        value=f"**صفحات محفوظة:** {len(leaderboard_page_cache)}\n**نسبة الإصابة:** {hit_rate:.0f}% ({page_requests} طلب)",
+        inline=False
+    )
+    embed.add_field(
+        name="🎖️ ملفات /rank",
+        value=f"**نسبة الإصابة:** {profile_cache.hit_rate:.0f}% "
+              f"({profile_cache.stats['hits'] + profile_cache.stats['misses']} طلب)\n"
+              f"**محفوظة:** {len(profile_cache.profiles)}/{profile_cache.capacity} • "
+              f"**أُلغيت:** {profile_cache.stats['invalidations']} • **أُخرجت:** {profile_cache.stats['evictions']}",
+        inline=False
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
-@bot.tree.command(name="rank", description="عرض معلومات رانكك ومعلومات التقدم (DM فقط)")
+@bot.tree.command(name="perf", description="عرض زمن تنفيذ الأوامر والمهام")
+@app_commands.describe(handler="اسم المعالج لعرض تفاصيله", reset="تصفير الإحصائيات بعد العرض")
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def perf_status(interaction: discord.Interaction, handler: str = None, reset: bool = False):
+    """Show latency percentiles of the instrumented handlers"""
+    hours = (time.time() - perf_registry.started_at) / 3600
+    if handler:
+        stats = perf_registry.handlers.get(handler)
+        if not stats:
+            await interaction.response.send_message(f"❌ لا توجد بيانات للمعالج `{handler}`", ephemeral=True)
+            return
+        lines = [f"{'metric':6} {'count':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} {'mean':>8}"]
+        for metric, histogram in stats.histograms.items():
+            values = [histogram.percentile(50), histogram.percentile(90), histogram.percentile(99),
+                      histogram.max / 1_000_000, histogram.mean]
+            lines.append(f"{metric:6} {histogram.count:>6} " + " ".join(f"{value * 1000:>8.1f}" for value in values))
+        description = f"```{chr(10).join(lines)}```\n**أخطاء:** {stats.errors}"
+        title = f"⏱️ {handler}"
+    else:
+        description = f"```{format_report(perf_registry.handlers, 15)}```" if perf_registry.handlers else "لا توجد بيانات بعد"
+        title = "⏱️ زمن تنفيذ المعالجات"
+
+    embed = discord.Embed(title=title, description=description, color=0x2F3136)
+    embed.set_footer(text=f"الأزمنة بالمللي ثانية • منذ {hours:.1f} ساعة")
+    if reset:
+        perf_registry.reset()
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="perf_export", description="تصدير إحصائيات زمن التنفيذ كملف JSON")
 @app_commands.describe()
-async def show_rank_info(interaction: discord.Interaction):
-    """Show user rank and progress info (DM only)"""
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def perf_export(interaction: discord.Interaction):
+    """Send the raw latency histograms and statement stats for offline analysis with perf.py"""
+    export = perf_registry.export()
+    export['statements'] = statement_profiler.export()
+    data = json.dumps(export).encode()
+    filename = f"perf_export_{datetime.now():%Y%m%d_%H%M%S}.json"
+    await interaction.response.send_message(file=discord.File(io.BytesIO(data), filename=filename), ephemeral=True)
+
+@bot.tree.command(name="db_stats", description="أكثر استعلامات قاعدة البيانات استهلاكاً للوقت")
+@app_commands.describe(sort="ترتيب حسب", top="عدد الاستعلامات", reset="تصفير الإحصائيات بعد العرض")
+@app_commands.choices(sort=[
+    app_commands.Choice(name="الوقت الكلي", value="total"),
+    app_commands.Choice(name="عدد التنفيذ", value="count"),
+    app_commands.Choice(name="أطول تنفيذ", value="max"),
+    app_commands.Choice(name="الصفوف المرجعة", value="rows")
+])
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def db_stats(interaction: discord.Interaction, sort: str = "total", top: int = 10, reset: bool = False):
+    """Show the statement fingerprints with the most time, runs, longest run or rows"""
+    statements = statement_profiler.top(max(1, min(top, 20)), sort)
+    hours = (time.time() - statement_profiler.started_at) / 3600
+    embed = discord.Embed(
+        title="🗄️ استعلامات قاعدة البيانات",
+        description=f"```{format_statements(statements, width=60)}```" if statements else "لا توجد بيانات بعد",
+        color=0x2F3136
+    )
     
-    # Check if command is used in DM
-    if interaction.guild is not None:
-        await interaction.response.send_message("❌ هذا الأمر يعمل في الرسائل الخاصة فقط! ارسل `/rank` في رسالة خاصة للبوت.", ephemeral=True)
+    slow = list(statement_profiler.slow_log)[-5:]
+    if slow:
+        lines = []
+        for entry in reversed(slow):
+            scan = " ⚠️ SCAN" if entry['full_scan'] else ""
+            lines.append(f"`{entry['elapsed'] * 1000:.0f}ms`{scan} {entry['handler'] or 'background'}: `{entry['fingerprint'][:80]}`")
+        embed.add_field(name=f"🐢 آخر الاستعلامات البطيئة (> {statement_profiler.slow_threshold * 1000:.0f}ms)",
+                        value="\n".join(lines)[:1024], inline=False)
+    
+    embed.set_footer(text=f"الأزمنة بالمللي ثانية • {len(statement_profiler.statements)} استعلام مختلف • منذ {hours:.1f} ساعة")
+    if reset:
+        statement_profiler.reset()
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+def get_rank_stats(thresholds=None):
+    """MMR distribution of ranked players, cached until the ranking changes"""
+    global rank_stats_cache
+    if rank_stats_cache is None:
+        # The ranking is sorted by descending points, so reversed it is ascending
+        points = np.fromiter((-negative_points for negative_points, user_id in reversed(player_ranking.ranked)),
+                             dtype=np.int64, count=player_ranking.ranked_count)
+        rank_stats_cache = (points, distribution_stats(points, presorted=True, ranks=config.ranks))
+    
+    points, stats = rank_stats_cache
+    if thresholds:
+        return distribution_stats(points, thresholds, presorted=True, ranks=config.ranks)
+    return stats
+
+@bot.tree.command(name="rank_stats", description="إحصائيات توزيع MMR على الرانكات")
+@app_commands.describe(what_if="حدود مقترحة للرانكات، مثال: SILVER=820 CRYSTAL=1120")
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def rank_stats(interaction: discord.Interaction, what_if: str = None):
+    """Show how many ranked players fall into each tier"""
+    try:
+        thresholds = parse_thresholds([what_if], config.ranks) if what_if else None
+    except ValueError as e:
+        await interaction.response.send_message(f"❌ صيغة غير صحيحة: {e}", ephemeral=True)
         return
     
-    user_id = interaction.user.id
-    current_mmr = get_player_points(user_id)
-    placement_matches = get_player_placement_matches(user_id)
-    is_ranked = placement_matches >= 5
-    
-    # Create profile embed
+    stats = get_rank_stats(thresholds)
     embed = discord.Embed(
-        title=f"🎮 ملف {interaction.user.display_name} الشخصي",
+        title="📊 توزيع MMR",
+        description=f"**لاعبين مرتبين:** {stats['count']}",
         color=0x2F3136
     )
-    
-    # Add user avatar
-    if interaction.user.avatar:
-        embed.set_thumbnail(url=interaction.user.avatar.url)
-    
-    if not is_ranked:
-        # Player in placement matches
+    if stats['count']:
+        percentiles = " • ".join(f"p{p}: {value:.0f}" for p, value in stats['percentiles'].items())
         embed.add_field(
-            name="📋 المباريات التأهيلية",
-            value=f"**التقدم:** {placement_matches}/5 مباريات\n**MMR الحالي:** {current_mmr}\n**الحالة:** في المباريات التأهيلية",
+            name="📈 MMR",
+            value=f"**المتوسط:** {stats['mean']:.0f} • **الانحراف المعياري:** {stats['std']:.0f}\n"
+                  f"**الأدنى:** {stats['min']} • **الأعلى:** {stats['max']}\n{percentiles}",
             inline=False
         )
-        
+    embed.add_field(
+        name="🎖️ الرانكات الحالية",
+        value=f"```{format_tiers(stats['tiers'], stats['count'], config.ranks)}```",
+        inline=False
+    )
+    if 'what_if' in stats:
         embed.add_field(
-            name="📈 ما تحتاجه للحصول على الرانك:",
-            value=f"• أكمل {5 - placement_matches} مباريات إضافية\n• بعدها ستحصل على رانكك الأول ودور في السيرفر\n• ستظهر في لوحة المتصدرين",
+            name="🔮 بالحدود المقترحة",
+            value=f"```{format_tiers(stats['what_if'], stats['count'], config.ranks)}```",
             inline=False
         )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+def get_current_season():
+    cursor.execute("SELECT season_id, name, started_at FROM seasons WHERE ended_at IS NULL ORDER BY season_id DESC LIMIT 1")
+    return cursor.fetchone()
+
+def end_season(next_name=None):
+    """Archive the final standings, soft reset every player and start the next season
+
+    Returns (ended season id, archived player count, new season id).
+    """
+    global rank_stats_cache
+    season_id, name, started_at = get_current_season()
+    next_name = next_name or f"Season {season_id + 1}"
+    
+    try:
+        # Same order as the leaderboard
+        cursor.execute("""
+            INSERT INTO season_standings (season_id, position, user_id, points, wins, losses)
+            SELECT ?, ROW_NUMBER() OVER (ORDER BY points DESC, user_id), user_id, points, wins, losses
+            FROM players
+            WHERE placement_matches >= ?
+        """, (season_id, config.placement_matches))
+        archived = cursor.rowcount
         
-        # Show what rank they would get
-        predicted_rank_name, predicted_rank_emoji = get_rank_from_mmr(current_mmr)
+        cursor.execute("""
+            UPDATE seasons
+            SET ended_at = CURRENT_TIMESTAMP, reset_target = ?, reset_factor = ?
+            WHERE season_id = ?
+        """, (season_reset_target, season_reset_factor, season_id))
+        
+        # Soft reset in one statement - the replay tool applies the same rounding
+        cursor.execute("""
+            UPDATE players
+            SET points = MAX(0, CAST(? + (points - ?) * ? + 0.5 AS INTEGER)), wins = 0, losses = 0
+        """, (season_reset_target, season_reset_target, season_reset_factor))
+        
+        cursor.execute("INSERT INTO seasons (name) VALUES (?)", (next_name,))
+        new_season_id = cursor.lastrowid
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    # Every position may have moved
+    player_ranking.load(cursor)
+    profile_cache.clear()
+    leaderboard_page_cache.clear()
+    rank_stats_cache = None
+    schedule_leaderboard_refresh()
+    return season_id, archived, new_season_id
+
+@bot.tree.command(name="season_end", description="إنهاء الموسم الحالي وأرشفة الترتيب وبدء موسم جديد")
+@app_commands.describe(next_name="اسم الموسم الجديد (اختياري)")
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def season_end(interaction: discord.Interaction, next_name: str = None):
+    """End the current season with a soft MMR reset"""
+    await interaction.response.defer(ephemeral=True)
+    season_id, archived, new_season_id = end_season(next_name)
+    print(f"🏁 SEASON: {interaction.user.display_name} ended season {season_id} ({archived} players archived)")
+    
+    # Rank roles follow the reset MMR, paced like the periodic sync
+    asyncio.create_task(sync_all_rank_roles())
+    
+    embed = discord.Embed(
+        title="🏁 انتهى الموسم",
+        description=f"تم أرشفة ترتيب **{archived}** لاعب للموسم **{season_id}**\nبدأ الموسم **{new_season_id}**",
+        color=0x00FF00
+    )
+    embed.add_field(
+        name="🔄 إعادة ضبط MMR",
+        value=f"MMR الجديد = {season_reset_target} + (MMR - {season_reset_target}) × {season_reset_factor}\n"
+              f"• تم تصفير الانتصارات والهزائم\n• يتم تحديث أدوار الرانك تدريجياً",
+        inline=False
+    )
+    await rest(PRIORITY_COSMETIC, 'message_send', interaction.followup.send, embed=embed, ephemeral=True)
+
+@bot.tree.command(name="season_leaderboard", description="عرض ترتيب موسم سابق")
+@app_commands.describe(season="رقم الموسم", page="رقم الصفحة")
+@instrument()
+async def season_leaderboard(interaction: discord.Interaction, season: int, page: int = 1):
+    """Show a page of an archived season's final standings"""
+    cursor.execute("SELECT name, started_at, ended_at FROM seasons WHERE season_id = ? AND ended_at IS NOT NULL", (season,))
+    season_info = cursor.fetchone()
+    if not season_info:
+        await interaction.response.send_message("❌ الموسم غير موجود أو لم ينته بعد!", ephemeral=True)
+        return
+    
+    # Range read on the (season_id, position) primary key
+    first_position = (max(1, page) - 1) * LEADERBOARD_SIZE + 1
+    cursor.execute("""
+        SELECT position, user_id, points, wins, losses
+        FROM season_standings
+        WHERE season_id = ? AND position BETWEEN ? AND ?
+        ORDER BY position
+    """, (season, first_position, first_position + LEADERBOARD_SIZE - 1))
+    standings = cursor.fetchall()
+    
+    names = resolve_player_names([row[1] for row in standings])
+    text = ""
+    for position, user_id, points, wins, losses in standings:
+        rank_name, rank_emoji = config.ranks.get_rank_from_mmr(points)
+        position_emoji = ["🥇", "🥈", "🥉"][position - 1] if position <= 3 else f"**{position}.**"
+        text += f"{position_emoji} {rank_emoji} {names[user_id]}\n`{points} MMR - {wins}W/{losses}L`\n\n"
+    
+    name, started_at, ended_at = season_info
+    embed = discord.Embed(
+        title=f"🏆 {name} - الترتيب النهائي",
+        description=text or "لا يوجد لاعبين في هذه الصفحة",
+        color=0xFFD700
+    )
+    embed.set_footer(text=f"{started_at[:10]} → {ended_at[:10]} • الصفحة {max(1, page)}")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="sync_ranks", description="مزامنة أدوار الرانك لجميع الأعضاء")
+@app_commands.describe()
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def sync_ranks(interaction: discord.Interaction):
+    """Run the rank role sync on demand"""
+    await interaction.response.defer(ephemeral=True)
+    reports = await sync_all_rank_roles()
+    
+    embed = discord.Embed(
+        title="🏷️ مزامنة أدوار الرانك",
+        color=0x00FF00
+    )
+    for report in reports:
         embed.add_field(
-            name="🔮 الرانك المتوقع (حسب MMR الحالي)",
-            value=f"{predicted_rank_emoji} {predicted_rank_name}",
+            name=report['guild'],
+            value=f"**أعضاء تم فحصهم:** {report['scanned']}\n"
+                  f"**تغييرات مطبقة:** {report['changes']}\n"
+                  f"**فشل:** {report['failed']}\n"
+                  f"**المدة:** {report['duration']:.2f}s",
             inline=False
         )
-        
-    else:
-        # Ranked player
-        current_rank_name, current_rank_emoji = get_rank_from_mmr(current_mmr)
-        
+    await rest(PRIORITY_COSMETIC, 'message_send', interaction.followup.send, embed=embed, ephemeral=True)
+
+def apply_config(new_config):
+    """Swap in a new config and rebuild the state derived from the old one
+
+    Returns the changed top-level sections. Active matches keep the config
+    stored when they were created.
+    """
+    global config, rank_stats_cache
+    changed = new_config.changed_sections(config)
+    config = new_config
+
+    if 'placement_matches' in changed:
+        player_ranking.placement_required = new_config.placement_matches
+        player_ranking.load(cursor)
+    if 'ranks' in changed or 'placement_matches' in changed:
+        leaderboard_page_cache.clear()
+        rank_stats_cache = None
+        schedule_leaderboard_refresh()
+    if 'ranks' in changed:
+        # Roles of new or renamed tiers are resolved or created by the sync, which also takes the old ones off
+        for guild_id, guild_roles in rank_role_cache.items():
+            retired_rank_roles.setdefault(guild_id, set()).update(guild_roles.values())
+        rank_role_cache.clear()
+        asyncio.create_task(sync_all_rank_roles())
+    return changed
+
+@bot.tree.command(name="reload_config", description="إعادة تحميل إعدادات الرانكات والنقاط بدون إعادة تشغيل البوت")
+@app_commands.describe()
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def reload_config(interaction: discord.Interaction):
+    """Validate the config file and swap it in as a whole"""
+    try:
+        new_config = load_config(config_path, default_rating_model)
+    except ConfigError as e:
+        errors = "\n".join(f"• {error}" for error in e.errors[:15])
+        await interaction.response.send_message(f"❌ الإعدادات غير صالحة، لم يتم تغيير شيء:\n{errors}", ephemeral=True)
+        return
+
+    old_digest = config.digest
+    changed = apply_config(new_config)
+    print(f"Config reloaded: {old_digest} → {new_config.digest} (changed: {', '.join(changed) or 'nothing'})")
+    if 'queue_timeout' in changed or 'placement_matches' in changed or 'ranks' in changed:
+        await update_queue_embed()
+
+    embed = discord.Embed(
+        title="⚙️ تم تحميل الإعدادات",
+        description=f"**الإصدار:** `{old_digest}` → `{new_config.digest}`",
+        color=0x00FF00
+    )
+    embed.add_field(
+        name="🔄 الأقسام المتغيرة",
+        value=", ".join(changed) or "لا يوجد تغيير",
+        inline=False
+    )
+    embed.add_field(
+        name="📐 الإعدادات الحالية",
+        value=f"**نموذج التقييم:** {new_config.rating_model.name}\n"
+              f"**المباريات التأهيلية:** {new_config.placement_matches}\n"
+              f"**مهلة الطابور:** {new_config.queue_timeout}s\n"
+              f"**الرانكات:** {len(new_config.ranks.ranks)}",
+        inline=False
+    )
+    still_old = sum(1 for match_info in active_matches.values()
+                    if match_info.get('config', new_config).digest != new_config.digest)
+    if still_old:
         embed.add_field(
-            name="🎖️ رانكك الحالي",
-            value=f"{current_rank_emoji} {current_rank_name}\n**MMR:** {current_mmr}",
+            name="🎮 المباريات الجارية",
+            value=f"{still_old} مباراة ستكمل بالإعدادات التي بدأت بها",
             inline=False
         )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="sweep_channels", description="حذف قنوات المباريات المتبقية بدون مباراة نشطة")
+@app_commands.describe()
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def sweep_channels(interaction: discord.Interaction):
+    """Run the orphan match channel sweeper on demand"""
+    await interaction.response.defer(ephemeral=True)
+    report = await sweep_orphan_channels()
+    
+    embed = discord.Embed(
+        title="🧹 تنظيف قنوات المباريات",
+        color=0x00FF00
+    )
+    embed.add_field(
+        name="📊 النتيجة",
+        value=f"**قنوات تم فحصها:** {report['checked']}\n"
+              f"**قنوات تم حذفها:** {report['removed']}\n"
+              f"**مباريات معلقة تم إغلاقها:** {report['stale_matches']}\n"
+              f"**المدة:** {report['duration']:.2f}s",
+        inline=False
+    )
+    await rest(PRIORITY_COSMETIC, 'message_send', interaction.followup.send, embed=embed, ephemeral=True)
+
+@bot.tree.command(name="set_leaderboard", description="إنشاء لوحة المتصدرين مع التحديث التلقائي")
+@app_commands.describe(scope="نوع اللوحة")
+@app_commands.choices(scope=[
+    app_commands.Choice(name="عامة", value="global"),
+    app_commands.Choice(name="السيرفر", value="guild"),
+    app_commands.Choice(name="الموسم الحالي", value="season"),
+    app_commands.Choice(name="الأكثر تقدماً هذا الأسبوع", value="weekly")
+])
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def set_leaderboard_channel(interaction: discord.Interaction, scope: str = "global"):
+    """Create auto-updating leaderboard (Admin only)"""
+    await interaction.response.send_message("✅ تم إنشاء لوحة المتصدرين مع التحديث التلقائي بعد كل نتيجة!", ephemeral=True)
+    await post_leaderboard_board(scope, interaction.channel)
+
+def build_rank_profile(user_id):
+    """(is_ranked, [(field name, value)]) of a player's /rank profile, without the leaderboard position"""
+    current_mmr = get_player_points(user_id)
+    placement_matches = get_player_placement_matches(user_id)
+    ranks = config.ranks
+    is_ranked = placement_matches >= config.placement_matches
+    fields = []
+    
+    if not is_ranked:
+        # Player in placement matches
+        fields.append((
+            "📋 المباريات التأهيلية",
+            f"**التقدم:** {placement_matches}/{config.placement_matches} مباريات\n**MMR الحالي:** {current_mmr}\n**الحالة:** في المباريات التأهيلية"
+        ))
+        fields.append((
+            "📈 ما تحتاجه للحصول على الرانك:",
+            f"• أكمل {config.placement_matches - placement_matches} مباريات إضافية\n• بعدها ستحصل على رانكك الأول ودور في السيرفر\n• ستظهر في لوحة المتصدرين"
+        ))
+        
+        # Show what rank they would get
+        predicted_rank_name, predicted_rank_emoji = ranks.get_rank_from_mmr(current_mmr)
+        fields.append(("🔮 الرانك المتوقع (حسب MMR الحالي)", f"{predicted_rank_emoji} {predicted_rank_name}"))
+        
+    else:
+        # Ranked player
+        current_rank_name, current_rank_emoji = ranks.get_rank_from_mmr(current_mmr)
+        fields.append(("🎖️ رانكك الحالي", f"{current_rank_emoji} {current_rank_name}\n**MMR:** {current_mmr}"))
         
         # Find next rank
-        next_rank_info = None
-        for rank_key, rank_data in RANK_SYSTEM.items():
-            if rank_data["min_mmr"] > current_mmr:
-                next_rank_info = rank_data
-                break
+        next_rank_info = ranks.next_rank(current_mmr)
         
         if next_rank_info:
-            points_needed = next_rank_info["min_mmr"] - current_mmr
-            embed.add_field(
-                name="⬆️ الرانك القادم",
-                value=f"{next_rank_info['emoji']} {next_rank_info['name']}\n**تحتاج:** {points_needed} نقطة إضافية\n**MMR المطلوب:** {next_rank_info['min_mmr']}",
-                inline=False
-            )
+            points_needed = next_rank_info.min_mmr - current_mmr
+            fields.append((
+                "⬆️ الرانك القادم",
+                f"{next_rank_info.emoji} {next_rank_info.name}\n**تحتاج:** {points_needed} نقطة إضافية\n**MMR المطلوب:** {next_rank_info.min_mmr}"
+            ))
             
             # Calculate wins needed
-            wins_needed = max(1, (points_needed + 24) // 25)  # Round up
-            embed.add_field(
-                name="🏆 للوصول للرانك القادم",
-                value=f"• انتصارات تقريبية مطلوبة: **{wins_needed}** انتصار\n• كل انتصار = +25 MMR\n• كل هزيمة = -20 MMR",
-                inline=False
-            )
+            win_points, loss_points = config.rating_model.even_match_changes(current_mmr)
+            wins_needed = max(1, -(-points_needed // max(1, win_points)))  # Round up
+            fields.append((
+                "🏆 للوصول للرانك القادم",
+                f"• انتصارات تقريبية مطلوبة: **{wins_needed}** انتصار\n• كل انتصار = +{win_points} MMR\n• كل هزيمة = -{loss_points} MMR"
+            ))
         else:
-            embed.add_field(
-                name="👑 أعلى رانك!",
-                value="🎉 تهانينا! وصلت لأعلى رانك في النظام!\n**LEGENDARY SEEKER** هو أقصى رانك متاح.",
-                inline=False
-            )
+            fields.append((
+                "👑 أعلى رانك!",
+                f"🎉 تهانينا! وصلت لأعلى رانك في النظام!\n**{ranks.ranks[-1].name}** هو أقصى رانك متاح."
+            ))
     
     # Add rank system info
-    embed.add_field(
-        name="📊 نظام الرانكات",
-        value="**UNRANKED** (700-799) → **SILVER SEEKER** (800-949) → **PLATINUM SEEKER** (950-1099) → **CRYSTAL SEEKER** (1100-1249) → **ELITE SEEKER** (1250-1449) → **MASTER SEEKER** (1450-1699) → **LEGENDARY SEEKER** (1700+)",
-        inline=False
+    tiers = [f"**{rank.name}** ({rank.min_mmr}-{rank.max_mmr})" for rank in ranks.ranks[:-1]]
+    tiers.append(f"**{ranks.ranks[-1].name}** ({ranks.ranks[-1].min_mmr}+)")
+    fields.append(("📊 نظام الرانكات", " → ".join(tiers)))
+    return is_ranked, fields
+
+def create_rank_profile_embed(user, profile):
+    """Profile embed from a cached profile plus the player's current leaderboard position"""
+    is_ranked, fields = profile
+    embed = discord.Embed(
+        title=f"🎮 ملف {user.display_name} الشخصي",
+        color=0x2F3136
     )
     
+    # Add user avatar
+    if user.avatar:
+        embed.set_thumbnail(url=user.avatar.url)
+    
+    for index, (name, value) in enumerate(fields):
+        embed.add_field(name=name, value=value, inline=False)
+        
+        # Position moves with every match on the server, so it is never cached
+        position = player_ranking.position(user.id) if is_ranked and index == 0 else None
+        if position:
+            embed.add_field(
+                name="🏅 ترتيبك",
+                value=f"**المركز:** #{position} من {player_ranking.ranked_count}\n"
+                      f"**أفضل من:** {player_ranking.percentile(position):.1f}% من اللاعبين المرتبين",
+                inline=False
+            )
+    
     embed.set_footer(text="💡 نصيحة: انضم للطابور في السيرفر لتحسين رانكك!")
     embed.timestamp = datetime.now()
+    return embed
+
+@bot.tree.command(name="rank", description="عرض معلومات رانكك ومعلومات التقدم (DM فقط)")
+@app_commands.describe()
+@instrument()
+async def show_rank_info(interaction: discord.Interaction):
+    """Show user rank and progress info (DM only)"""
     
-    await interaction.response.send_message(embed=embed)
+    # Check if command is used in DM
+    if interaction.guild is not None:
+        await interaction.response.send_message("❌ هذا الأمر يعمل في الرسائل الخاصة فقط! ارسل `/rank` في رسالة خاصة للبوت.", ephemeral=True)
+        return
+    
+    user_id = interaction.user.id
+    profile = profile_cache.get(user_id)
+    if profile is None:
+        version = profile_cache.version(user_id)
+        profile = build_rank_profile(user_id)
+        profile_cache.put(user_id, version, profile)
+    
+    await interaction.response.send_message(embed=create_rank_profile_embed(interaction.user, profile))
 
 # Admin result modification command
 @bot.tree.command(name="admin_result", description="تعديل نتائج المباراة للمشرفين")
 @app_commands.describe()
 @app_commands.default_permissions(manage_messages=True)
+@instrument()
 async def admin_modify_result(interaction: discord.Interaction):
     """Allow admins to modify match results"""
     # Check if user has admin permissions
@@ -1415,29 +3282,22 @@ async def admin_modify_result(interaction: discord.Interaction):
         await interaction.response.send_message("❌ لا توجد مباريات مكتملة للتعديل!", ephemeral=True)
         return
     
+    # Get all player names in one pass - select descriptions can't render mentions
+    names = resolve_player_names({player_id for match in recent_matches for player_id in match[1:5]},
+                                 fallback=lambda user_id: f"ID {user_id}")
+    
     # Create select menu with recent matches
     options = []
     for match in recent_matches[:10]:  # Limit to 10 matches
         match_id, t1p1, t1p2, t2p1, t2p2, winner, created_at = match
+        winner_text = "Team 1" if winner == 1 else "Team 2" if winner == 2 else "Cancelled"
+        description = f"{names[t1p1]} & {names[t1p2]} vs {names[t2p1]} & {names[t2p2]} - {winner_text}"
         
-        # Get player names
-        try:
-            p1 = bot.get_user(t1p1)
-            p2 = bot.get_user(t1p2) 
-            p3 = bot.get_user(t2p1)
-            p4 = bot.get_user(t2p2)
-            
-            if p1 and p2 and p3 and p4:
-                winner_text = "Team 1" if winner == 1 else "Team 2" if winner == 2 else "Cancelled"
-                description = f"{p1.display_name} & {p2.display_name} vs {p3.display_name} & {p4.display_name} - {winner_text}"
-                
-                options.append(discord.SelectOption(
-                    label=f"HSM{match_id}",
-                    description=description[:100],  # Discord limit
-                    value=str(match_id)
-                ))
-        except:
-            continue
+        options.append(discord.SelectOption(
+            label=f"HSM{match_id}",
+            description=description[:100],  # Discord limit
+            value=str(match_id)
+        ))
     
     if not options:
         await interaction.response.send_message("❌ لا يمكن العثور على مباريات صالحة للتعديل!", ephemeral=True)
@@ -1458,45 +3318,87 @@ async def admin_modify_result(interaction: discord.Interaction):
     
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
+@bot.tree.command(name="admin_bulk_result", description="تعديل نتائج عدة مباريات دفعة واحدة")
+@app_commands.describe(changes="المباريات والنتائج الجديدة، مثال: 12=1 13=2 14=cancel")
+@app_commands.default_permissions(administrator=True)
+@instrument()
+async def admin_bulk_result(interaction: discord.Interaction, changes: str):
+    """Change the result of many matches in one transaction"""
+    try:
+        parsed_changes = parse_match_changes([changes])
+    except ValueError as e:
+        await interaction.response.send_message(f"❌ صيغة غير صحيحة: {e}", ephemeral=True)
+        return
+    
+    report = bulk_recalculate(conn, parsed_changes, model=config.rating_model)
+    record_admin_changes(report)
+    print(f"🛠️ ADMIN: {interaction.user.display_name} bulk modified {len(report['matches'])} matches")
+    
+    # One role resync per affected player, on the settlement worker behind match settlements
+    role_updates = [(user_id, player['new_points']) for user_id, player in report['players'].items()]
+    if interaction.guild and role_updates:
+        enqueue_settlement("admin_bulk_result", [
+            ('roles', functools.partial(apply_rank_role_updates, interaction.guild, role_updates, PRIORITY_COSMETIC), 0)
+        ])
+    
+    embed = discord.Embed(
+        title="✅ تم تعديل النتائج",
+        color=0x00FF00 if report['matches'] else 0xFF6B00
+    )
+    winner_names = {1: "Team 1", 2: "Team 2", -1: "ملغية"}
+    changed_text = "\n".join(f"HSM{match_id}: {winner_names.get(old, old)} → {winner_names.get(new, new)}"
+                              for match_id, old, new in report['matches'][:20])
+    embed.add_field(name=f"📊 مباريات معدلة ({len(report['matches'])})", value=changed_text or "لا يوجد", inline=False)
+    if report['skipped']:
+        skipped_text = "\n".join(f"HSM{match_id}: {reason}" for match_id, reason in report['skipped'][:20])
+        embed.add_field(name=f"⚠️ تم تجاهلها ({len(report['skipped'])})", value=skipped_text, inline=False)
+    embed.add_field(name="👥 لاعبين متأثرين", value=str(len(report['players'])), inline=False)
+    embed.set_footer(text=f"بواسطة {interaction.user.display_name}")
+    
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 # Match result slash command with interactive menu
 @bot.tree.command(name="report", description="تسجيل نتيجة المباراة - قائمة تفاعلية")
 @app_commands.describe()
+@instrument()
 async def match_result(interaction: discord.Interaction):
     """Report match result with interactive menu"""
     await open_result_menu(interaction)
 
+@instrument()
 async def open_result_menu(interaction: discord.Interaction):
     """Open result selection menu for match participants"""
     user = interaction.user
     
     # Find which match this user is in
-    user_match = None
-    for match_name, match_info in active_matches.items():
-        if user in match_info['players']:
-            # Check if user is in the match channel or any channel
-            if 'text_channel' in match_info and match_info['text_channel'] and hasattr(match_info['text_channel'], 'id'):
-                if hasattr(interaction.channel, 'id') and interaction.channel.id == match_info['text_channel'].id:
-                    user_match = match_name
-                    break
-            else:
-                # Fallback - allow from any channel if match channel not found
-                user_match = match_name
-                break
+    user_match = player_active_match.get(user.id)
+    match_info = active_matches.get(user_match)
+    if not match_info:
+        user_match = None
+    elif match_info.get('text_channel') and hasattr(match_info['text_channel'], 'id'):
+        # Check if user is in the match channel (fallback - any channel if match channel not found)
+        if not hasattr(interaction.channel, 'id') or interaction.channel.id != match_info['text_channel'].id:
+            user_match = None
     
     if not user_match:
         await interaction.response.send_message("❌ لست في مباراة نشطة في هذه القناة!", ephemeral=True)
         return
     
-    # Check if result already reported for this match
-    if user_match in match_results:
-        reported_by = match_results[user_match]['reporter']
+    # Check if result already reported for this match (expired report leases are dropped)
+    existing = match_results.get(user_match)
+    if existing and existing.get('processing') and existing['lease_expires'] <= datetime.now():
+        del match_results[user_match]
+        existing = None
+    if existing:
+        reported_by = existing['reporter']
         await interaction.response.send_message(f"❌ تم تسجيل النتيجة مسبقاً بواسطة {reported_by.display_name}!", ephemeral=True)
         return
     
     # Mark that this user is reporting the result (first-come-first-served)
     match_results[user_match] = {
         'reporter': user,
-        'processing': True
+        'processing': True,
+        'lease_expires': datetime.now() + timedelta(seconds=report_lease_timeout)
     }
     
     # Get match info for displaying team details
@@ -1533,9 +3435,209 @@ async def open_result_menu(interaction: discord.Interaction):
         inline=False
     )
     
-    view = ResultMenuView(user_match)
+    view = ResultMenuView(user_match, user)
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
+@dataclass
+class PlayerOutcome:
+    """MMR and placement of one player before and after a settled match"""
+    player: object
+    team: int
+    won: bool
+    old_points: int
+    new_points: int
+    old_placement: int
+    new_placement: int
+    config: BotConfig  # Snapshot the match was played with
+    
+    @property
+    def delta(self):
+        return self.new_points - self.old_points
+    
+    @property
+    def is_placement(self):
+        """Match counted as one of the player's placement matches"""
+        return self.old_placement < self.config.placement_matches
+    
+    @property
+    def completed_placement(self):
+        return self.is_placement and self.new_placement >= self.config.placement_matches
+    
+    @property
+    def old_rank(self):
+        return self.config.ranks.get_rank_from_mmr(self.old_points)
+    
+    @property
+    def new_rank(self):
+        return self.config.ranks.get_rank_from_mmr(self.new_points)
+    
+    @property
+    def rank_changed(self):
+        return self.old_rank[0] != self.new_rank[0]
+    
+    @property
+    def needs_role_update(self):
+        return self.completed_placement or (not self.is_placement and self.rank_changed)
+
+@dataclass
+class SettlementResult:
+    """Everything needed to render a settled match, computed once"""
+    match_name: str
+    match_id: int
+    winner: int
+    result_text: str
+    reporter: object
+    outcomes: list = field(default_factory=list)
+    
+    @property
+    def winners(self):
+        return [outcome for outcome in self.outcomes if outcome.won]
+    
+    @property
+    def losers(self):
+        return [outcome for outcome in self.outcomes if not outcome.won]
+
+def settle_match(match_name, match_info, winner, result_text, reporter):
+    """Apply a match result to the players table in one transaction"""
+    teams = [(1, player) for player in match_info['team1']] + [(2, player) for player in match_info['team2']]
+    player_ids = [player.id for team, player in teams]
+    match_config = match_info.get('config', config)
+    result = SettlementResult(match_name, match_info['match_id'], winner, result_text, reporter)
+    
+    try:
+        # New players start with 1000 points and 0 placement matches
+        cursor.executemany("INSERT OR IGNORE INTO players (user_id, points, wins, losses, placement_matches) VALUES (?, 1000, 0, 0, 0)",
+                           [(player_id,) for player_id in player_ids])
+        cursor.execute(f"SELECT user_id, points, placement_matches FROM players WHERE user_id IN ({','.join('?' * len(player_ids))})",
+                       player_ids)
+        current = {user_id: (points, placement) for user_id, points, placement in cursor.fetchall()}
+        
+        # Seats 0-1 are team 1 and 2-3 team 2, as the rating model expects
+        points = np.array([[current[player_id][0] for player_id in player_ids]])
+        placement = np.array([[current[player_id][1] for player_id in player_ids]])
+        won = np.array([[team == winner for team, player in teams]])
+        new_points = match_config.rating_model.apply(points, placement, won)[0].tolist()
+        
+        for (team, player), player_new_points in zip(teams, new_points):
+            old_points, old_placement = current[player.id]
+            result.outcomes.append(PlayerOutcome(player, team, team == winner, old_points, player_new_points,
+                                                 old_placement, old_placement + 1, match_config))
+        
+        cursor.executemany("""
+            UPDATE players 
+            SET points = ?, placement_matches = ?, wins = wins + ?, losses = losses + ?
+            WHERE user_id = ?
+        """, [(outcome.new_points, outcome.new_placement, int(outcome.won), int(not outcome.won), outcome.player.id)
+              for outcome in result.outcomes])
+        record_mmr_changes([(outcome.player.id, outcome.delta) for outcome in result.outcomes], match_info['match_id'])
+        
+        # Update match as completed in database
+        cursor.execute("""
+            UPDATE matches 
+            SET winner = ?, completed = 1
+            WHERE match_id = ?
+        """, (winner, match_info['match_id']))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    apply_ranking_updates([(outcome.player.id, outcome.new_points, outcome.new_placement) for outcome in result.outcomes],
+                          gained=True)
+    player_names.remember([outcome.player for outcome in result.outcomes])
+    return result
+
+def team_emoji(team):
+    return '🔵' if team == 1 else '🟠'
+
+def create_result_embed(result):
+    """In-channel result embed"""
+    embed = discord.Embed(
+        title=f"🏁 {result.match_name} - نتيجة المباراة",
+        description=f"**النتيجة:** {result.result_text}",
+        color=0x00FF00
+    )
+    
+    embed.add_field(
+        name="📊 معلومات المباراة",
+        value=f"**Name:** {result.match_name}\n**Server:** ME Only\n**Mode:** 2v2\n**تم تسجيلها بواسطة:** {result.reporter.display_name}",
+        inline=False
+    )
+    
+    team_texts = []
+    for outcomes in (result.winners, result.losers):
+        text = ""
+        for outcome in outcomes:
+            text += f"{team_emoji(outcome.team)} {outcome.player.display_name}\n"
+            if outcome.is_placement:
+                text += f"`📋 Placement {outcome.old_placement}/{outcome.config.placement_matches} → {outcome.new_placement}/{outcome.config.placement_matches}`\n"
+            else:
+                new_rank_name, new_rank_emoji = outcome.new_rank
+                rank_change = f" → {new_rank_emoji} {new_rank_name}" if outcome.rank_changed else ""
+                text += f"`{outcome.old_points} → {outcome.new_points} ({outcome.delta:+d})`{rank_change}\n"
+        team_texts.append(text)
+    
+    embed.add_field(name="🏆 الفائزون", value=team_texts[0], inline=True)
+    embed.add_field(name="💔 الخاسرون", value=team_texts[1], inline=True)
+    return embed
+
+def create_public_result_embed(result):
+    """Results channel embed"""
+    public_embed = discord.Embed(
+        title=f"🏁 {result.match_name} - Match Completed",
+        description=f"**Winner:** {result.result_text}",
+        color=0x00FF00
+    )
+    
+    # Show teams with MMR changes
+    team_texts = []
+    for outcomes in (result.winners, result.losers):
+        text = ""
+        for outcome in outcomes:
+            if outcome.is_placement:  # Show placement progress
+                text += f"{team_emoji(outcome.team)} {outcome.player.display_name}: {outcome.delta:+d} MMR\n"
+            else:
+                rank_name, rank_emoji = outcome.new_rank
+                text += f"{team_emoji(outcome.team)} {rank_emoji} {outcome.player.display_name}: {outcome.delta:+d} MMR\n"
+        team_texts.append(text)
+    
+    public_embed.add_field(name="🏆 Winners", value=team_texts[0], inline=True)
+    public_embed.add_field(name="💔 Losers", value=team_texts[1], inline=True)
+    public_embed.add_field(name="📊 Match Info", value=f"**Mode:** 2v2\n**Server:** ME Only\n**Reported by:** {result.reporter.display_name}", inline=False)
+    
+    public_embed.set_footer(text=f"Match ID: {result.match_id}")
+    public_embed.timestamp = datetime.now()
+    return public_embed
+
+def create_settlement_dm(result, outcome):
+    """Direct message sent to a player after their match is settled"""
+    if outcome.won:
+        message = f"🎉 تهانينا! فزت في مباراة {result.match_name}!\n"
+        mmr_line = f"📈 MMR: {outcome.old_points} → {outcome.new_points} ({outcome.delta:+d})"
+    else:
+        message = f"💪 مباراة {result.match_name} انتهت. حظ أفضل في المرة القادمة!\n"
+        mmr_line = f"📉 MMR: {outcome.old_points} → {outcome.new_points} ({outcome.delta:+d})"
+    
+    if outcome.completed_placement:
+        # Just completed placement matches - show rank and role
+        rank_name, rank_emoji = outcome.new_rank
+        return (message +
+                f"📋 المباريات التأهيلية: {outcome.new_placement}/{outcome.config.placement_matches} - مكتملة!\n"
+                f"🎖️ رانكك الأول: {rank_emoji} {rank_name}\n"
+                f"{mmr_line}\n"
+                f"🏷️ تم إعطاؤك دور الرانك في السيرفر!")
+    if outcome.is_placement:
+        return message + f"📋 المباريات التأهيلية: {outcome.new_placement}/{outcome.config.placement_matches}\n{mmr_line}"
+    
+    old_rank_name, old_rank_emoji = outcome.old_rank
+    new_rank_name, new_rank_emoji = outcome.new_rank
+    if outcome.rank_changed:
+        rank_msg = f"\n🎖️ Rank: {old_rank_emoji} {old_rank_name} → {new_rank_emoji} {new_rank_name}\n🏷️ تم تحديث دور الرانك!"
+    else:
+        rank_msg = f"\n🎖️ Rank: {old_rank_emoji} {old_rank_name}"
+    return message + mmr_line + rank_msg
+
+@instrument()
 async def process_match_result(interaction: discord.Interaction, match_name: str, winner: int, result_text: str):
     """Process the selected match result"""
     user = interaction.user
@@ -1546,6 +3648,16 @@ async def process_match_result(interaction: discord.Interaction, match_name: str
     
     match_info = active_matches[match_name]
     
+    # Compute every player's outcome once and store it
+    try:
+        result = settle_match(match_name, match_info, winner, result_text, user)
+    except Exception as e:
+        # The transaction was rolled back - free the match so the result can be reported again
+        release_report_lease(match_name, user)
+        print(f"Error settling {match_name}: {e}")
+        await interaction.response.send_message("❌ حدث خطأ أثناء تسجيل النتيجة ولم يتم تغيير أي نقاط، حاول مرة أخرى!", ephemeral=True)
+        return
+    
     # Update match results
     match_results[match_name] = {
         'winner': winner,
@@ -1553,248 +3665,134 @@ async def process_match_result(interaction: discord.Interaction, match_name: str
         'reporter': user
     }
     
-    # Create final result embed
-    embed = discord.Embed(
-        title=f"🏁 {match_name} - نتيجة المباراة",
-        description=f"**النتيجة:** {result_text}",
-        color=0x00FF00
-    )
-    
-    embed.add_field(
-        name="📊 معلومات المباراة",
-        value=f"**Name:** {match_name}\n**Server:** ME Only\n**Mode:** 2v2\n**تم تسجيلها بواسطة:** {user.display_name}",
-        inline=False
-    )
-    
-    winning_team = match_info['team1'] if winner == 1 else match_info['team2']
-    losing_team = match_info['team2'] if winner == 1 else match_info['team1']
-    
-    # Calculate MMR changes
-    points_gained = 25
-    points_lost = 20
-    
-    winners_text = ""
-    for p in winning_team:
-        old_points = get_player_points(p.id)
-        placement_matches = get_player_placement_matches(p.id)
-        
-        if placement_matches < 5:
-            # Placement match - smaller MMR change
-            new_points = old_points + 10  # Smaller gain for placement
-            winners_text += f"{'🔵' if winner == 1 else '🟠'} {p.display_name}\n`📋 Placement {placement_matches}/5 → {placement_matches + 1}/5`\n"
-        else:
-            # Ranked match - normal MMR change
-            new_points = old_points + points_gained
-            old_rank_name, old_rank_emoji = get_rank_from_mmr(old_points)
-            new_rank_name, new_rank_emoji = get_rank_from_mmr(new_points)
-            rank_change = f" → {new_rank_emoji} {new_rank_name}" if old_rank_name != new_rank_name else ""
-            winners_text += f"{'🔵' if winner == 1 else '🟠'} {p.display_name}\n`{old_points} → {new_points} (+{points_gained})`{rank_change}\n"
-    
-    losers_text = ""
-    for p in losing_team:
-        old_points = get_player_points(p.id)
-        placement_matches = get_player_placement_matches(p.id)
-        
-        if placement_matches < 5:
-            # Placement match - smaller MMR change
-            new_points = max(0, old_points - 5)  # Smaller loss for placement
-            losers_text += f"{'🟠' if winner == 1 else '🔵'} {p.display_name}\n`📋 Placement {placement_matches}/5 → {placement_matches + 1}/5`\n"
-        else:
-            # Ranked match - normal MMR change
-            new_points = max(0, old_points - points_lost)
-            old_rank_name, old_rank_emoji = get_rank_from_mmr(old_points)
-            new_rank_name, new_rank_emoji = get_rank_from_mmr(new_points)
-            rank_change = f" → {new_rank_emoji} {new_rank_name}" if old_rank_name != new_rank_name else ""
-            losers_text += f"{'🟠' if winner == 1 else '🔵'} {p.display_name}\n`{old_points} → {new_points} (-{points_lost})`{rank_change}\n"
-    
-    embed.add_field(name="🏆 الفائزون", value=winners_text, inline=True)
-    embed.add_field(name="💔 الخاسرون", value=losers_text, inline=True)
-    
-    # Update player MMR and send DMs
-    points_gained = 25
-    points_lost = 20
-    
-    for player in winning_team:
-        old_points = get_player_points(player.id)
-        placement_matches = get_player_placement_matches(player.id)
-        
-        # Increment placement matches
-        increment_placement_matches(player.id)
-        new_placement = placement_matches + 1
-        
-        if placement_matches < 5:
-            # Placement match - smaller MMR change
-            new_points = old_points + 10
-            update_player_points(player.id, new_points)
-            
-            try:
-                if new_placement == 5:
-                    # Just completed placement matches - show rank and give role
-                    rank_name, rank_emoji = get_rank_from_mmr(new_points)
-                    
-                    # Give rank role
-                    member = interaction.guild.get_member(player.id)
-                    if member:
-                        await update_player_rank_role(member, new_points)
-                    
-                    await player.send(f"🎉 تهانينا! فزت في مباراة {match_name}!\n"
-                                    f"📋 المباريات التأهيلية: {new_placement}/5 - مكتملة!\n"
-                                    f"🎖️ رانكك الأول: {rank_emoji} {rank_name}\n"
-                                    f"📈 MMR: {old_points} → {new_points} (+10)\n"
-                                    f"🏷️ تم إعطاؤك دور الرانك في السيرفر!")
-                else:
-                    await player.send(f"🎉 تهانينا! فزت في مباراة {match_name}!\n"
-                                    f"📋 المباريات التأهيلية: {new_placement}/5\n"
-                                    f"📈 MMR: {old_points} → {new_points} (+10)")
-            except:
-                pass
-        else:
-            # Ranked match - normal MMR change
-            new_points = old_points + points_gained
-            update_player_points(player.id, new_points)
-            
-            try:
-                old_rank_name, old_rank_emoji = get_rank_from_mmr(old_points)
-                new_rank_name, new_rank_emoji = get_rank_from_mmr(new_points)
-                rank_msg = f"\n🎖️ Rank: {old_rank_emoji} {old_rank_name} → {new_rank_emoji} {new_rank_name}" if old_rank_name != new_rank_name else f"\n🎖️ Rank: {old_rank_emoji} {old_rank_name}"
-                
-                # Update role if rank changed
-                if old_rank_name != new_rank_name:
-                    member = interaction.guild.get_member(player.id)
-                    if member:
-                        await update_player_rank_role(member, new_points)
-                        rank_msg += "\n🏷️ تم تحديث دور الرانك!"
-                
-                await player.send(f"🎉 تهانينا! فزت في مباراة {match_name}!\n"
-                                f"📈 MMR: {old_points} → {new_points} (+{points_gained}){rank_msg}")
-            except:
-                pass
-    
-    for player in losing_team:
-        old_points = get_player_points(player.id)
-        placement_matches = get_player_placement_matches(player.id)
-        
-        # Increment placement matches
-        increment_placement_matches(player.id)
-        new_placement = placement_matches + 1
-        
-        if placement_matches < 5:
-            # Placement match - smaller MMR change
-            new_points = max(0, old_points - 5)
-            update_player_points(player.id, new_points)
-            
-            try:
-                if new_placement == 5:
-                    # Just completed placement matches - show rank and give role
-                    rank_name, rank_emoji = get_rank_from_mmr(new_points)
-                    
-                    # Give rank role
-                    member = interaction.guild.get_member(player.id)
-                    if member:
-                        await update_player_rank_role(member, new_points)
-                    
-                    await player.send(f"💪 مباراة {match_name} انتهت. حظ أفضل في المرة القادمة!\n"
-                                    f"📋 المباريات التأهيلية: {new_placement}/5 - مكتملة!\n"
-                                    f"🎖️ رانكك الأول: {rank_emoji} {rank_name}\n"
-                                    f"📉 MMR: {old_points} → {new_points} (-5)\n"
-                                    f"🏷️ تم إعطاؤك دور الرانك في السيرفر!")
-                else:
-                    await player.send(f"💪 مباراة {match_name} انتهت. حظ أفضل في المرة القادمة!\n"
-                                    f"📋 المباريات التأهيلية: {new_placement}/5\n"
-                                    f"📉 MMR: {old_points} → {new_points} (-5)")
-            except:
-                pass
-        else:
-            # Ranked match - normal MMR change
-            new_points = max(0, old_points - points_lost)
-            update_player_points(player.id, new_points)
-            
-            try:
-                old_rank_name, old_rank_emoji = get_rank_from_mmr(old_points)
-                new_rank_name, new_rank_emoji = get_rank_from_mmr(new_points)
-                rank_msg = f"\n🎖️ Rank: {old_rank_emoji} {old_rank_name} → {new_rank_emoji} {new_rank_name}" if old_rank_name != new_rank_name else f"\n🎖️ Rank: {old_rank_emoji} {old_rank_name}"
-                
-                # Update role if rank changed
-                if old_rank_name != new_rank_name:
-                    member = interaction.guild.get_member(player.id)
-                    if member:
-                        await update_player_rank_role(member, new_points)
-                        rank_msg += "\n🏷️ تم تحديث دور الرانك!"
-                
-                await player.send(f"💪 مباراة {match_name} انتهت. حظ أفضل في المرة القادمة!\n"
-                                f"📉 MMR: {old_points} → {new_points} (-{points_lost}){rank_msg}")
-            except:
-                pass
-    
-    # Update match as completed in database
-    cursor.execute("""
-        UPDATE matches 
-        SET winner = ?, completed = 1
-        WHERE match_id = ?
-    """, (winner, match_info['match_id']))
-    conn.commit()
+    # The result is recorded - players are free to queue again
+    channels = release_match(match_name)
     
     # Send result to the match channel (not ephemeral)
-    await interaction.response.send_message(embed=embed)
-    
-    # Send result notification to results channel
-    try:
-        results_channel = bot.get_channel(results_channel_id)
-        if results_channel and isinstance(results_channel, discord.TextChannel):
-            # Create public results embed
-            public_embed = discord.Embed(
-                title=f"🏁 {match_name} - Match Completed",
-                description=f"**Winner:** {result_text}",
-                color=0x00FF00
-            )
-            
-            # Show teams with MMR changes
-            winning_mmr_text = ""
-            losing_mmr_text = ""
-            
-            for player in winning_team:
-                old_points = get_player_points(player.id)
-                placement_matches = get_player_placement_matches(player.id)
-                
-                if placement_matches <= 5:  # Show placement progress
-                    winning_mmr_text += f"{'🔵' if winner == 1 else '🟠'} {player.display_name}: +10 MMR\n"
-                else:
-                    rank_name, rank_emoji = get_rank_from_mmr(old_points + points_gained)
-                    winning_mmr_text += f"{'🔵' if winner == 1 else '🟠'} {rank_emoji} {player.display_name}: +{points_gained} MMR\n"
-            
-            for player in losing_team:
-                old_points = get_player_points(player.id)
-                placement_matches = get_player_placement_matches(player.id)
-                
-                if placement_matches <= 5:  # Show placement progress
-                    losing_mmr_text += f"{'🟠' if winner == 1 else '🔵'} {player.display_name}: -5 MMR\n"
-                else:
-                    new_points = max(0, old_points - points_lost)
-                    rank_name, rank_emoji = get_rank_from_mmr(new_points)
-                    losing_mmr_text += f"{'🟠' if winner == 1 else '🔵'} {rank_emoji} {player.display_name}: -{points_lost} MMR\n"
-            
-            public_embed.add_field(name="🏆 Winners", value=winning_mmr_text, inline=True)
-            public_embed.add_field(name="💔 Losers", value=losing_mmr_text, inline=True)
-            public_embed.add_field(name="📊 Match Info", value=f"**Mode:** 2v2\n**Server:** ME Only\n**Reported by:** {user.display_name}", inline=False)
-            
-            public_embed.set_footer(text=f"Match ID: {match_info['match_id']}")
-            public_embed.timestamp = datetime.now()
-            
-            await results_channel.send(embed=public_embed)
-    except Exception as e:
-        print(f"Error sending to results channel: {e}")
-    
-    # Clean up immediately after sending result
-    try:
-        await asyncio.sleep(5)  # Short delay to ensure message is seen
-        await match_info['category'].delete()
-        del active_matches[match_name]
-        del match_results[match_name]
-        print(f"تم حذف قنوات المباراة {match_name} تلقائياً")
-    except Exception as e:
-        print(f"خطأ في حذف قنوات {match_name}: {e}")
+    await interaction.response.send_message(embed=create_result_embed(result))
+    
+    # Remaining side effects run on the settlement worker, in this order
+    guild = interaction.guild
+    stages = []
+    role_updates = [(outcome.player.id, outcome.new_points) for outcome in result.outcomes if outcome.needs_role_update]
+    if role_updates:
+        stages.append(('roles', functools.partial(apply_rank_role_updates, guild, role_updates), 0))
+    for outcome in result.outcomes:
+        stages.append(('dm', functools.partial(rest, PRIORITY_SETTLEMENT, 'dm', outcome.player.send, create_settlement_dm(result, outcome)), 0))
+    results_channel = bot.get_channel(results_channel_id)
+    if results_channel and isinstance(results_channel, discord.TextChannel):
+        stages.append(('results', functools.partial(rest, PRIORITY_SETTLEMENT, 'message_send', results_channel.send,
+                                                    embed=create_public_result_embed(result)), 0))
+    # Short delay to ensure the result message is seen before the channels go away
+    stages.append(('cleanup', functools.partial(queue_match_cleanup, match_name, channels), 5))
+    enqueue_settlement(match_name, stages)
+
+
+
+# Event loop lag - how late a short sleep wakes up, i.e. how long ready callbacks wait for the loop
+LOOP_LAG_PROBE = 0.1
+loop_lag = LatencyHistogram()
+last_loop_lag = 0.0
+
+@tasks.loop(seconds=5)
+async def measure_loop_lag():
+    global last_loop_lag
+    started = time.perf_counter()
+    await asyncio.sleep(LOOP_LAG_PROBE)
+    last_loop_lag = max(0.0, time.perf_counter() - started - LOOP_LAG_PROBE)
+    loop_lag.record(last_loop_lag)
+
+@measure_loop_lag.before_loop
+async def before_measure_loop_lag():
+    await bot.wait_until_ready()
+
+# Periodic statement report in the log
+@tasks.loop(minutes=db_report_interval)
+async def report_db_stats():
+    """Log the statements with the most time and the plans of new slow ones"""
+    global last_db_report_slow
+    statements = statement_profiler.top(5)
+    if statements:
+        print(f"DB REPORT: top statements by total time\n{format_statements(statements)}")
+    
+    # slow_total survives /db_stats reset, so nothing logged since the last report is missed
+    slow_total = statement_profiler.slow_total
+    if slow_total > last_db_report_slow:
+        scans = {entry['fingerprint'] for entry in statement_profiler.slow_log
+                 if entry['seq'] > last_db_report_slow and entry['full_scan']}
+        print(f"DB REPORT: {slow_total - last_db_report_slow} new slow statements, {len(scans)} with full table scans")
+        for fp in scans:
+            print(f"   SCAN: {fp}")
+    last_db_report_slow = slow_total
+
+@report_db_stats.before_loop
+async def before_report_db_stats():
+    await bot.wait_until_ready()
+
+# Prometheus metrics - collectors read existing counters and state when scraped
+metrics = MetricsRegistry(prefix="hsm_")
+metrics.gauge("bot_ready", "1 once the gateway session is ready", lambda: int(bot.is_ready()))
+metrics.gauge("gateway_latency_seconds", "Heartbeat latency of the gateway connection",
+              lambda: bot.latency if math.isfinite(bot.latency) else float('nan'))
+metrics.gauge("queue_players", "Players waiting in the matchmaking queue", lambda: len(user_queue))
+metrics.gauge("active_matches", "Matches created and not yet settled", lambda: len(active_matches))
+metrics.gauge("settlement_backlog", "Settlement jobs not finished yet", lambda: settlement_stats['pending'])
+metrics.counter("settlements_enqueued_total", "Settlement jobs enqueued", lambda: settlement_stats['enqueued'])
+metrics.counter("settlements_completed_total", "Settlement jobs completed", lambda: settlement_stats['completed'])
+metrics.counter("settlement_retries_total", "Settlement stage retries", lambda: settlement_stats['retries'])
+metrics.counter("queue_embed_edits_total", "Queue embed edits sent through the REST scheduler",
+                lambda: queue_embed_edits)
+metrics.gauge("rest_queued", "REST calls waiting in the scheduler",
+              lambda: [({'priority': name}, stats['queued']) for name, stats in rest_scheduler.stats.items()])
+metrics.counter("rest_calls_total", "REST calls finished by the scheduler",
+                lambda: [({'priority': name, 'outcome': outcome}, stats[outcome])
+                         for name, stats in rest_scheduler.stats.items() for outcome in ('completed', 'failed')])
+metrics.counter("rest_rate_limited_total", "REST calls that hit a Discord rate limit",
+                lambda: [({'priority': name}, stats['rate_limited']) for name, stats in rest_scheduler.stats.items()])
+metrics.counter("rest_wait_seconds_total", "Time REST calls waited in the scheduler, including rate limit blocks",
+                lambda: [({'priority': name}, stats['wait_total']) for name, stats in rest_scheduler.stats.items()])
+metrics.gauge("rest_wait_max_seconds", "Longest scheduler wait of a REST call",
+              lambda: [({'priority': name}, stats['wait_max']) for name, stats in rest_scheduler.stats.items()])
+metrics.summary("handler_duration_seconds", "Total duration of instrumented handlers",
+                lambda: [({'handler': name}, stats.histograms['total']) for name, stats in list(perf_registry.handlers.items())])
+metrics.summary("handler_db_seconds", "Database time of instrumented handlers",
+                lambda: [({'handler': name}, stats.histograms['db']) for name, stats in list(perf_registry.handlers.items())])
+metrics.summary("handler_ack_seconds", "Time from handler start to the interaction response",
+                lambda: [({'handler': name}, stats.histograms['ack']) for name, stats in list(perf_registry.handlers.items())
+                         if stats.histograms['ack'].count])
+metrics.counter("db_statements_total", "Executions per statement fingerprint",
+                lambda: [({'statement': fp}, stats.count) for fp, stats in list(statement_profiler.statements.items())])
+metrics.counter("db_statement_seconds_total", "Time per statement fingerprint, fetches included",
+                lambda: [({'statement': fp}, stats.total) for fp, stats in list(statement_profiler.statements.items())])
+metrics.counter("db_slow_statements_total", "Statements over the slow query threshold",
+                lambda: statement_profiler.slow_total)
+metrics.gauge("event_loop_lag_seconds", "Event loop lag of the last probe", lambda: last_loop_lag)
+metrics.summary("event_loop_lag_probe_seconds", "Event loop lag of all probes", lambda: [({}, loop_lag)])
+
+# Health check server for HTTP-based deployments (started by app.py)
+health_app = Flask(__name__)
+
+@health_app.route('/')
+def health_root():
+    return jsonify({'status': 'ok', 'service': 'HeatSeeker Discord Bot', 'bot_ready': bot.is_ready()})
+
+@health_app.route('/health')
+def health_check():
+    ready = bot.is_ready()
+    return jsonify({
+        'status': 'healthy' if ready else 'starting',
+        'bot_ready': ready,
+        'latency_ms': round(bot.latency * 1000) if ready and math.isfinite(bot.latency) else None,
+        'queue_players': len(user_queue),
+        'active_matches': len(active_matches)
+    })
 
+@health_app.route('/metrics')
+def health_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
+def run_flask():
+    health_app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 8080)))
 
 # Error handling
 @setup_queue.error
@@ -1804,4 +3802,5 @@ async def permission_error(ctx, error):
         await ctx.send("❌ ليس لديك صلاحية لاستخدام هذا الأمر!")
 
 # تشغيل البوت (آخر سطر)
-bot.run(TOKEN)
+if __name__ == "__main__":
+    bot.run(TOKEN)
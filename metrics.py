@@ -0,0 +1,81 @@
+"""
+In-process metrics registry rendered in the Prometheus text format.
+
+Metrics are registered as collector callbacks that read the counters and
+stats dicts the bot already keeps, so nothing extra runs on hot paths - the
+cost is paid when /metrics is scraped. Collectors run on the health server
+thread and must only read state.
+"""
+
+import math
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + "}"
+
+
+def format_value(value):
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class MetricsRegistry:
+    """Named collectors rendered together on every scrape"""
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self.metrics = []  # [(name, type, help, collect)]
+
+    def register(self, name, metric_type, help_text, collect):
+        self.metrics.append((self.prefix + name, metric_type, help_text, collect))
+
+    def gauge(self, name, help_text, collect):
+        """collect() returns a number or [(labels, number)]"""
+        self.register(name, "gauge", help_text, collect)
+
+    def counter(self, name, help_text, collect):
+        """collect() returns a monotonically increasing number or [(labels, number)]"""
+        self.register(name, "counter", help_text, collect)
+
+    def summary(self, name, help_text, collect):
+        """collect() returns [(labels, LatencyHistogram)], rendered in seconds"""
+        self.register(name, "summary", help_text, collect)
+
+    @staticmethod
+    def samples(value):
+        return [({}, value)] if isinstance(value, (int, float)) else value
+
+    def render(self):
+        lines = []
+        for name, metric_type, help_text, collect in self.metrics:
+            try:
+                value = collect()
+            except Exception as e:
+                # One broken collector must not take the whole scrape down
+                lines.append(f"# {name} failed: {escape_label(e)}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            if metric_type == "summary":
+                for labels, histogram in value:
+                    for quantile in QUANTILES:
+                        quantile_labels = dict(labels, quantile=quantile)
+                        lines.append(f"{name}{format_labels(quantile_labels)} {format_value(histogram.percentile(quantile * 100))}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {format_value(histogram.total / 1_000_000)}")
+                    lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+            else:
+                for labels, sample in self.samples(value):
+                    lines.append(f"{name}{format_labels(labels)} {format_value(sample)}")
+        return "\n".join(lines) + "\n"
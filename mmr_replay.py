@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Full-history MMR replay for HeatSeeker.
+
+Replays every completed match in chronological order with a rating model
+(the one in the bot config by default) and recomputes points, wins, losses and placement_matches for every
+player. Matches are grouped into waves where no player appears twice, so
+each wave is applied with a handful of NumPy operations instead of a
+Python loop per player. The soft reset of every ended season is applied
+between its last match and the next season's first.
+
+    python mmr_replay.py                   # show the diff report only
+    python mmr_replay.py --commit          # write the recomputed stats
+    python mmr_replay.py --model elo       # preview another rating model
+    python mmr_replay.py --benchmark 1000000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from bot_config import CONFIG_FILE, ConfigError, load_config
+from rating import FlatRating, RATING_MODELS, get_rating_model
+
+STARTING_POINTS = 1000
+
+
+def load_history(conn):
+    """Load completed matches as (player ids, winner, season) arrays in chronological order
+
+    season counts the seasons that ended before the match was played.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT team1_player1, team1_player2, team2_player1, team2_player2, winner,
+               (SELECT COUNT(*) FROM seasons WHERE ended_at IS NOT NULL AND ended_at <= matches.created_at)
+        FROM matches
+        WHERE completed = 1 AND cancelled = 0 AND winner IN (1, 2)
+        ORDER BY created_at, match_id
+    """)
+    rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 6)
+    return rows[:, :4], rows[:, 4], rows[:, 5]
+
+
+def load_resets(conn):
+    """[(reset_target, reset_factor)] of every ended season in order"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT reset_target, reset_factor FROM seasons WHERE ended_at IS NOT NULL ORDER BY ended_at, season_id")
+    return cursor.fetchall()
+
+
+def soft_reset(points, target, factor):
+    """Pull points toward the target, rounded like the bot's season reset"""
+    return np.maximum(0, np.floor(target + (points - target) * factor + 0.5)).astype(np.int64)
+
+
+def compute_waves(player_index):
+    """Give every match the first wave after the previous match of each of its players"""
+    last_wave = [-1] * (int(player_index.max()) + 1 if player_index.size else 0)
+    waves = np.empty(len(player_index), dtype=np.int64)
+    for i, (a, b, c, d) in enumerate(player_index.tolist()):
+        wave = max(last_wave[a], last_wave[b], last_wave[c], last_wave[d]) + 1
+        last_wave[a] = last_wave[b] = last_wave[c] = last_wave[d] = wave
+        waves[i] = wave
+    return waves
+
+
+def replay(players, winners, model=None, seasons=None, resets=()):
+    """Replay matches and return (user_ids, points, wins, losses, placement_matches)
+
+    seasons gives the season index of every match, resets the (target, factor)
+    soft reset applied when each season ended.
+    """
+    model = model or FlatRating()
+    user_ids, player_index = np.unique(players, return_inverse=True)
+    player_index = player_index.reshape(players.shape)
+    count = len(user_ids)
+    seasons = np.zeros(len(winners), dtype=np.int64) if seasons is None else seasons
+
+    points = np.full(count, STARTING_POINTS, dtype=np.int64)
+    wins = np.zeros(count, dtype=np.int64)
+    losses = np.zeros(count, dtype=np.int64)
+    placement = np.zeros(count, dtype=np.int64)
+
+    # Team 1 holds columns 0-1, team 2 columns 2-3
+    won = np.empty(players.shape, dtype=bool)
+    won[:, :2] = (winners == 1)[:, None]
+    won[:, 2:] = (winners == 2)[:, None]
+
+    # Matches are in chronological order, so every season is one contiguous slice
+    season_bounds = np.searchsorted(seasons, np.arange(len(resets) + 2))
+    for season, (first, last) in enumerate(zip(season_bounds[:-1], season_bounds[1:])):
+        season_index = player_index[first:last]
+        season_won = won[first:last]
+
+        # A player appears at most once per wave, and their waves follow match order
+        waves = compute_waves(season_index)
+        order = np.argsort(waves, kind="stable")
+        bounds = np.searchsorted(waves[order], np.arange(waves.max() + 2 if waves.size else 1))
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            batch = order[start:end]
+            seats = season_index[batch]
+            w = season_won[batch]
+
+            new_points = model.apply(points[seats], placement[seats], w)
+            p = seats.ravel()
+            w = w.ravel()
+            points[p] = new_points.ravel()
+            placement[p] += 1
+            wins[p] += w
+            losses[p] += ~w
+
+        if season < len(resets):
+            target, factor = resets[season]
+            points = soft_reset(points, target, factor)
+            wins[:] = 0
+            losses[:] = 0
+
+    return user_ids, points, wins, losses, placement
+
+
+def build_diff(conn, user_ids, points, wins, losses, placement):
+    """Compare replayed stats with the players table"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT user_id, points, wins, losses, placement_matches FROM players")
+    current = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    replayed = {}
+    for row in zip(user_ids.tolist(), points.tolist(), wins.tolist(), losses.tolist(), placement.tolist()):
+        replayed[row[0]] = row[1:]
+
+    # Players without any completed match go back to the starting values
+    default = (STARTING_POINTS, 0, 0, 0)
+    diff = []
+    for user_id in current.keys() | replayed.keys():
+        old = current.get(user_id)
+        new = replayed.get(user_id, default)
+        if old != new:
+            diff.append((user_id, old, new))
+    diff.sort(key=lambda item: -abs(item[2][0] - (item[1][0] if item[1] else STARTING_POINTS)))
+    return diff
+
+
+def write_results(conn, diff):
+    """Write all changed players in one transaction"""
+    cursor = conn.cursor()
+    try:
+        cursor.executemany("INSERT OR IGNORE INTO players (user_id) VALUES (?)",
+                           [(user_id,) for user_id, old, new in diff if old is None])
+        cursor.executemany("""
+            UPDATE players
+            SET points = ?, wins = ?, losses = ?, placement_matches = ?
+            WHERE user_id = ?
+        """, [new + (user_id,) for user_id, old, new in diff])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def print_diff(diff, top):
+    print(f"{len(diff)} players change")
+    for user_id, old, new in diff[:top]:
+        old_text = "new player" if old is None else f"{old[0]} MMR {old[1]}W/{old[2]}L {old[3]}P"
+        print(f"  {user_id}: {old_text} → {new[0]} MMR {new[1]}W/{new[2]}L {new[3]}P")
+    if len(diff) > top:
+        print(f"  ... and {len(diff) - top} more")
+
+
+def synthetic_history(match_count, player_count, seed=1):
+    """Random matches with four distinct players each"""
+    rng = np.random.default_rng(seed)
+    # Sorted draws plus 0..3 are always distinct, then shuffle the seats
+    players = np.sort(rng.integers(0, player_count - 3, (match_count, 4)), axis=1) + np.arange(4)
+    players = rng.permuted(players, axis=1)
+    winners = rng.integers(1, 3, match_count)
+    return players, winners
+
+
+def benchmark(match_count, model, player_count=None, seed=1):
+    """Time a replay of random synthetic matches"""
+    player_count = player_count or max(4, match_count // 10)
+    players, winners = synthetic_history(match_count, player_count, seed)
+
+    started = time.perf_counter()
+    replay(players, winners, model)
+    elapsed = time.perf_counter() - started
+    print(f"Replayed {match_count} matches for {player_count} players with {model.name} in {elapsed:.2f}s "
+          f"({match_count / elapsed:,.0f} matches/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute player stats from the full match history")
+    parser.add_argument("--db", default="hsm_players.db", help="SQLite database file")
+    parser.add_argument("--commit", action="store_true", help="Write the recomputed stats")
+    parser.add_argument("--top", type=int, default=20, help="Number of changed players to list")
+    parser.add_argument("--model", choices=list(RATING_MODELS), help="Rating model to replay with (default: the config's)")
+    parser.add_argument("--config", default=os.getenv("HSM_CONFIG", CONFIG_FILE), help="Bot config file")
+    parser.add_argument("--benchmark", type=int, metavar="MATCHES", help="Time a replay of synthetic matches")
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_config(args.config)
+    except ConfigError as e:
+        for error in e.errors:
+            print(f"❌ {error}")
+        return 1
+    model = get_rating_model(args.model) if args.model else config.rating_model
+
+    if args.benchmark:
+        benchmark(args.benchmark, model)
+        return 0
+
+    conn = sqlite3.connect(args.db)
+    started = time.perf_counter()
+    players, winners, seasons = load_history(conn)
+    user_ids, points, wins, losses, placement = replay(players, winners, model, seasons, load_resets(conn))
+    diff = build_diff(conn, user_ids, points, wins, losses, placement)
+    print(f"Replayed {len(winners)} matches in {time.perf_counter() - started:.2f}s")
+    print_diff(diff, args.top)
+
+    if args.commit:
+        write_results(conn, diff)
+        print(f"✅ Updated {len(diff)} players")
+    else:
+        print("🔍 Nothing was saved - run with --commit to apply")
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Latency instrumentation for HeatSeeker handlers.
+
+Every instrumented handler runs in a Span that collects its ack latency,
+total duration and the time spent in the database and in Discord REST
+calls. Spans live in a context variable, so the DB layer (db_profiler.py)
+and the REST scheduler add their time to whatever handler is running
+without being passed anything. Durations go into log-linear histograms
+with fixed relative precision (HDR-style), which keep percentiles accurate
+from microseconds to minutes in a few KB per metric.
+
+    python perf.py perf_export.json   # report from a /perf_export file
+"""
+
+import argparse
+import contextvars
+import functools
+import json
+import sys
+import time
+
+SUB_BUCKET_BITS = 7  # 64 linear sub-buckets per power of two - under 1.6% error
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT // 2
+
+METRICS = ("ack", "total", "db", "rest")
+
+
+class LatencyHistogram:
+    """Log-linear histogram of durations in microseconds"""
+
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0  # Microseconds
+        self.max = 0
+
+    @staticmethod
+    def bucket_index(value):
+        if value < SUB_BUCKET_COUNT:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + (value >> shift) - SUB_BUCKET_HALF
+
+    @staticmethod
+    def bucket_upper(index):
+        """Largest value counted in a bucket"""
+        if index < SUB_BUCKET_COUNT:
+            return index
+        shift = (index - SUB_BUCKET_COUNT) // SUB_BUCKET_HALF + 1
+        sub_bucket = (index - SUB_BUCKET_COUNT) % SUB_BUCKET_HALF + SUB_BUCKET_HALF
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1_000_000))
+        index = self.bucket_index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """Upper bound of the bucket holding a percentile, in seconds"""
+        if not self.count:
+            return 0.0
+        target = max(1, -(-self.count * percent // 100))  # Round up
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.bucket_upper(index), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+    @property
+    def mean(self):
+        return self.total / self.count / 1_000_000 if self.count else 0.0
+
+    def export(self):
+        """Plain data for offline analysis, buckets as {upper bound in µs: count}"""
+        return {
+            "count": self.count,
+            "total_us": self.total,
+            "max_us": self.max,
+            "buckets": {self.bucket_upper(index): count for index, count in enumerate(self.counts) if count}
+        }
+
+    @classmethod
+    def from_export(cls, data):
+        histogram = cls()
+        for upper, count in data["buckets"].items():
+            index = cls.bucket_index(int(upper))
+            if index >= len(histogram.counts):
+                histogram.counts.extend([0] * (index + 1 - len(histogram.counts)))
+            histogram.counts[index] += count
+        histogram.count = data["count"]
+        histogram.total = data["total_us"]
+        histogram.max = data["max_us"]
+        return histogram
+
+
+class HandlerStats:
+    """Histograms and counters of one handler"""
+
+    def __init__(self):
+        self.histograms = {metric: LatencyHistogram() for metric in METRICS}
+        self.errors = 0
+
+
+class PerfRegistry:
+    """Timing data of every instrumented handler"""
+
+    def __init__(self):
+        self.handlers = {}
+        self.started_at = time.time()
+
+    def handler(self, name):
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = HandlerStats()
+        return stats
+
+    def reset(self):
+        self.handlers.clear()
+        self.started_at = time.time()
+
+    def export(self):
+        return {
+            "started_at": self.started_at,
+            "exported_at": time.time(),
+            "handlers": {
+                name: dict({metric: histogram.export() for metric, histogram in stats.histograms.items()},
+                           errors=stats.errors)
+                for name, stats in self.handlers.items()
+            }
+        }
+
+
+registry = PerfRegistry()
+current_span = contextvars.ContextVar("perf_span", default=None)
+
+
+class Span:
+    """Timing of one running handler; nested spans also count toward their parents"""
+
+    __slots__ = ("name", "parent", "started", "acked", "db", "rest")
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.started = time.perf_counter()
+        self.acked = False
+        self.db = 0.0
+        self.rest = 0.0
+
+    def ack(self):
+        """Record the first response to the interaction of this span and its parents"""
+        now = time.perf_counter()
+        span = self
+        while span and not span.acked:
+            span.acked = True
+            registry.handler(span.name).histograms["ack"].record(now - span.started)
+            span = span.parent
+
+    def finish(self, failed=False):
+        self.acked = True  # Tasks started by the handler may outlive it
+        stats = registry.handler(self.name)
+        stats.histograms["total"].record(time.perf_counter() - self.started)
+        stats.histograms["db"].record(self.db)
+        stats.histograms["rest"].record(self.rest)
+        stats.errors += failed
+
+
+def add_time(kind, seconds):
+    """Add DB or REST time to the running span and every span around it"""
+    span = current_span.get()
+    while span:
+        if kind == "db":
+            span.db += seconds
+        else:
+            span.rest += seconds
+        span = span.parent
+
+
+class timed:
+    """Context manager adding the time of its block as 'db' or 'rest' time"""
+
+    __slots__ = ("kind", "started")
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        add_time(self.kind, time.perf_counter() - self.started)
+        return False
+
+
+class span:
+    """Context manager running its block as a named span"""
+
+    __slots__ = ("name", "span", "token")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.span = Span(self.name, current_span.get())
+        self.token = current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        current_span.reset(self.token)
+        self.span.finish(failed=exc_type is not None)
+        return False
+
+
+def instrument(name=None):
+    """Decorator running a coroutine function as a span"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def track_ack(method):
+    """Wrap an interaction response method so the first call acks the running span"""
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        with timed("rest"):
+            result = await method(*args, **kwargs)
+        running = current_span.get()
+        if running:
+            running.ack()
+        return result
+    return wrapper
+
+
+def summarize(handlers):
+    """[(name, HandlerStats)] sorted by total time spent"""
+    return sorted(handlers.items(), key=lambda item: -item[1].histograms["total"].total)
+
+
+def format_ms(seconds):
+    return f"{seconds * 1000:.1f}"
+
+
+def format_report(handlers, limit=None):
+    """Text table of handler timings in milliseconds"""
+    lines = [f"{'handler':28} {'count':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'ack95':>7} {'db':>6} {'rest':>6}"]
+    for name, stats in summarize(handlers)[:limit]:
+        total = stats.histograms["total"]
+        lines.append(
+            f"{name[:28]:28} {total.count:>6} {format_ms(total.percentile(50)):>7} {format_ms(total.percentile(95)):>7} "
+            f"{format_ms(total.percentile(99)):>7} {format_ms(total.max / 1_000_000):>7} "
+            f"{format_ms(stats.histograms['ack'].percentile(95)):>7} "
+            f"{format_ms(stats.histograms['db'].mean):>6} {format_ms(stats.histograms['rest'].mean):>6}"
+        )
+    return "\n".join(lines)
+
+
+def load_export(path):
+    """{name: HandlerStats} from a registry export file"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    handlers = {}
+    for name, metrics in data["handlers"].items():
+        stats = HandlerStats()
+        stats.histograms = {metric: LatencyHistogram.from_export(metrics[metric]) for metric in METRICS}
+        stats.errors = metrics.get("errors", 0)
+        handlers[name] = stats
+    return data, handlers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report handler timings from a /perf_export file")
+    parser.add_argument("path", help="Exported JSON file")
+    parser.add_argument("--top", type=int, help="Only show the slowest handlers by total time")
+    args = parser.parse_args(argv)
+
+    data, handlers = load_export(args.path)
+    hours = (data["exported_at"] - data["started_at"]) / 3600
+    print(f"{len(handlers)} handlers over {hours:.1f}h (times in ms, db/rest are means)")
+    print(format_report(handlers, args.top))
+
+    if data.get("statements"):
+        from db_profiler import StatementStats, format_statements  # db_profiler imports this module
+        statements = {}
+        for fp, values in data["statements"].items():
+            stats = statements[fp] = StatementStats()
+            for field in StatementStats.__slots__:
+                setattr(stats, field, values[field])
+        top = sorted(statements.items(), key=lambda item: -item[1].total)[:args.top or 10]
+        print(f"\n{len(statements)} statements, slowest by total time")
+        print(format_statements(top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+MMR distribution report for HeatSeeker.
+
+Counts ranked players per rank tier and summarises the MMR distribution.
+Proposed tier thresholds can be previewed without changing RANK_SYSTEM.
+Used by the /rank_stats command and runnable offline against the database:
+
+    python rank_stats.py
+    python rank_stats.py --what-if SILVER=820 CRYSTAL=1120
+    python rank_stats.py --benchmark 1000000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from bot_config import CONFIG_FILE, ConfigError, load_config
+from ranks import DEFAULT_RANKS
+
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+
+
+def load_points(conn, placement_matches=5, include_placement=False):
+    """MMR of every ranked player (or every player) as an int64 array"""
+    cursor = conn.cursor()
+    if include_placement:
+        cursor.execute("SELECT points FROM players")
+    else:
+        cursor.execute("SELECT points FROM players WHERE placement_matches >= ?", (placement_matches,))
+    return np.fromiter((row[0] for row in cursor.fetchall()), dtype=np.int64)
+
+
+def parse_thresholds(specs, ranks=DEFAULT_RANKS):
+    """Parse 'TIER=min_mmr' items into {rank_key: min_mmr}"""
+    thresholds = {}
+    for spec in specs:
+        for item in spec.replace(",", " ").split():
+            rank_key, separator, min_mmr = item.partition("=")
+            rank_key = rank_key.strip().upper()
+            if not separator or rank_key not in ranks.by_key:
+                raise ValueError(f"Expected TIER=min_mmr with a tier from {', '.join(ranks.by_key)}, got '{item}'")
+            thresholds[rank_key] = int(min_mmr)
+
+    # Tiers must stay in their current order
+    mins = [thresholds.get(rank.key, rank.min_mmr) for rank in ranks.ranks]
+    if any(lower >= upper for lower, upper in zip(mins, mins[1:])):
+        raise ValueError("Tier thresholds must increase from " + " < ".join(ranks.by_key))
+    return thresholds
+
+
+def tier_counts(sorted_points, thresholds=None, ranks=DEFAULT_RANKS):
+    """[(rank_key, min_mmr, count)] in tier order, with optional min_mmr overrides
+
+    sorted_points must be in ascending order. Like get_rank_from_mmr, MMR
+    below the first tier counts as the first tier.
+    """
+    tiers = [(rank.key, (thresholds or {}).get(rank.key, rank.min_mmr)) for rank in ranks.ranks]
+    bounds = np.array([min_mmr for rank_key, min_mmr in tiers[1:]], dtype=np.int64)
+    edges = np.concatenate([[0], np.searchsorted(sorted_points, bounds, side="left"), [sorted_points.size]])
+    return [(rank_key, min_mmr, int(count)) for (rank_key, min_mmr), count in zip(tiers, np.diff(edges))]
+
+
+def sorted_percentiles(sorted_points, percentiles):
+    """Linearly interpolated percentiles of an ascending array, without sorting it again"""
+    positions = (sorted_points.size - 1) * np.asarray(percentiles) / 100
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    return sorted_points[lower] + (sorted_points[upper] - sorted_points[lower]) * (positions - lower)
+
+
+def distribution_stats(points, thresholds=None, presorted=False, ranks=DEFAULT_RANKS):
+    """Summary of an MMR array: count, mean, std, min, max, percentiles and tier counts"""
+    sorted_points = points if presorted else np.sort(points)
+    stats = {"count": int(sorted_points.size), "tiers": tier_counts(sorted_points, ranks=ranks)}
+    if sorted_points.size:
+        stats.update({
+            "mean": float(sorted_points.mean()),
+            "std": float(sorted_points.std()),
+            "min": int(sorted_points[0]),
+            "max": int(sorted_points[-1]),
+            "percentiles": dict(zip(PERCENTILES, sorted_percentiles(sorted_points, PERCENTILES).tolist()))
+        })
+    if thresholds:
+        stats["what_if"] = tier_counts(sorted_points, thresholds, ranks)
+    return stats
+
+
+def format_tiers(tiers, total, ranks=DEFAULT_RANKS):
+    lines = []
+    for rank_key, min_mmr, count in tiers:
+        share = count / total * 100 if total else 0
+        lines.append(f"{ranks.by_key[rank_key].name:18} {min_mmr:>5}+ {count:>9}  {share:5.1f}%")
+    return "\n".join(lines)
+
+
+def print_stats(stats, ranks=DEFAULT_RANKS):
+    print(f"{stats['count']} players")
+    if stats["count"]:
+        print(f"MMR mean {stats['mean']:.1f}, std {stats['std']:.1f}, min {stats['min']}, max {stats['max']}")
+        print("Percentiles: " + ", ".join(f"p{p} {value:.0f}" for p, value in stats["percentiles"].items()))
+    print()
+    print(format_tiers(stats["tiers"], stats["count"], ranks))
+    if "what_if" in stats:
+        print("\nWhat if:")
+        print(format_tiers(stats["what_if"], stats["count"], ranks))
+
+
+def benchmark(player_count, seed=1):
+    """Time the report over random MMRs"""
+    points = np.random.default_rng(seed).normal(1150, 250, player_count).astype(np.int64)
+    started = time.perf_counter()
+    sorted_points = np.sort(points)
+    sorted_at = time.perf_counter()
+    distribution_stats(sorted_points, {"SILVER": 820}, presorted=True)
+    finished = time.perf_counter()
+    print(f"Computed stats for {player_count} players in {(finished - sorted_at) * 1000:.1f}ms "
+          f"(+{(sorted_at - started) * 1000:.1f}ms to sort unsorted input)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the MMR distribution per rank tier")
+    parser.add_argument("--db", default="hsm_players.db", help="SQLite database file")
+    parser.add_argument("--all", action="store_true", help="Include players still in placement matches")
+    parser.add_argument("--what-if", nargs="+", default=[], metavar="TIER=MMR", help="Proposed tier thresholds")
+    parser.add_argument("--benchmark", type=int, metavar="PLAYERS", help="Time the report over random MMRs")
+    parser.add_argument("--config", default=os.getenv("HSM_CONFIG", CONFIG_FILE), help="Bot config file")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return 0
+
+    try:
+        config = load_config(args.config)
+        thresholds = parse_thresholds(args.what_if, config.ranks)
+    except ConfigError as e:
+        for error in e.errors:
+            print(f"❌ {error}")
+        return 1
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    conn = sqlite3.connect(args.db)
+    points = load_points(conn, config.placement_matches, include_placement=args.all)
+    conn.close()
+    print_stats(distribution_stats(points, thresholds, ranks=config.ranks), config.ranks)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
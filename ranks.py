@@ -0,0 +1,134 @@
+"""
+Rank tiers of the HeatSeeker MMR system.
+
+Shared by the bot and the offline tools. A RankTable compiles tier data into
+Rank objects and sorted thresholds: get_rank() bisects a single MMR and
+rank_indices() maps a whole array with np.searchsorted. The module-level
+helpers use the built-in RANK_SYSTEM; the bot uses the table of its loaded
+configuration.
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass
+
+import numpy as np
+
+RANK_SYSTEM = {
+    "UNRANKED": {
+        "role_name": "UNRANKED",
+        "min_mmr": 700,
+        "max_mmr": 799,
+        "name": "UNRANKED",
+        "emoji": "<:0UNRANKED:1395077317407277216>",
+        "color": 0x4E4E4E
+    },
+    "SILVER": {
+        "role_name": "SILVER SEEKER",
+        "min_mmr": 800,
+        "max_mmr": 949,
+        "name": "SILVER SEEKER",
+        "emoji": "<:1SILVER:1395077319563149422>",
+        "color": 0xBDBDBD
+    },
+    "PLATINUM": {
+        "role_name": "PLATINUM SEEKER",
+        "min_mmr": 950,
+        "max_mmr": 1099,
+        "name": "PLATINUM SEEKER",
+        "emoji": "<:2PLATINUM:1395077322213822564>",
+        "color": 0x3DDBEE
+    },
+    "CRYSTAL": {
+        "role_name": "CRYSTAL SEEKER",
+        "min_mmr": 1100,
+        "max_mmr": 1249,
+        "name": "CRYSTAL SEEKER",
+        "emoji": "<:3CRYSTAL:1395077324382404719>",
+        "color": 0x9BC2F1
+    },
+    "ELITE": {
+        "role_name": "ELITE SEEKER",
+        "min_mmr": 1250,
+        "max_mmr": 1449,
+        "name": "ELITE SEEKER",
+        "emoji": "<:4ELITE:1395077326416642078>",
+        "color": 0x3BF695
+    },
+    "MASTER": {
+        "role_name": "MASTER SEEKER",
+        "min_mmr": 1450,
+        "max_mmr": 1699,
+        "name": "MASTER SEEKER",
+        "emoji": "<:5Mastermin:1395077330963267776>",
+        "color": 0xFF0000
+    },
+    "LEGENDARY": {
+        "role_name": "LEGENDARY SEEKER",
+        "min_mmr": 1700,
+        "max_mmr": 9999,
+        "name": "LEGENDARY SEEKER",
+        "emoji": "<:6LEGENDARYmin:1395077334003876012>",
+        "color": 0xF3C900
+    }
+}
+
+
+@dataclass(frozen=True)
+class Rank:
+    key: str
+    name: str
+    role_name: str
+    emoji: str
+    color: int
+    min_mmr: int
+    max_mmr: int
+
+
+class RankTable:
+    """Rank tiers compiled for fast lookups
+
+    Tiers are sorted by min_mmr - MMR below the first tier counts as the
+    first, above the last as the last.
+    """
+
+    def __init__(self, rank_system):
+        self.system = rank_system
+        self.ranks = tuple(sorted((Rank(key=rank_key, **data) for rank_key, data in rank_system.items()),
+                                  key=lambda rank: rank.min_mmr))
+        self.by_key = {rank.key: rank for rank in self.ranks}
+        self.thresholds = [rank.min_mmr for rank in self.ranks]
+        self.threshold_array = np.array(self.thresholds, dtype=np.int64)
+
+    def rank_index(self, mmr):
+        """Position in ranks of the tier holding an MMR"""
+        return max(bisect_right(self.thresholds, mmr) - 1, 0)
+
+    def get_rank(self, mmr):
+        """Rank of an MMR"""
+        return self.ranks[self.rank_index(mmr)]
+
+    def next_rank(self, mmr):
+        """First rank above an MMR, None at the top tier"""
+        index = max(bisect_right(self.thresholds, mmr), 1)  # Below the first tier still counts as the first
+        return self.ranks[index] if index < len(self.ranks) else None
+
+    def rank_indices(self, points):
+        """Positions in ranks for an array of MMRs"""
+        return np.maximum(np.searchsorted(self.threshold_array, points, side="right") - 1, 0)
+
+    def get_rank_from_mmr(self, mmr):
+        """(name, emoji) of the rank of an MMR"""
+        rank = self.get_rank(mmr)
+        return rank.name, rank.emoji
+
+
+DEFAULT_RANKS = RankTable(RANK_SYSTEM)
+RANKS = DEFAULT_RANKS.ranks
+RANKS_BY_KEY = DEFAULT_RANKS.by_key
+RANK_THRESHOLDS = DEFAULT_RANKS.thresholds
+
+rank_index = DEFAULT_RANKS.rank_index
+get_rank = DEFAULT_RANKS.get_rank
+next_rank = DEFAULT_RANKS.next_rank
+rank_indices = DEFAULT_RANKS.rank_indices
+get_rank_from_mmr = DEFAULT_RANKS.get_rank_from_mmr
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Rating rules for HeatSeeker 2v2 matches.
+
+Every model rates a batch of matches at once. Arrays have one row per match
+and four seats per row: seats 0-1 are Team 1, seats 2-3 are Team 2.
+
+    python rating.py --benchmark 1000000
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+
+class RatingModel:
+    """Base class for rating rules"""
+
+    name = "base"
+
+    def rate(self, points, placement, won):
+        """Return the MMR change of every seat for a batch of matches
+
+        points and placement are int arrays of shape (matches, 4) with the
+        values before the match, won is a bool array of the same shape.
+        """
+        raise NotImplementedError
+
+    def apply(self, points, placement, won):
+        """Return the points after the matches, never below 0"""
+        return np.maximum(0, points + self.rate(points, placement, won))
+
+    def even_match_changes(self, points):
+        """(gain, loss) of a ranked player in a match between four equal players"""
+        seats = np.full((1, 4), points, dtype=np.int64)
+        placement = np.full((1, 4), np.iinfo(np.int32).max, dtype=np.int64)
+        won = np.array([[True, True, False, False]])
+        deltas = self.rate(seats, placement, won)[0]
+        return int(deltas[0]), int(-deltas[2])
+
+    @staticmethod
+    def team_averages(points):
+        """Average MMR of each seat's own team and of the opposing team"""
+        team1 = points[:, :2].mean(axis=1)
+        team2 = points[:, 2:].mean(axis=1)
+        own = np.column_stack([team1, team1, team2, team2])
+        opponent = np.column_stack([team2, team2, team1, team1])
+        return own, opponent
+
+
+class FlatRating(RatingModel):
+    """Fixed deltas: +25/-20 ranked, +10/-5 during placement matches"""
+
+    name = "flat"
+
+    def __init__(self, win=25, loss=20, placement_win=10, placement_loss=5, placement_matches=5):
+        self.win = win
+        self.loss = loss
+        self.placement_win = placement_win
+        self.placement_loss = placement_loss
+        self.placement_matches = placement_matches
+
+    def rate(self, points, placement, won):
+        return np.where(placement < self.placement_matches,
+                        np.where(won, self.placement_win, -self.placement_loss),
+                        np.where(won, self.win, -self.loss)).astype(np.int64)
+
+
+class DiscordBotRating(RatingModel):
+    """Team average MMR difference rules from discord_bot.calculate_mmr_changes"""
+
+    name = "discord_bot"
+
+    def __init__(self, base_change=25, min_gain=10, max_gain=40):
+        self.base_change = base_change
+        self.min_gain = min_gain
+        self.max_gain = max_gain
+
+    def rate(self, points, placement, won):
+        own, opponent = self.team_averages(points)
+        # Difference seen from the winning team's side
+        winner_diff = np.where(won, own - opponent, opponent - own)
+        favourites = np.maximum(self.min_gain, self.base_change - winner_diff // 10)
+        underdogs = np.minimum(self.max_gain, self.base_change + np.abs(winner_diff) // 10)
+        gain = np.where(winner_diff > 0, favourites, underdogs).astype(np.int64)
+        return np.where(won, gain, -gain)
+
+
+class EloRating(RatingModel):
+    """Expected-score Elo on team average MMR"""
+
+    name = "elo"
+
+    def __init__(self, k=32, scale=400, placement_k=None, placement_matches=5):
+        self.k = k
+        self.scale = scale
+        self.placement_k = placement_k if placement_k is not None else k
+        self.placement_matches = placement_matches
+
+    def rate(self, points, placement, won):
+        own, opponent = self.team_averages(points)
+        expected = 1.0 / (1.0 + 10.0 ** ((opponent - own) / self.scale))
+        k = np.where(placement < self.placement_matches, self.placement_k, self.k)
+        return np.rint(k * (won - expected)).astype(np.int64)
+
+
+RATING_MODELS = {
+    FlatRating.name: FlatRating,
+    DiscordBotRating.name: DiscordBotRating,
+    EloRating.name: EloRating
+}
+
+
+def get_rating_model(name, **options):
+    """Create a rating model by name"""
+    try:
+        return RATING_MODELS[name](**options)
+    except KeyError:
+        raise ValueError(f"Unknown rating model '{name}' (choose from {', '.join(RATING_MODELS)})")
+
+
+def random_batch(match_count, seed=1):
+    """Random pre-match points, placement counts and results"""
+    rng = np.random.default_rng(seed)
+    points = rng.integers(700, 1800, (match_count, 4))
+    placement = rng.integers(0, 30, (match_count, 4))
+    team1_won = rng.integers(0, 2, match_count).astype(bool)
+    won = np.column_stack([team1_won, team1_won, ~team1_won, ~team1_won])
+    return points, placement, won
+
+
+def benchmark(match_count):
+    """Print rated matches per second for every model, batched and one by one"""
+    points, placement, won = random_batch(match_count)
+    single_count = min(match_count, 10000)
+    for name, model_class in RATING_MODELS.items():
+        model = model_class()
+
+        started = time.perf_counter()
+        model.rate(points, placement, won)
+        batched = match_count / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for i in range(single_count):
+            model.rate(points[i:i + 1], placement[i:i + 1], won[i:i + 1])
+        single = single_count / (time.perf_counter() - started)
+
+        print(f"{name:12} batched: {batched:>14,.0f} matches/s   one at a time: {single:>10,.0f} matches/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the rating models")
+    parser.add_argument("--benchmark", type=int, default=1000000, metavar="MATCHES", help="Batch size to rate")
+    args = parser.parse_args(argv)
+    benchmark(args.benchmark)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
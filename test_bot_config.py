@@ -0,0 +1,120 @@
+"""Tests for config validation in bot_config.py"""
+
+import copy
+import json
+
+import pytest
+
+from bot_config import DEFAULT_CONFIG, ConfigError, compile_config, load_config
+
+
+def rejected(data):
+    """Errors of a config that must fail validation"""
+    with pytest.raises(ConfigError) as info:
+        compile_config(data)
+    return info.value.errors
+
+
+def default_ranks():
+    return copy.deepcopy(DEFAULT_CONFIG["ranks"])
+
+
+def test_defaults_compile():
+    config = compile_config({})
+    assert config.queue_limit == 4
+    assert config.placement_matches == DEFAULT_CONFIG["placement_matches"]
+    assert config.rating_model.name == "flat"
+    assert [rank.key for rank in config.ranks.ranks][0] == "UNRANKED"
+
+
+def test_digest_tracks_effective_settings():
+    assert compile_config({}).digest == compile_config({"queue_timeout": DEFAULT_CONFIG["queue_timeout"]}).digest
+    assert compile_config({}).digest != compile_config({"queue_timeout": 60}).digest
+
+
+def test_changed_sections():
+    old = compile_config({})
+    new = compile_config({"queue_timeout": 60, "placement_matches": 3})
+    assert sorted(new.changed_sections(old)) == ["placement_matches", "queue_timeout"]
+    assert old.changed_sections(old) == []
+
+
+def test_placement_matches_reach_the_rating_model():
+    assert compile_config({"placement_matches": 2}).rating_model.placement_matches == 2
+
+
+def test_hex_colors_are_parsed():
+    ranks = default_ranks()
+    ranks["SILVER"]["color"] = "#C0C0C0"
+    assert compile_config({"ranks": ranks}).ranks.by_key["SILVER"].color == 0xC0C0C0
+
+
+def test_rejects_unknown_setting():
+    assert "queue_size: unknown setting" in rejected({"queue_size": 4})
+
+
+def test_rejects_queue_limit_other_than_four():
+    assert any(error.startswith("queue_limit") for error in rejected({"queue_limit": 6}))
+
+
+@pytest.mark.parametrize("value", [0, -5, "300", True])
+def test_rejects_bad_queue_timeout(value):
+    assert any(error.startswith("queue_timeout") for error in rejected({"queue_timeout": value}))
+
+
+@pytest.mark.parametrize("value", [-1, 2.5, None])
+def test_rejects_bad_placement_matches(value):
+    assert any(error.startswith("placement_matches") for error in rejected({"placement_matches": value}))
+
+
+def test_rejects_unknown_rating_model():
+    assert any(error.startswith("rating.model") for error in rejected({"rating": {"model": "glicko"}}))
+
+
+def test_rejects_unknown_rating_option():
+    assert any(error.startswith("rating.options") for error in
+               rejected({"rating": {"model": "flat", "options": {"bonus": 5}}}))
+
+
+def test_rejects_rating_where_wins_lose_points():
+    errors = rejected({"rating": {"model": "flat", "options": {"win": -5, "loss": 20}}})
+    assert any("expected a gain and a loss" in error for error in errors)
+
+
+def test_rejects_gap_between_tiers():
+    ranks = default_ranks()
+    ranks["SILVER"]["min_mmr"] += 10
+    assert any("SILVER must start at UNRANKED.max_mmr + 1" in error for error in rejected({"ranks": ranks}))
+
+
+def test_rejects_tier_fields():
+    ranks = default_ranks()
+    del ranks["SILVER"]["emoji"]
+    ranks["PLATINUM"]["icon"] = "x"
+    ranks["CRYSTAL"]["color"] = "blue"
+    ranks["ELITE"]["min_mmr"] = ranks["ELITE"]["max_mmr"] + 1
+    errors = rejected({"ranks": ranks})
+    for key in ("SILVER", "PLATINUM", "CRYSTAL", "ELITE"):
+        assert any(error.startswith(f"ranks.{key}") for error in errors)
+
+
+def test_rejects_duplicate_role_names():
+    ranks = default_ranks()
+    ranks["SILVER"]["role_name"] = ranks["UNRANKED"]["role_name"]
+    assert "ranks: role_name values must be unique" in rejected({"ranks": ranks})
+
+
+def test_reports_every_error_at_once():
+    assert len(rejected({"queue_limit": 5, "queue_timeout": 0, "ranks": {}})) == 3
+
+
+def test_load_config(tmp_path):
+    assert load_config(str(tmp_path / "missing.json")).digest == compile_config({}).digest
+
+    path = tmp_path / "hsm_config.json"
+    path.write_text(json.dumps({"queue_timeout": 120}), encoding="utf-8")
+    assert load_config(str(path)).queue_timeout == 120
+
+    path.write_text("{not json", encoding="utf-8")
+    with pytest.raises(ConfigError):
+        load_config(str(path))
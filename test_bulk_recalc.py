@@ -0,0 +1,85 @@
+"""Tests for bulk match result recalculation in bulk_recalc.py"""
+
+import json
+import sqlite3
+
+import pytest
+
+from bulk_recalc import bulk_recalculate, main, parse_match_changes, parse_outcome
+
+
+@pytest.fixture
+def conn():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("""
+        CREATE TABLE players (user_id INTEGER PRIMARY KEY, points INTEGER DEFAULT 1000, wins INTEGER DEFAULT 0,
+                              losses INTEGER DEFAULT 0, placement_matches INTEGER DEFAULT 0)
+    """)
+    connection.execute("""
+        CREATE TABLE matches (match_id INTEGER PRIMARY KEY, team1_player1 INTEGER, team1_player2 INTEGER,
+                              team2_player1 INTEGER, team2_player2 INTEGER, winner INTEGER, completed INTEGER DEFAULT 0,
+                              admin_modified INTEGER DEFAULT 0, cancelled INTEGER DEFAULT 0)
+    """)
+    connection.executemany("INSERT INTO players VALUES (?, ?, ?, ?, 10)",
+                           [(1, 1025, 1, 0), (2, 1025, 1, 0), (3, 980, 0, 1), (4, 980, 0, 1)])
+    connection.execute("INSERT INTO matches VALUES (12, 1, 2, 3, 4, 1, 1, 0, 0)")
+    connection.execute("INSERT INTO matches VALUES (13, 1, 2, 3, 4, NULL, 0, 0, 0)")
+    connection.commit()
+    yield connection
+    connection.close()
+
+
+def players(conn):
+    return {row[0]: row[1:] for row in conn.execute("SELECT user_id, points, wins, losses FROM players")}
+
+
+def test_parse_match_changes():
+    assert parse_match_changes(["HSM12=blue, 13=2", "14=cancel"]) == {12: 1, 13: 2, 14: -1}
+    assert parse_outcome(" Team2 ") == 2
+    with pytest.raises(ValueError):
+        parse_match_changes(["12"])
+    with pytest.raises(ValueError):
+        parse_outcome("draw")
+
+
+def test_flipping_a_result(conn):
+    report = bulk_recalculate(conn, {12: 2})
+    assert report["matches"] == [(12, 1, 2)]
+    assert players(conn) == {1: (980, 0, 1), 2: (980, 0, 1), 3: (1025, 1, 0), 4: (1025, 1, 0)}
+    assert conn.execute("SELECT winner, admin_modified, cancelled FROM matches WHERE match_id = 12").fetchone() == (2, 1, 0)
+    assert report["players"][1] == {"old_points": 1025, "new_points": 980}
+
+
+def test_cancelling_reverts_the_result(conn):
+    bulk_recalculate(conn, {12: -1})
+    assert players(conn) == {1: (1000, 0, 0), 2: (1000, 0, 0), 3: (1000, 0, 0), 4: (1000, 0, 0)}
+    assert conn.execute("SELECT cancelled FROM matches WHERE match_id = 12").fetchone() == (1,)
+
+
+def test_skipped_matches(conn):
+    report = bulk_recalculate(conn, {12: 1, 13: 2, 99: 1})
+    assert dict(report["skipped"]) == {12: "result unchanged", 13: "not found or not completed", 99: "not found or not completed"}
+    assert report["matches"] == []
+
+
+def test_dry_run_saves_nothing(conn):
+    before = players(conn)
+    report = bulk_recalculate(conn, {12: 2}, dry_run=True)
+    assert report["players"][3]["new_points"] == 1025
+    assert players(conn) == before
+
+
+def test_main_uses_the_config_rating(conn, tmp_path):
+    db_path, config_path = tmp_path / "players.db", tmp_path / "config.json"
+    config_path.write_text(json.dumps({"rating": {"model": "flat", "options": {"win": 30, "loss": 10}}}))
+    with sqlite3.connect(db_path) as copy:
+        conn.backup(copy)
+
+    assert main(["--db", str(db_path), "--config", str(config_path), "12=cancel"]) == 0
+    with sqlite3.connect(db_path) as saved:
+        assert players(saved) == {1: (995, 0, 0), 2: (995, 0, 0), 3: (990, 0, 0), 4: (990, 0, 0)}
+
+    # --model still overrides the config
+    assert main(["--db", str(db_path), "--config", str(config_path), "--model", "flat", "12=1"]) == 0
+    with sqlite3.connect(db_path) as saved:
+        assert players(saved)[1] == (1020, 1, 0)
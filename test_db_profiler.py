@@ -0,0 +1,85 @@
+"""Tests for statement fingerprints and the profiled connection in db_profiler.py"""
+
+import sqlite3
+
+import pytest
+
+from db_profiler import ProfiledConnection, fingerprint, is_full_scan, profiler
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT points FROM players WHERE user_id = 42", "SELECT points FROM players WHERE user_id = ?"),
+    ("SELECT *\n  FROM players\n  WHERE points > 1000.5", "SELECT * FROM players WHERE points > ?"),
+    ("SELECT 1 FROM player_names WHERE display_name = 'it''s me'", "SELECT ? FROM player_names WHERE display_name = ?"),
+    ("SELECT * FROM players WHERE user_id IN (?, ?, ?)", "SELECT * FROM players WHERE user_id IN (?+)"),
+    ("SELECT * FROM players WHERE user_id IN (?,?)", "SELECT * FROM players WHERE user_id IN (?+)"),
+    ("SELECT team1_player1 FROM matches", "SELECT team1_player1 FROM matches"),
+])
+def test_fingerprint(sql, expected):
+    assert fingerprint(sql) == expected
+
+
+def test_f_string_in_lists_share_a_fingerprint():
+    assert fingerprint(f"SELECT * FROM t WHERE id IN ({','.join('?' * 3)})") == \
+        fingerprint(f"SELECT * FROM t WHERE id IN ({','.join('?' * 40)})")
+
+
+def test_is_full_scan():
+    assert is_full_scan(["SCAN players"])
+    assert not is_full_scan(["SCAN players USING COVERING INDEX idx_points"])
+    assert not is_full_scan(["SEARCH players USING INTEGER PRIMARY KEY (rowid=?)"])
+
+
+@pytest.fixture
+def conn():
+    profiler.reset()
+    connection = sqlite3.connect(":memory:", factory=ProfiledConnection)
+    connection.execute("CREATE TABLE players (user_id INTEGER PRIMARY KEY, points INTEGER)")
+    connection.executemany("INSERT INTO players VALUES (?, ?)", [(user_id, 1000 + user_id) for user_id in range(50)])
+    connection.commit()
+    yield connection
+    connection.close()
+    profiler.reset()
+
+
+def test_statements_are_aggregated_per_fingerprint(conn):
+    for user_id in (1, 2, 3):
+        conn.execute("SELECT points FROM players WHERE user_id = ?", (user_id,)).fetchone()
+    cursor = conn.cursor()
+    cursor.execute("SELECT user_id FROM players WHERE points > ?", (1010,))
+    cursor.fetchmany(5)
+    cursor.fetchall()
+
+    stats = profiler.statements["SELECT points FROM players WHERE user_id = ?"]
+    assert (stats.count, stats.rows) == (3, 3)
+    assert profiler.statements["SELECT user_id FROM players WHERE points > ?"].rows == 39
+    assert profiler.statements["COMMIT"].count == 1
+    assert profiler.top(1, "count")[0][1].count == 3
+
+
+def test_slow_statements_are_explained_once(conn):
+    profiler.slow_threshold = 0
+    try:
+        conn.execute("SELECT user_id FROM players WHERE points > ?", (1010,)).fetchall()
+        conn.execute("SELECT user_id FROM players WHERE points > ?", (1020,)).fetchall()
+    finally:
+        profiler.slow_threshold = 0.05
+
+    entries = [entry for entry in profiler.slow_log if entry["fingerprint"] == "SELECT user_id FROM players WHERE points > ?"]
+    assert len(entries) == 2
+    assert entries[0]["full_scan"]
+    assert entries[0]["plan"] is entries[1]["plan"]
+    assert entries[1]["seq"] == entries[0]["seq"] + 1
+
+
+def test_slow_total_survives_reset(conn):
+    profiler.slow_threshold = 0
+    try:
+        conn.execute("SELECT 1").fetchall()
+        before = profiler.slow_total
+        profiler.reset()
+        conn.execute("SELECT 1").fetchall()
+    finally:
+        profiler.slow_threshold = 0.05
+    assert profiler.slow_total == before + 1
+    assert profiler.statements["SELECT ?"].slow == 1
@@ -0,0 +1,804 @@
+"""Tests for the in-memory state kept by main.py, see conftest.py for the import"""
+
+import asyncio
+import dataclasses
+import functools
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from bulk_recalc import bulk_recalculate
+
+
+def add_players(main, rows):
+    """Insert [(user_id, points, placement_matches)] and reload the ranking"""
+    main.cursor.executemany("INSERT INTO players (user_id, points, wins, losses, placement_matches) VALUES (?, ?, 0, 0, ?)",
+                            rows)
+    main.conn.commit()
+    main.player_ranking.load(main.cursor)
+
+
+def player(user_id):
+    return SimpleNamespace(id=user_id, display_name=f"Player {user_id}")
+
+
+def assert_matches_db(main):
+    """The incrementally updated ranking equals one loaded from the table"""
+    loaded = main.PlayerRanking(main.config.placement_matches)
+    loaded.load(main.cursor)
+    ranking = main.player_ranking
+    assert ranking.players == loaded.players
+    assert list(ranking.ranked) == list(loaded.ranked)
+    assert ranking.placement_count == loaded.placement_count
+    assert list(ranking.season.ranked) == list(loaded.season.ranked)
+
+
+def test_update_returns_the_changed_positions(bot):
+    ranking = bot.PlayerRanking(placement_required=5)
+    for user_id, points in ((1, 1200), (2, 1100), (3, 1000)):
+        ranking.update(user_id, points, 5)
+
+    assert ranking.update(3, 1150) == (1, 2)  # Passes player 2
+    assert ranking.top(3) == [(1, 1200), (3, 1150), (2, 1100)]
+    assert ranking.update(4, 1000, 4) is None  # Still in placement
+    assert ranking.placement_count == 1
+    assert ranking.update(4, 1300, 5) == (0, 3)  # Enters at the top and shifts everyone
+    assert ranking.position(4) == 1 and ranking.position(2) == 4
+    assert ranking.update(1, 1200, 0) == (1, 3)  # Leaves the ranked list
+    assert ranking.position(1) is None
+    assert ranking.percentile(1) == pytest.approx(200 / 3)
+
+
+def test_equal_points_are_ordered_by_user_id(bot):
+    ranking = bot.PlayerRanking(placement_required=5)
+    for user_id in (30, 10, 20):
+        ranking.update(user_id, 1000, 5)
+    assert [user_id for user_id, points in ranking.top(3)] == [10, 20, 30]
+    assert ranking.top(2, offset=1) == [(20, 1000), (30, 1000)]
+
+
+def test_random_updates_match_a_reload(bot):
+    rng = random.Random(3)
+    add_players(bot, [(user_id, rng.randint(500, 1500), rng.randint(0, 8)) for user_id in range(1, 60)])
+    for _ in range(300):
+        user_id, points, placement = rng.randrange(1, 80), rng.randint(0, 2000), rng.randint(0, 8)
+        bot.cursor.execute("""
+            INSERT INTO players (user_id, points, placement_matches) VALUES (?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET points = excluded.points, placement_matches = excluded.placement_matches
+        """, (user_id, points, placement))
+        bot.player_ranking.update(user_id, points, placement)
+    bot.conn.commit()
+
+    loaded = bot.PlayerRanking(bot.config.placement_matches)
+    loaded.load(bot.cursor)
+    assert list(bot.player_ranking.ranked) == list(loaded.ranked)
+    assert bot.player_ranking.placement_count == loaded.placement_count
+
+
+def test_ranking_follows_settlements_admin_edits_and_season_end(bot):
+    add_players(bot, [(1, 1100, 5), (2, 1000, 5), (3, 1050, 5), (4, 950, 4)])
+    bot.cursor.execute("INSERT INTO matches (match_id, team1_player1, team1_player2, team2_player1, team2_player2) "
+                       "VALUES (1, 1, 2, 3, 4)")
+    bot.conn.commit()
+    match_info = {'match_id': 1, 'team1': [player(1), player(2)], 'team2': [player(3), player(4)]}
+
+    bot.settle_match("HSM1", match_info, 2, "Team 2", player(1))
+    assert bot.player_ranking.position(4) is not None  # Finished placement with this match
+    assert_matches_db(bot)
+
+    report = bulk_recalculate(bot.conn, {1: 1}, model=bot.config.rating_model)
+    bot.record_admin_changes(report)
+    assert_matches_db(bot)
+
+    async def end_season():
+        bot.end_season()  # Schedules a leaderboard refresh, cancelled when the loop closes
+
+    asyncio.run(end_season())
+    assert_matches_db(bot)
+    assert len(bot.player_ranking.season.members) == 0  # Nobody has played in the new season yet
+
+
+class FakeMessage:
+    def __init__(self):
+        self.edits = []
+
+    async def edit(self, embed, view):
+        self.edits.append(embed)
+
+
+@pytest.fixture
+def direct_rest(bot, monkeypatch):
+    """REST calls run directly instead of through the scheduler"""
+    async def direct_rest(priority, route, func, *args, **kwargs):
+        return await func(*args, **kwargs)
+
+    monkeypatch.setattr(bot, "rest", direct_rest)
+
+
+@pytest.fixture
+def season_board(bot, direct_rest, monkeypatch):
+    """A season board in channel 10"""
+    monkeypatch.setattr(bot.bot, "get_channel", lambda channel_id: SimpleNamespace(id=channel_id, guild=None))
+    add_players(bot, [(user_id, 1000 + user_id, 5) for user_id in range(1, 30)])
+    for user_id in range(1, 40):
+        bot.player_names.put(user_id, f"Player {user_id}")
+        bot.player_ranking.add_member(bot.player_ranking.season, user_id)
+    board = {'message': FakeMessage(), 'hash': None, 'cutoff': float('inf')}
+    bot.leaderboard_boards[('season', 10)] = board
+    return board
+
+
+def test_refresh_skips_unchanged_boards(bot, season_board):
+    async def refresh_twice():
+        return await bot.refresh_leaderboard(), await bot.refresh_leaderboard()
+
+    skipped = bot.leaderboard_stats['skipped_unchanged']
+    assert asyncio.run(refresh_twice()) == (1, 0)
+    assert len(season_board['message'].edits) == 1
+    assert bot.leaderboard_stats['skipped_unchanged'] == skipped + 1
+    assert season_board['cutoff'] == bot.LEADERBOARD_SIZE - 1
+
+
+def test_only_changes_above_the_cutoff_schedule_a_refresh(bot, season_board, monkeypatch):
+    triggers = []
+    monkeypatch.setattr(bot, "schedule_leaderboard_refresh", lambda: triggers.append(1))
+    asyncio.run(bot.refresh_leaderboard())
+
+    bot.apply_ranking_updates([(1, 1002, None)])  # Bottom of the ranking, below the board
+    assert triggers == []
+    bot.apply_ranking_updates([(1, 2000, None)])  # Into the top
+    assert triggers == [1]
+
+
+def test_debounce_merges_triggers(bot, monkeypatch):
+    refreshes = []
+
+    async def refresh_leaderboard():
+        refreshes.append(bot.leaderboard_dirty_since)
+        bot.leaderboard_dirty_since = None
+
+    monkeypatch.setattr(bot, "refresh_leaderboard", refresh_leaderboard)
+    monkeypatch.setattr(bot, "leaderboard_debounce", 0.01)
+
+    async def trigger():
+        for _ in range(5):
+            bot.schedule_leaderboard_refresh()
+        await bot.leaderboard_refresh_task
+
+    asyncio.run(trigger())
+    assert len(refreshes) == 1
+
+
+def test_change_during_a_refresh_gets_its_own_refresh(bot, monkeypatch):
+    refreshes = []
+
+    async def refresh_leaderboard():
+        refreshes.append(1)
+        bot.leaderboard_dirty_since = None
+        if len(refreshes) == 1:
+            await asyncio.sleep(0)
+            bot.schedule_leaderboard_refresh()  # Lands while the first render is being sent
+
+    monkeypatch.setattr(bot, "refresh_leaderboard", refresh_leaderboard)
+    monkeypatch.setattr(bot, "leaderboard_debounce", 0.01)
+
+    async def trigger():
+        bot.schedule_leaderboard_refresh()
+        await bot.leaderboard_refresh_task
+
+    asyncio.run(trigger())
+    assert len(refreshes) == 2
+    assert bot.leaderboard_dirty_since is None
+
+
+def run_calls(scheduler, calls):
+    """Submit [(priority, route, label)] at once and return the labels in the order they ran"""
+    ran = []
+
+    def call(label):
+        async def factory():
+            ran.append(label)
+        return factory
+
+    async def submit_all():
+        await asyncio.gather(*(scheduler.submit(priority, route, call(label)) for priority, route, label in calls))
+
+    asyncio.run(submit_all())
+    return ran
+
+
+def test_scheduler_serves_higher_priorities_first(bot):
+    scheduler = bot.RestScheduler(global_rate=100, routes={'message_edit': (1, None, None)})
+    calls = [(bot.PRIORITY_COSMETIC, 'message_edit', "board"), (bot.PRIORITY_QUEUE_DISPLAY, 'message_edit', "queue"),
+             (bot.PRIORITY_SETTLEMENT, 'message_edit', "result"), (bot.PRIORITY_COSMETIC, 'message_edit', "board 2")]
+    assert run_calls(scheduler, calls) == ["result", "queue", "board", "board 2"]
+    assert scheduler.stats['cosmetic']['completed'] == 2
+    assert scheduler.stats['cosmetic']['queued'] == 0
+
+
+def test_global_budget_is_granted_by_priority(bot):
+    scheduler = bot.RestScheduler(global_rate=10, routes={})
+    scheduler.tokens = 0  # Budget used up, every call waits for a grant
+    calls = [(bot.PRIORITY_COSMETIC, f"route {i}", f"cosmetic {i}") for i in range(3)]
+    calls.append((bot.PRIORITY_PROVISION, "route 3", "provision"))
+    assert run_calls(scheduler, calls)[0] == "provision"
+
+
+def test_global_budget_paces_calls(bot):
+    scheduler = bot.RestScheduler(global_rate=50, routes={})
+    started = time.monotonic()
+    run_calls(scheduler, [(bot.PRIORITY_COSMETIC, f"route {i % 4}", i) for i in range(60)])
+    assert time.monotonic() - started >= 0.15  # 50 calls from the full bucket, 10 refilled at 50/s
+
+
+def test_route_rate_limit_paces_calls(bot):
+    scheduler = bot.RestScheduler(global_rate=100, routes={'channel_delete': (1, 2, 0.1)})
+    started = time.monotonic()
+    run_calls(scheduler, [(bot.PRIORITY_COSMETIC, 'channel_delete', i) for i in range(5)])
+    assert time.monotonic() - started >= 0.2  # Calls 3 and 5 wait for the window
+
+
+def test_rate_limited_call_blocks_the_route_and_retries(bot):
+    scheduler = bot.RestScheduler(global_rate=100, routes={})
+    attempts = []
+
+    async def factory():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise discord.RateLimited(0.05)
+        return "sent"
+
+    async def submit():
+        return await scheduler.submit(bot.PRIORITY_SETTLEMENT, 'dm', factory)
+
+    assert asyncio.run(submit()) == "sent"
+    assert attempts[1] - attempts[0] >= 0.05
+    assert scheduler.stats['settlement']['rate_limited'] == 1
+    assert scheduler.stats['settlement']['completed'] == 1
+
+
+def test_weekly_gains_top_and_prune(bot):
+    gains = bot.WeeklyGains(window=3600)
+    now = time.time()
+    gains.add(now - 7200, 1, 100)  # Outside the window
+    gains.add(now - 60, 1, 25)
+    gains.add(now - 60, 2, 25)
+    gains.add(now - 30, 3, -20)
+    gains.record([(2, 25), (4, 10)])
+
+    assert gains.top(10) == [(2, 50), (1, 25), (4, 10)]  # Only gains, ties by user id
+    assert gains.totals == {1: 25, 2: 50, 3: -20, 4: 10}
+    assert gains.top(1) == [(2, 50)]
+
+
+def test_weekly_gains_load_reads_the_window(bot):
+    bot.cursor.executemany("INSERT INTO mmr_changes (user_id, delta, created_at) VALUES (?, ?, datetime('now', ?))",
+                           [(1, 25, '-1 days'), (1, 25, '-8 days'), (2, -20, '-2 days'), (2, 25, '-3 days')])
+    bot.conn.commit()
+    gains = bot.WeeklyGains()
+    gains.load(bot.cursor)
+    assert gains.top(10) == [(1, 25), (2, 5)]
+
+
+def test_guild_and_season_scopes_follow_the_ranking(bot):
+    add_players(bot, [(user_id, 1000 + user_id * 10, 5) for user_id in range(1, 40)])
+    guild = SimpleNamespace(id=7, members=[SimpleNamespace(id=user_id) for user_id in range(1, 60, 2)])
+    for user_id in range(2, 40, 3):
+        bot.player_ranking.add_member(bot.player_ranking.season, user_id)
+    size = bot.LEADERBOARD_SIZE
+
+    def expected(members):
+        return [(user_id, points) for user_id, points in bot.player_ranking.top(100) if user_id in members][:size]
+
+    rng = random.Random(5)
+    for _ in range(100):
+        bot.player_ranking.update(rng.randrange(1, 60), rng.randint(0, 2000), rng.randint(3, 6))
+        entries, cutoff = bot.LEADERBOARD_SCOPES['guild'].top(guild)
+        assert entries == expected({member.id for member in guild.members})
+        if len(entries) == size:
+            assert bot.player_ranking.ranked[cutoff][1] == entries[-1][0]
+        else:
+            assert cutoff == float('inf')
+        assert bot.LEADERBOARD_SCOPES['season'].top(guild)[0] == expected(bot.player_ranking.season.members)
+
+
+def test_member_events_update_the_guild_scope(bot):
+    add_players(bot, [(1, 1500, 5), (2, 1400, 5), (3, 1300, 5)])
+    guild = SimpleNamespace(id=7, members=[SimpleNamespace(id=2)])
+    bot.player_ranking.guild_subset(guild)
+
+    asyncio.run(bot.on_member_join(SimpleNamespace(id=3, guild=guild, display_name="Player 3")))
+    assert bot.LEADERBOARD_SCOPES['guild'].top(guild)[0] == [(2, 1400), (3, 1300)]
+    asyncio.run(bot.on_member_remove(SimpleNamespace(id=2, guild=guild)))
+    assert bot.LEADERBOARD_SCOPES['guild'].top(guild)[0] == [(3, 1300)]
+
+
+def test_season_scope_is_rebuilt_from_played_matches(bot):
+    add_players(bot, [(1, 1500, 5), (2, 1400, 5)])
+    bot.apply_ranking_updates([(1, 1525, 6)], gained=True)
+    assert bot.player_ranking.season.members == {1}
+    bot.cursor.execute("UPDATE players SET wins = 1, points = 1525, placement_matches = 6 WHERE user_id = 1")
+    bot.conn.commit()
+    bot.player_ranking.load(bot.cursor)
+    assert bot.LEADERBOARD_SCOPES['season'].top(None)[0] == [(1, 1525)]
+
+
+def test_profile_cache_invalidation(bot):
+    cache = bot.PlayerProfileCache(capacity=2)
+    cache.put(1, cache.version(1), "profile 1")
+    assert cache.get(1) == "profile 1"
+
+    version = cache.version(1)
+    cache.invalidate(1)  # A match settles while the profile renders
+    cache.put(1, version, "stale profile 1")
+    assert cache.get(1) is None
+    cache.put(1, cache.version(1), "profile 1 after the match")
+    assert cache.get(1) == "profile 1 after the match"
+
+    cache.put(2, 0, "profile 2")
+    cache.get(1)
+    cache.put(3, 0, "profile 3")  # Evicts 2, the least recently used
+    assert list(cache.profiles) == [1, 3]
+    assert cache.stats['evictions'] == 1 and cache.stats['invalidations'] == 1
+
+
+def test_profile_cache_drops_profiles_of_another_config(bot, monkeypatch):
+    cache = bot.PlayerProfileCache()
+    cache.put(1, 0, "profile 1")
+    monkeypatch.setattr(bot, "config", dataclasses.replace(bot.config, digest="reloaded"))
+    assert cache.get(1) is None
+
+
+def test_ranking_updates_invalidate_profiles(bot):
+    add_players(bot, [(1, 1500, 5), (2, 1400, 5)])
+    for user_id in (1, 2):
+        bot.profile_cache.put(user_id, bot.profile_cache.version(user_id), f"profile {user_id}")
+    bot.apply_ranking_updates([(1, 1525, 6)], gained=True)
+    assert bot.profile_cache.get(1) is None
+    assert bot.profile_cache.get(2) == "profile 2"
+
+
+def stored_names(main):
+    return dict(main.cursor.execute("SELECT user_id, display_name FROM player_names").fetchall())
+
+
+def test_name_lookups_only_read_memory(bot, monkeypatch):
+    monkeypatch.setattr(bot.bot, "get_user", lambda user_id: player(user_id) if user_id == 2 else None)
+    names = bot.PlayerNameCache(bot.conn)
+    names.remember([player(1)])
+    assert stored_names(bot) == {1: "Player 1"}
+
+    assert names.lookup([1, 2, 3]) == {1: "Player 1", 2: "Player 2", 3: None}
+    assert stored_names(bot) == {1: "Player 1"}  # The client hit is written by the next fetch
+    assert names.pending == {3} and names.unsaved == {2: "Player 2"}
+    assert names.stats['hits'] == names.stats['client_hits'] == names.stats['misses'] == 1
+
+
+def test_name_fetch_writes_client_hits_and_reads_the_table(bot, monkeypatch):
+    monkeypatch.setattr(bot.bot, "get_user", lambda user_id: player(user_id) if user_id == 2 else None)
+    bot.cursor.execute("INSERT INTO player_names (user_id, display_name) VALUES (3, 'Evicted')")
+    bot.conn.commit()
+    names = bot.PlayerNameCache(bot.conn)
+    names.lookup([2, 3])
+
+    assert asyncio.run(names.fetch()) == [3]
+    assert stored_names(bot) == {2: "Player 2", 3: "Evicted"}
+    assert names.lookup([3]) == {3: "Evicted"}
+    assert not names.pending and not names.unsaved
+
+
+def test_remember_writes_only_changed_names(bot):
+    names = bot.PlayerNameCache(bot.conn)
+    names.remember([player(1), player(2)])
+    names.remember([player(1), SimpleNamespace(id=2, display_name="Renamed")])
+    assert names.stats['writes'] == 3
+    assert stored_names(bot) == {1: "Player 1", 2: "Renamed"}
+
+
+def test_queue_embed_edits_metric_counts_only_queue_embed_edits(bot, direct_rest, monkeypatch):
+    monkeypatch.setattr(bot, "queue_message", FakeMessage())
+    monkeypatch.setattr(bot, "queue_channel", SimpleNamespace(id=20))
+    edits = bot.queue_embed_edits
+
+    async def update_twice():
+        await bot.update_queue_embed()
+        await bot.update_queue_embed()
+
+    asyncio.run(update_twice())
+    assert len(bot.queue_message.edits) == 2
+    assert f"hsm_queue_embed_edits_total {float(edits + 2)}" in bot.metrics.render().splitlines()
+
+
+class FakeMember:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.display_name = f"Player {user_id}"
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+
+class FakeChannel:
+    """Text or voice channel that records what is sent to it and whether it was deleted"""
+
+    def __init__(self, channel_id, name=None):
+        self.id = channel_id
+        self.name = name or f"channel {channel_id}"
+        self.sent = []
+        self.deleted = False
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+    async def delete(self):
+        self.deleted = True
+
+
+def start_match(main, match_id, created_minutes_ago, inactive_minutes_ago):
+    """An active match of players match_id * 10 + 1..4 with its three channels"""
+    players = [FakeMember(match_id * 10 + seat) for seat in range(1, 5)]
+    now = datetime.now()
+    match_name = f"HSM{match_id}"
+    main.cursor.execute("INSERT INTO matches (match_id, team1_player1, team1_player2, team2_player1, team2_player2) "
+                        "VALUES (?, ?, ?, ?, ?)", (match_id, *(member.id for member in players)))
+    main.conn.commit()
+    channels = [FakeChannel(match_id * 100 + index) for index in range(3)]
+    main.active_matches[match_name] = {
+        'players': players, 'team1': players[:2], 'team2': players[2:], 'match_id': match_id,
+        'text_channel': channels[0], 'team1_voice': channels[1], 'team2_voice': channels[2],
+        'created_at': now - timedelta(minutes=created_minutes_ago),
+        'last_activity': now - timedelta(minutes=inactive_minutes_ago), 'warned': False
+    }
+    for member in players:
+        main.player_active_match[member.id] = match_name
+    return main.active_matches[match_name]
+
+
+def test_reaper_expires_leases_and_handles_abandoned_matches(bot, direct_rest):
+    abandoned = start_match(bot, 1, created_minutes_ago=bot.match_max_age / 60 + 1, inactive_minutes_ago=90)
+    inactive = start_match(bot, 2, created_minutes_ago=bot.match_warn_after / 60 + 1, inactive_minutes_ago=bot.match_warn_after / 60 + 1)
+    start_match(bot, 3, created_minutes_ago=5, inactive_minutes_ago=1)
+    now = datetime.now()
+    bot.match_results["HSM2"] = {'processing': True, 'reporter': "someone", 'lease_expires': now - timedelta(seconds=1)}
+    bot.match_results["HSM3"] = {'processing': True, 'reporter': "someone", 'lease_expires': now + timedelta(seconds=60)}
+
+    asyncio.run(bot.reap_matches())
+
+    assert set(bot.match_results) == {"HSM3"}
+    assert set(bot.active_matches) == {"HSM2", "HSM3"}
+    assert bot.cursor.execute("SELECT winner, cancelled FROM matches WHERE match_id = 1").fetchone() == (-1, 1)
+    assert all(channel.deleted for channel in (abandoned['text_channel'], abandoned['team1_voice'], abandoned['team2_voice']))
+    assert all(len(member.sent) == 1 for member in abandoned['players'])
+    assert not any(member.id in bot.player_active_match for member in abandoned['players'])
+
+    assert inactive['warned'] and len(inactive['text_channel'].sent) == 1
+    asyncio.run(bot.reap_matches())  # Warned once only
+    assert len(inactive['text_channel'].sent) == 1
+
+
+class FakeCategory(discord.CategoryChannel):
+    def __init__(self, channels):
+        self.id = 1
+        self.category_channels = channels
+
+    @property
+    def channels(self):
+        return self.category_channels
+
+
+def guild_channel(channel_class, name, minutes_ago):
+    """A text or voice channel created some minutes ago"""
+    channel = object.__new__(channel_class)
+    created_at = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+    channel.id = discord.utils.time_snowflake(created_at) + random.randrange(1000)
+    channel.name = name
+    return channel
+
+
+def test_sweep_deletes_orphan_match_channels(bot, monkeypatch):
+    deleted = []
+
+    async def record_rest(priority, route, func, *args, **kwargs):
+        deleted.append(func.__self__.name)
+
+    live = start_match(bot, 4, created_minutes_ago=30, inactive_minutes_ago=1)
+    live['text_channel'] = guild_channel(discord.TextChannel, "📱-hsm4", 30)
+    bot.cursor.execute("INSERT INTO matches (match_id) VALUES (5)")  # Open match lost from memory
+    bot.conn.commit()
+    category = FakeCategory([
+        live['text_channel'],
+        guild_channel(discord.TextChannel, "📱-hsm5", 30),
+        guild_channel(discord.VoiceChannel, "🔵 Team 1 Voice", 30),
+        guild_channel(discord.TextChannel, "📱-hsm6", 1),  # Still being set up
+        guild_channel(discord.TextChannel, "general", 30)
+    ])
+    monkeypatch.setattr(bot, "rest", record_rest)
+    monkeypatch.setattr(bot.bot, "get_channel", lambda channel_id: category)
+
+    report = asyncio.run(bot.sweep_orphan_channels())
+    assert sorted(deleted) == sorted(["📱-hsm5", "🔵 Team 1 Voice"])
+    assert (report['checked'], report['removed'], report['stale_matches']) == (5, 2, 1)
+    assert bot.cursor.execute("SELECT cancelled FROM matches WHERE match_id = 5").fetchone() == (1,)
+    assert bot.cursor.execute("SELECT cancelled FROM matches WHERE match_id = 4").fetchone() == (0,)
+
+
+@pytest.fixture
+def settlement(bot, monkeypatch):
+    """Fresh settlement queue and workers for the test's event loop, retried without waiting"""
+    monkeypatch.setattr(bot, "settlement_workers", [])
+    monkeypatch.setattr(bot, "settlement_retry_delay", 0)
+
+    async def run(stages_by_match):
+        monkeypatch.setattr(bot, "settlement_queue", asyncio.Queue())
+        for match_name, stages in stages_by_match:
+            bot.enqueue_settlement(match_name, stages)
+        while bot.settlement_stats['pending']:
+            await asyncio.sleep(0.01)
+
+    return run
+
+
+def test_settlement_runs_stages_in_order_and_retries(bot, settlement):
+    ran = []
+
+    def stage(label, failures=0):
+        async def factory():
+            ran.append(label)
+            if ran.count(label) <= failures:
+                raise RuntimeError(f"{label} failed")
+        return factory
+
+    retries = bot.settlement_stats['retries']
+    failed = bot.settlement_stats['failed_stages']
+    asyncio.run(settlement([
+        ("HSM1", [('dms', stage("dms 1", failures=1), 0), ('cleanup', stage("cleanup 1"), 0.05)]),
+        ("HSM2", [('dms', stage("dms 2", failures=bot.settlement_max_retries + 1), 0)])
+    ]))
+    assert ran.index("dms 1") < ran.index("cleanup 1")
+    assert ran.count("dms 1") == 2 and ran.count("cleanup 1") == 1
+    assert ran.count("dms 2") == bot.settlement_max_retries + 1  # Given up, the job still completes
+    assert bot.settlement_stats['retries'] == retries + 1 + bot.settlement_max_retries
+    assert bot.settlement_stats['failed_stages'] == failed + 1
+
+
+def test_cleanup_retry_deletes_only_the_remaining_channels(bot, direct_rest, settlement):
+    deletes = []
+
+    class FlakyChannel(FakeChannel):
+        async def delete(self):
+            deletes.append(self.id)
+            if self.id == 2 and deletes.count(2) == 1:
+                raise RuntimeError("503 Service Unavailable")
+            self.deleted = True
+
+    channels = [FlakyChannel(channel_id) for channel_id in (1, 2, 3)]
+    asyncio.run(settlement([("HSM1", [('cleanup', functools.partial(bot.queue_match_cleanup, "HSM1", list(channels)), 0)])]))
+    assert all(channel.deleted for channel in channels)
+    assert sorted(deletes) == [1, 2, 2, 3]
+
+
+class FakeGuild:
+    """Guild with roles and members, creating roles with increasing ids"""
+
+    def __init__(self, roles=(), members=()):
+        self.id = 7
+        self.name = "HeatSeeker"
+        self.roles = list(roles)
+        self.members = list(members)
+        self.created = []
+
+    def get_role(self, role_id):
+        return next((role for role in self.roles if role.id == role_id), None)
+
+    async def create_role(self, name, color, reason):
+        role = SimpleNamespace(id=1000 + len(self.roles), name=name)
+        self.roles.append(role)
+        self.created.append(name)
+        return role
+
+
+class FakeRoleMember(FakeMember):
+    def __init__(self, user_id, guild, roles=(), bot=False):
+        super().__init__(user_id)
+        self.guild = guild
+        self.roles = list(roles)
+        self.bot = bot
+        self.edits = 0
+
+    async def add_roles(self, *roles, reason):
+        self.edits += 1
+        self.roles.extend(roles)
+
+    async def remove_roles(self, *roles, reason):
+        self.edits += 1
+        self.roles = [role for role in self.roles if role not in roles]
+
+
+def rank_roles_guild(main):
+    """A guild with one role per rank tier, cached as if provisioned"""
+    guild = FakeGuild([SimpleNamespace(id=index, name=rank.role_name) for index, rank in enumerate(main.config.ranks.ranks)])
+    main.rank_role_cache[guild.id] = {rank.key: index for index, rank in enumerate(main.config.ranks.ranks)}
+    return guild
+
+
+def rank_role(main, guild, mmr):
+    return guild.get_role(main.rank_role_cache[guild.id][main.config.ranks.get_rank(mmr).key])
+
+
+def test_rank_role_update_swaps_only_the_rank_role(bot, direct_rest):
+    guild = rank_roles_guild(bot)
+    moderator = SimpleNamespace(id=500, name="Moderator")
+    member = FakeRoleMember(1, guild, [rank_role(bot, guild, 1000), moderator])
+
+    asyncio.run(bot.update_player_rank_role(member, 1600))
+    assert member.roles == [moderator, rank_role(bot, guild, 1600)]
+    assert member.edits == 2
+
+    asyncio.run(bot.update_player_rank_role(member, 1600))  # Already right, no call
+    assert member.edits == 2
+
+
+def test_rank_role_update_waits_for_provisioning(bot, direct_rest, monkeypatch):
+    provisioned = []
+
+    async def provision_rank_roles(guild):
+        provisioned.append(guild.id)
+
+    monkeypatch.setattr(bot, "provision_rank_roles", provision_rank_roles)
+    member = FakeRoleMember(1, FakeGuild())
+
+    async def update():
+        await bot.update_player_rank_role(member, 1600)
+        await asyncio.sleep(0)
+
+    asyncio.run(update())
+    assert member.edits == 0 and provisioned == [7]
+
+
+def test_provisioning_creates_only_missing_rank_roles(bot, direct_rest):
+    ranks = bot.config.ranks.ranks
+    guild = FakeGuild([SimpleNamespace(id=1, name=ranks[0].role_name), SimpleNamespace(id=2, name="General")])
+
+    asyncio.run(bot.provision_rank_roles(guild))
+    assert guild.created == [rank.role_name for rank in ranks[1:]]
+    assert bot.rank_role_cache[guild.id][ranks[0].key] == 1
+    assert set(bot.rank_role_cache[guild.id]) == {rank.key for rank in ranks}
+
+    cache = bot.rank_role_cache.pop(guild.id)
+    asyncio.run(bot.provision_rank_roles(guild))  # Every role exists now
+    assert bot.rank_role_cache[guild.id] == cache
+    assert len(guild.created) == len(ranks) - 1
+
+
+def test_rank_sync_changes_only_wrong_roles(bot, direct_rest):
+    guild = rank_roles_guild(bot)
+    retired = SimpleNamespace(id=900, name="Old Tier")
+    guild.roles.append(retired)
+    bot.retired_rank_roles[guild.id] = {retired.id}
+    add_players(bot, [(1, 1000, 5), (2, 1600, 5), (3, 1600, 2), (4, 1000, 5)])
+    members = [
+        FakeRoleMember(1, guild, [rank_role(bot, guild, 1000)]),  # Already right
+        FakeRoleMember(2, guild, [rank_role(bot, guild, 1000)]),  # Ranked up
+        FakeRoleMember(3, guild, [rank_role(bot, guild, 1000)]),  # In placement, no rank role
+        FakeRoleMember(4, guild, [retired]),  # Tier replaced by a config reload
+        FakeRoleMember(5, guild, [rank_role(bot, guild, 1000)], bot=True)
+    ]
+    guild.members = members
+
+    report = asyncio.run(bot.sync_guild_rank_roles(guild))
+    assert (report['scanned'], report['changes'], report['failed']) == (5, 3, 0)
+    assert [member.roles for member in members[:4]] == [
+        [rank_role(bot, guild, 1000)], [rank_role(bot, guild, 1600)], [], [rank_role(bot, guild, 1000)]
+    ]
+    assert members[0].edits == 0 and members[4].edits == 0
+    assert guild.id not in bot.retired_rank_roles
+
+
+def test_settlement_result_is_computed_once_in_one_transaction(bot):
+    threshold = bot.config.ranks.ranks[2].min_mmr
+    add_players(bot, [(2, 1000, 4), (3, threshold - 10, 5), (4, threshold + 5, 5)])
+    bot.cursor.execute("INSERT INTO matches (match_id) VALUES (1)")
+    bot.conn.commit()
+    match_info = {'match_id': 1, 'team1': [player(1), player(2)], 'team2': [player(3), player(4)]}
+
+    result = bot.settle_match("HSM1", match_info, 2, "Team 2", player(1))
+    outcomes = {outcome.player.id: outcome for outcome in result.outcomes}
+    assert [outcome.player.id for outcome in result.winners] == [3, 4]
+    assert {user_id: outcome.delta for user_id, outcome in outcomes.items()} == {1: -5, 2: -5, 3: 25, 4: 25}
+    assert outcomes[1].is_placement and not outcomes[1].completed_placement  # New player
+    assert outcomes[2].completed_placement and outcomes[2].needs_role_update
+    assert outcomes[3].rank_changed and outcomes[3].needs_role_update
+    assert not outcomes[4].needs_role_update
+
+    rows = bot.cursor.execute("SELECT user_id, points, wins, losses, placement_matches FROM players ORDER BY user_id").fetchall()
+    assert rows == [(1, 995, 0, 1, 1), (2, 995, 0, 1, 5), (3, threshold + 15, 1, 0, 6), (4, threshold + 30, 1, 0, 6)]
+    assert bot.cursor.execute("SELECT winner, completed FROM matches WHERE match_id = 1").fetchone() == (2, 1)
+    assert bot.cursor.execute("SELECT COUNT(*) FROM mmr_changes WHERE match_id = 1").fetchone() == (4,)
+
+
+def test_failed_settlement_changes_nothing(bot):
+    add_players(bot, [(user_id, 1000, 5) for user_id in range(1, 5)])
+    bot.cursor.execute("INSERT INTO matches (match_id) VALUES (1)")
+    bot.conn.commit()
+
+    class BrokenRating:
+        def apply(self, points, placement, won):
+            raise ValueError("bad rating options")
+
+    broken_config = dataclasses.replace(bot.config, rating_model=BrokenRating())
+    match_info = {'match_id': 1, 'team1': [player(1), player(2)], 'team2': [player(3), player(4)], 'config': broken_config}
+    with pytest.raises(ValueError):
+        bot.settle_match("HSM1", match_info, 1, "Team 1", player(1))
+    assert bot.cursor.execute("SELECT COUNT(*) FROM players WHERE points != 1000").fetchone() == (0,)
+    assert bot.cursor.execute("SELECT completed FROM matches WHERE match_id = 1").fetchone() == (0,)
+    assert_matches_db(bot)
+
+
+def test_leaderboard_pages_are_cached_until_a_position_on_them_changes(bot):
+    size = bot.LEADERBOARD_SIZE
+    add_players(bot, [(user_id, 3000 - user_id * 10, 5) for user_id in range(1, size * 2 + 4)])
+    for user_id in range(1, size * 2 + 4):
+        bot.player_names.put(user_id, f"Player {user_id}")
+    assert bot.leaderboard_page_count() == 3
+
+    pages = [bot.get_leaderboard_page(page) for page in range(3)]
+    assert f"**{size + 1}.**" in pages[1] and "Player 1\n" in pages[0]
+    misses = bot.leaderboard_stats['page_misses']
+    assert [bot.get_leaderboard_page(page) for page in range(3)] == pages
+    assert bot.leaderboard_stats['page_misses'] == misses
+
+    bot.apply_ranking_updates([(size + 2, 3000 - (size + 1) * 10 + 5, None)])  # Passes the player above, on page 2
+    assert set(bot.leaderboard_page_cache) == {0, 2}
+    assert bot.get_leaderboard_page(1) != pages[1]
+
+
+def test_leaderboard_page_buttons(bot):
+    add_players(bot, [(user_id, 1000, 5) for user_id in range(1, bot.LEADERBOARD_SIZE * 2 + 1)])
+
+    async def button_states(page):
+        view = bot.create_leaderboard_page_view(page)
+        return [(item.item.custom_id, item.item.disabled) for item in view.children]
+
+    assert asyncio.run(button_states(0)) == [('leaderboard:prev:0', True), ('leaderboard:jump', False), ('leaderboard:next:1', False)]
+    assert asyncio.run(button_states(1)) == [('leaderboard:prev:0', False), ('leaderboard:jump', False), ('leaderboard:next:1', True)]
+
+
+def test_rank_profile_shows_the_current_position(bot):
+    add_players(bot, [(1, 1500, 5), (2, 1400, 5), (3, 1300, 5), (4, 1200, 5), (5, 1000, 2)])
+    user = SimpleNamespace(id=3, display_name="Player 3", avatar=None)
+    profile = bot.build_rank_profile(3)
+
+    def position_field():
+        fields = {field.name: field.value for field in bot.create_rank_profile_embed(user, profile).fields}
+        return fields["🏅 ترتيبك"]
+
+    assert "#3 من 4" in position_field() and "25.0%" in position_field()
+    bot.apply_ranking_updates([(4, 1350, None)])  # Another player's match moves them down, the profile stays cached
+    assert "#4 من 4" in position_field() and "0.0%" in position_field()
+    assert "🏅 ترتيبك" not in {field.name for field in bot.create_rank_profile_embed(
+        SimpleNamespace(id=5, display_name="Player 5", avatar=None), bot.build_rank_profile(5)).fields}
+
+
+def test_instrumented_handlers_record_the_first_response_as_ack(bot, monkeypatch):
+    async def send_message(self, content):
+        await asyncio.sleep(0.01)
+
+    monkeypatch.setattr(bot.TimedInteractionResponse, "send_message", bot.track_ack(send_message))
+
+    @bot.instrument("test.ack")
+    async def handler(interaction):
+        await interaction.response.send_message("first")
+        await interaction.response.send_message("second")
+        return type(interaction.response)
+
+    interaction = object.__new__(discord.Interaction)
+    assert asyncio.run(handler(interaction)) is bot.TimedInteractionResponse
+    stats = bot.perf_registry.handler("test.ack")
+    assert stats.histograms["ack"].count == 1
+    assert stats.histograms["rest"].total >= 20_000  # Both responses, in microseconds
+    assert not hasattr(discord.InteractionResponse.send_message, "__wrapped__")
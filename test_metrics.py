@@ -0,0 +1,47 @@
+"""Tests for the Prometheus text rendering in metrics.py"""
+
+from metrics import MetricsRegistry, format_labels, format_value
+from perf import LatencyHistogram
+
+
+def test_format_values_and_labels():
+    assert format_value(3) == "3.0"
+    assert format_value(float("nan")) == "NaN"
+    assert format_value(float("-inf")) == "-Inf"
+    assert format_labels({}) == ""
+    assert format_labels({"handler": 'say "hi"\n'}) == '{handler="say \\"hi\\"\\n"}'
+
+
+def test_render_gauges_and_labelled_counters():
+    metrics = MetricsRegistry(prefix="hsm_")
+    metrics.gauge("queue_players", "Players in the queue", lambda: 3)
+    metrics.counter("rest_calls_total", "REST calls", lambda: [({"priority": "cosmetic"}, 7)])
+    assert metrics.render() == (
+        "# HELP hsm_queue_players Players in the queue\n"
+        "# TYPE hsm_queue_players gauge\n"
+        "hsm_queue_players 3.0\n"
+        "# HELP hsm_rest_calls_total REST calls\n"
+        "# TYPE hsm_rest_calls_total counter\n"
+        'hsm_rest_calls_total{priority="cosmetic"} 7.0\n'
+    )
+
+
+def test_render_summary_in_seconds():
+    histogram = LatencyHistogram()
+    for seconds in (0.001, 0.002, 0.003):
+        histogram.record(seconds)
+    metrics = MetricsRegistry()
+    metrics.summary("handler_seconds", "Handler time", lambda: [({"handler": "rank"}, histogram)])
+    lines = metrics.render().splitlines()
+    assert lines[2].startswith('handler_seconds{handler="rank",quantile="0.5"} 0.002')
+    assert lines[-2] == 'handler_seconds_sum{handler="rank"} 0.006'
+    assert lines[-1] == 'handler_seconds_count{handler="rank"} 3'
+
+
+def test_failing_collector_is_skipped():
+    metrics = MetricsRegistry()
+    metrics.gauge("broken", "Broken", lambda: 1 / 0)
+    metrics.gauge("working", "Working", lambda: 1)
+    assert metrics.render().splitlines() == [
+        "# broken failed: division by zero", "# HELP working Working", "# TYPE working gauge", "working 1.0"
+    ]
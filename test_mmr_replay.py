@@ -0,0 +1,70 @@
+"""Tests for the vectorized MMR replay in mmr_replay.py"""
+
+import numpy as np
+import pytest
+
+from mmr_replay import STARTING_POINTS, compute_waves, replay, soft_reset, synthetic_history
+from rating import EloRating, FlatRating
+
+
+def replay_one_by_one(players, winners, model, seasons, resets):
+    """Reference replay applying one match at a time"""
+    stats = {}  # {user_id: [points, wins, losses, placement]}
+
+    def end_season(index):
+        target, factor = resets[index]
+        for player in stats.values():
+            player[:3] = [int(soft_reset(np.array(player[0]), target, factor)), 0, 0]
+
+    current_season = 0
+    for row, winner, season in zip(players.tolist(), winners.tolist(), seasons.tolist()):
+        for ended in range(current_season, season):
+            end_season(ended)
+        current_season = season
+        seats = [stats.setdefault(user_id, [STARTING_POINTS, 0, 0, 0]) for user_id in row]
+        won = np.array([[winner == 1, winner == 1, winner == 2, winner == 2]])
+        new_points = model.apply(np.array([[player[0] for player in seats]]),
+                                 np.array([[player[3] for player in seats]]), won)
+        for player, points, seat_won in zip(seats, new_points[0].tolist(), won[0].tolist()):
+            player[0] = points
+            player[1 if seat_won else 2] += 1
+            player[3] += 1
+    # Seasons that ended after the last match still reset everyone
+    for ended in range(current_season, len(resets)):
+        end_season(ended)
+    return stats
+
+
+@pytest.mark.parametrize("model", [FlatRating(), EloRating()], ids=["flat", "elo"])
+def test_replay_matches_one_by_one(model):
+    players, winners = synthetic_history(400, 25, seed=5)
+    seasons = np.repeat([0, 1, 2], [150, 150, 100])
+    resets = [(1000, 0.5), (900, 0.25)]
+
+    user_ids, points, wins, losses, placement = replay(players, winners, model, seasons, resets)
+    expected = replay_one_by_one(players, winners, model, seasons, resets)
+    for user_id, p, w, l, pl in zip(user_ids.tolist(), points.tolist(), wins.tolist(), losses.tolist(), placement.tolist()):
+        assert [p, w, l, pl] == expected[user_id], user_id
+
+
+def test_waves_never_repeat_a_player():
+    players, winners = synthetic_history(300, 12, seed=2)
+    waves = compute_waves(players)
+    for wave in np.unique(waves):
+        seen = players[waves == wave].ravel()
+        assert len(seen) == len(set(seen.tolist()))
+    # A player's matches stay in chronological order
+    for player in range(12):
+        player_waves = waves[(players == player).any(axis=1)]
+        assert np.all(np.diff(player_waves) > 0)
+
+
+def test_soft_reset_rounds_half_up_and_clamps():
+    assert soft_reset(np.array([1201, 999, 1000, -500]), 1000, 0.5).tolist() == [1101, 1000, 1000, 250]
+    assert soft_reset(np.array([1500]), 1000, 0).tolist() == [1000]
+    assert soft_reset(np.array([10]), 0, 1).tolist() == [10]
+
+
+def test_empty_history():
+    user_ids, points, wins, losses, placement = replay(np.empty((0, 4), dtype=np.int64), np.empty(0, dtype=np.int64))
+    assert len(user_ids) == len(points) == 0
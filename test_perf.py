@@ -0,0 +1,89 @@
+"""Tests for the latency histograms and spans in perf.py"""
+
+import json
+import random
+
+import pytest
+
+from perf import SUB_BUCKET_COUNT, LatencyHistogram, PerfRegistry, load_export, registry, span, timed
+
+
+def test_small_values_are_exact():
+    for value in range(SUB_BUCKET_COUNT):
+        assert LatencyHistogram.bucket_upper(LatencyHistogram.bucket_index(value)) == value
+
+
+def test_buckets_hold_their_values():
+    for value in (128, 129, 255, 256, 1000, 65_535, 1_000_000, 123_456_789):
+        index = LatencyHistogram.bucket_index(value)
+        assert LatencyHistogram.bucket_upper(index - 1) < value <= LatencyHistogram.bucket_upper(index)
+
+
+def test_relative_error_is_bounded():
+    for value in range(SUB_BUCKET_COUNT, 2_000_000, 997):
+        upper = LatencyHistogram.bucket_upper(LatencyHistogram.bucket_index(value))
+        assert (upper - value) / value < 0.016
+
+
+def test_percentiles_match_sorted_samples():
+    rng = random.Random(7)
+    samples = [rng.lognormvariate(-4, 1.5) for _ in range(20_000)]
+    histogram = LatencyHistogram()
+    for sample in samples:
+        histogram.record(sample)
+
+    samples.sort()
+    for percent in (50, 90, 99, 99.9):
+        exact = samples[int(len(samples) * percent / 100) - 1]
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=0.02, abs=2e-6)
+    assert histogram.percentile(100) == int(samples[-1] * 1_000_000) / 1_000_000
+    assert histogram.mean == pytest.approx(sum(samples) / len(samples), rel=0.001)
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(99) == 0.0
+    assert histogram.mean == 0.0
+
+
+def test_export_round_trip():
+    histogram = LatencyHistogram()
+    for seconds in (0.00005, 0.003, 0.003, 0.25, 12.0):
+        histogram.record(seconds)
+
+    data = json.loads(json.dumps(histogram.export()))  # Bucket keys become strings in the file
+    restored = LatencyHistogram.from_export(data)
+    assert (restored.count, restored.total, restored.max) == (histogram.count, histogram.total, histogram.max)
+    for percent in (10, 50, 75, 99, 100):
+        assert restored.percentile(percent) == histogram.percentile(percent)
+
+
+def test_spans_add_db_time_to_parents():
+    registry.reset()
+    with span("outer"):
+        with span("inner"):
+            with timed("db"):
+                pass
+            with timed("rest"):
+                pass
+    assert registry.handlers["outer"].histograms["total"].count == 1
+    assert registry.handlers["inner"].histograms["db"].total <= registry.handlers["outer"].histograms["db"].total
+
+
+def test_failed_span_counts_an_error():
+    registry.reset()
+    with pytest.raises(RuntimeError):
+        with span("broken"):
+            raise RuntimeError
+    assert registry.handlers["broken"].errors == 1
+
+
+def test_registry_export_loads(tmp_path):
+    perf_registry = PerfRegistry()
+    perf_registry.handler("rank").histograms["total"].record(0.02)
+    path = tmp_path / "perf_export.json"
+    path.write_text(json.dumps(perf_registry.export()), encoding="utf-8")
+
+    data, handlers = load_export(str(path))
+    assert handlers["rank"].histograms["total"].count == 1
+    assert handlers["rank"].histograms["total"].percentile(50) == perf_registry.handlers["rank"].histograms["total"].percentile(50)
@@ -0,0 +1,57 @@
+"""Tests for the MMR distribution report in rank_stats.py"""
+
+import numpy as np
+import pytest
+
+from rank_stats import PERCENTILES, distribution_stats, parse_thresholds, tier_counts
+from ranks import DEFAULT_RANKS
+
+
+def test_parse_thresholds():
+    assert parse_thresholds(["silver=820, CRYSTAL=1120"]) == {"SILVER": 820, "CRYSTAL": 1120}
+
+
+@pytest.mark.parametrize("spec", ["GOLD=1000", "SILVER", "SILVER=1200"])
+def test_parse_thresholds_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_thresholds([spec])
+
+
+def test_tier_counts_match_get_rank():
+    points = np.sort(np.random.default_rng(4).integers(0, 2500, 5000))
+    expected = {rank.key: 0 for rank in DEFAULT_RANKS.ranks}
+    for value in points.tolist():
+        expected[DEFAULT_RANKS.get_rank(value).key] += 1
+    assert {rank_key: count for rank_key, min_mmr, count in tier_counts(points)} == expected
+
+
+def test_tier_counts_at_thresholds():
+    ranks = DEFAULT_RANKS.ranks
+    points = np.array([ranks[1].min_mmr - 1, ranks[1].min_mmr, ranks[2].min_mmr])
+    counts = [count for rank_key, min_mmr, count in tier_counts(points)]
+    assert counts[:3] == [1, 1, 1]
+
+
+def test_what_if_moves_players_between_tiers():
+    ranks = DEFAULT_RANKS.ranks
+    points = np.array([ranks[1].min_mmr + 5])
+    what_if = tier_counts(points, {ranks[1].key: ranks[1].min_mmr + 10})
+    assert what_if[0] == (ranks[0].key, ranks[0].min_mmr, 1)
+    assert what_if[1] == (ranks[1].key, ranks[1].min_mmr + 10, 0)
+
+
+def test_distribution_stats():
+    points = np.random.default_rng(9).normal(1150, 250, 1001).astype(np.int64)
+    stats = distribution_stats(points, {"SILVER": 820})
+    assert stats["count"] == 1001
+    assert stats["min"] == points.min() and stats["max"] == points.max()
+    assert stats["mean"] == pytest.approx(points.mean())
+    assert list(stats["percentiles"].values()) == pytest.approx(np.percentile(points, PERCENTILES).tolist())
+    assert sum(count for rank_key, min_mmr, count in stats["what_if"]) == 1001
+
+
+def test_distribution_stats_without_players():
+    stats = distribution_stats(np.array([], dtype=np.int64))
+    assert stats["count"] == 0
+    assert all(count == 0 for rank_key, min_mmr, count in stats["tiers"])
+    assert "mean" not in stats
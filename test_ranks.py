@@ -0,0 +1,49 @@
+"""Tests for the rank tier lookups in ranks.py"""
+
+import numpy as np
+
+from ranks import DEFAULT_RANKS, RANK_SYSTEM, RankTable
+
+
+def test_ranks_sorted_by_threshold():
+    assert [rank.min_mmr for rank in DEFAULT_RANKS.ranks] == sorted(data["min_mmr"] for data in RANK_SYSTEM.values())
+    assert DEFAULT_RANKS.by_key["CRYSTAL"].min_mmr == RANK_SYSTEM["CRYSTAL"]["min_mmr"]
+
+
+def test_get_rank_at_tier_edges():
+    for lower, upper in zip(DEFAULT_RANKS.ranks, DEFAULT_RANKS.ranks[1:]):
+        assert DEFAULT_RANKS.get_rank(upper.min_mmr - 1) == lower
+        assert DEFAULT_RANKS.get_rank(upper.min_mmr) == upper
+        assert DEFAULT_RANKS.get_rank(lower.max_mmr) == lower
+
+
+def test_get_rank_outside_the_table():
+    assert DEFAULT_RANKS.get_rank(0) == DEFAULT_RANKS.ranks[0]
+    assert DEFAULT_RANKS.get_rank(-50) == DEFAULT_RANKS.ranks[0]
+    assert DEFAULT_RANKS.get_rank(100_000) == DEFAULT_RANKS.ranks[-1]
+
+
+def test_next_rank_at_tier_edges():
+    ranks = DEFAULT_RANKS.ranks
+    assert DEFAULT_RANKS.next_rank(ranks[1].min_mmr - 1) == ranks[1]
+    assert DEFAULT_RANKS.next_rank(ranks[1].min_mmr) == ranks[2]
+    assert DEFAULT_RANKS.next_rank(ranks[-1].min_mmr - 1) == ranks[-1]
+    assert DEFAULT_RANKS.next_rank(ranks[-1].min_mmr) is None
+
+
+def test_next_rank_below_the_first_tier():
+    ranks = DEFAULT_RANKS.ranks
+    assert DEFAULT_RANKS.next_rank(0) == ranks[1]
+
+
+def test_rank_indices_match_get_rank():
+    points = np.array([-10, 0, 699, 700, 799, 800, 949, 950, 1100, 1449, 1450, 1700, 5000])
+    indices = DEFAULT_RANKS.rank_indices(points)
+    assert [DEFAULT_RANKS.ranks[index] for index in indices] == [DEFAULT_RANKS.get_rank(int(p)) for p in points]
+
+
+def test_single_tier_table():
+    table = RankTable({"ONLY": dict(RANK_SYSTEM["SILVER"], min_mmr=0, max_mmr=9999)})
+    assert table.get_rank(5000).key == "ONLY"
+    assert table.next_rank(-1) is None
+    assert table.get_rank_from_mmr(10) == (RANK_SYSTEM["SILVER"]["name"], RANK_SYSTEM["SILVER"]["emoji"])
@@ -0,0 +1,69 @@
+"""Tests for the batched rating models in rating.py"""
+
+import numpy as np
+import pytest
+
+from rating import RATING_MODELS, DiscordBotRating, EloRating, FlatRating, get_rating_model
+
+WON = np.array([[True, True, False, False]])
+
+
+def seats(*points):
+    return np.array([points], dtype=np.int64)
+
+
+def test_flat_ranked_and_placement_deltas():
+    model = FlatRating()
+    placement = seats(10, 0, 10, 4)
+    assert model.rate(seats(1000, 1000, 1000, 1000), placement, WON).tolist() == [[25, 10, -20, -5]]
+
+
+def test_flat_placement_rule_follows_placement_matches():
+    model = FlatRating(placement_matches=3)
+    assert model.rate(seats(1000, 1000, 1000, 1000), seats(3, 2, 3, 2), WON).tolist() == [[25, 10, -20, -5]]
+
+
+def test_apply_never_goes_below_zero():
+    model = FlatRating()
+    assert model.apply(seats(1000, 1000, 10, 0), seats(10, 10, 10, 10), WON).tolist() == [[1025, 1025, 0, 0]]
+
+
+def test_discord_bot_underdogs_gain_more():
+    model = DiscordBotRating()
+    even = model.rate(seats(1000, 1000, 1000, 1000), seats(10, 10, 10, 10), WON)[0]
+    favourites = model.rate(seats(1200, 1200, 1000, 1000), seats(10, 10, 10, 10), WON)[0]
+    underdogs = model.rate(seats(1000, 1000, 1200, 1200), seats(10, 10, 10, 10), WON)[0]
+    assert even.tolist() == [25, 25, -25, -25]
+    assert favourites[0] == 10  # base 25 - 200 // 10, clamped at min_gain
+    assert underdogs[0] == 40  # base 25 + 200 // 10, clamped at max_gain
+
+
+def test_elo_is_zero_sum_between_equal_k():
+    model = EloRating()
+    deltas = model.rate(seats(1100, 1050, 1000, 980), seats(10, 10, 10, 10), WON)[0]
+    assert deltas[0] == deltas[1] > 0
+    assert deltas[2] == deltas[3] == -deltas[0]
+
+
+def test_models_rate_batches_like_single_matches():
+    rng = np.random.default_rng(3)
+    points = rng.integers(700, 1800, size=(200, 4))
+    placement = rng.integers(0, 10, size=(200, 4))
+    won = np.repeat(rng.random((200, 1)) < 0.5, 4, axis=1) ^ np.array([False, False, True, True])
+    for name, model_class in RATING_MODELS.items():
+        model = model_class()
+        batch = model.rate(points, placement, won)
+        single = np.vstack([model.rate(points[i:i + 1], placement[i:i + 1], won[i:i + 1]) for i in range(len(points))])
+        assert np.array_equal(batch, single), name
+
+
+@pytest.mark.parametrize("name", list(RATING_MODELS))
+def test_even_match_gains_and_loses(name):
+    gain, loss = get_rating_model(name).even_match_changes(1000)
+    assert gain > 0 and loss > 0
+
+
+def test_get_rating_model():
+    assert get_rating_model("flat", win=30).win == 30
+    with pytest.raises(ValueError):
+        get_rating_model("glicko")